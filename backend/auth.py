@@ -3,11 +3,15 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import time
 
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Issue tokens that also carry user id, organization, role and token version, so
+# authorization checks don't have to load the user
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "0") == "1"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -30,13 +34,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
-    """Verify JWT token"""
+def token_claims(user) -> dict:
+    """Claims for a user's access token; stateless mode adds the authorization claims"""
+    claims = {"sub": user.phone_number}
+    if AUTH_STATELESS:
+        claims.update({
+            "uid": user.user_id,
+            "org": user.organization_id,
+            "org_type": user.organization_type.value,
+            "role": user.role.value,
+            "ver": user.token_version,
+            "iat": time.time(),
+        })
+    return claims
+
+def decode_token(token: str) -> Optional[dict]:
+    """Verified JWT payload, or None for an invalid or expired token"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        phone_number: str = payload.get("sub")
-        if phone_number is None:
-            return None
-        return phone_number
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_token(token: str):
+    """Verify JWT token"""
+    payload = decode_token(token)
+    return payload["sub"] if payload else None
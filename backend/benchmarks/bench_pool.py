@@ -0,0 +1,122 @@
+"""Compare API throughput (requests/sec) across DB_POOL_MODE settings.
+
+Starts the API under uvicorn once per pool mode against a throwaway SQLite
+database, then hammers an authenticated GET endpoint from a thread pool.
+
+Usage (from backend/):
+    python benchmarks/bench_pool.py
+    python benchmarks/bench_pool.py --modes null queue --concurrency 16 --duration 15
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _request(url: str, token: str | None = None, body: dict | None = None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data)
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return json.loads(resp.read())
+
+def _wait_until_up(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _request(f"{base_url}/health")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+def run_mode(mode: str, db_path: str, endpoint: str, concurrency: int, duration: float) -> dict:
+    """Run one server with the given pool mode and measure throughput."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, DB_POOL_MODE=mode, DATABASE_URL=f"sqlite:///{db_path}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_up(base_url)
+        token = _request(
+            f"{base_url}/auth/login",
+            body={"phone_number": "9999999999", "password": "admin123"},
+        )["access_token"]
+
+        url = f"{base_url}{endpoint}"
+        # Warm up pooled connections before measuring
+        for _ in range(concurrency):
+            _request(url, token)
+
+        count = 0
+        errors = 0
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + duration
+
+        def worker():
+            nonlocal count, errors
+            done = failed = 0
+            while time.perf_counter() < stop_at:
+                try:
+                    _request(url, token)
+                    done += 1
+                except Exception:
+                    failed += 1
+            with lock:
+                count += done
+                errors += failed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+        elapsed = time.perf_counter() - started
+        return {"mode": mode, "requests": count, "errors": errors, "seconds": round(elapsed, 2),
+                "rps": round(count / elapsed, 1)}
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["null", "queue"], help="DB_POOL_MODE values to compare")
+    parser.add_argument("--endpoint", default="/products/", help="Authenticated GET endpoint to hit")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        for mode in args.modes:
+            result = run_mode(mode, db_path, args.endpoint, args.concurrency, args.duration)
+            results.append(result)
+            print(f"{mode:>6}: {result['rps']:>8} req/s  ({result['requests']} ok, {result['errors']} errors)")
+
+    baseline = results[0]["rps"] or 1
+    for result in results[1:]:
+        print(f"{result['mode']} vs {results[0]['mode']}: {result['rps'] / baseline:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""Pricing engine benchmarks and randomized equivalence checks.
+
+Seeds a synthetic catalog into a throwaway SQLite database and measures
+compute_price (cold and warm rule cache), compute_prices batch throughput and
+rate card generation, next to the original query-per-call implementation
+kept here as the reference.
+
+--check runs the randomized equivalence check instead: every faster path
+(cached compute_price, compute_prices, the rate card) must return exactly
+what the reference returns. The catalog deliberately includes duplicate zone
+codes, equal tier min_qty, inactive and unknown-type rules and 3-decimal
+amounts.
+
+A plain run compares against the committed baseline (baseline_pricing.json
+next to this script) when it was recorded with the same catalog options;
+timings are machine-dependent, so re-record it with --save on the machine
+that runs the comparison.
+
+Usage (from backend/):
+    python benchmarks/bench_pricing.py
+    python benchmarks/bench_pricing.py --save
+    python benchmarks/bench_pricing.py --products 5000 --zones 6 --tiers 5 --save baseline.json
+    python benchmarks/bench_pricing.py --compare baseline.json --tolerance 0.25
+    python benchmarks/bench_pricing.py --check --seeds 1 2 3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BATCH_RUNS = 5
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_pricing.json")
+
+ZONE_CODES = ["NEAR", "MID", "FAR", "NORTH", "SOUTH", "EAST", "WEST", "ISLAND"]
+
+def reference_compute_price(session, product_id: int, quantity: int, zone_code: Optional[str]) -> Dict[str, Any]:
+    """The original three-query compute_price; the behaviour every faster path must match"""
+    from sqlmodel import select
+    from models import Product, ProductZoneAdjustment, ProductQuantityTier
+
+    product = session.get(Product, product_id)
+    if not product:
+        raise ValueError("Product not found")
+    base_price = product.price
+    price = base_price
+    applied_zone = None
+    applied_tier = None
+    if zone_code:
+        zone = session.exec(
+            select(ProductZoneAdjustment)
+            .where(ProductZoneAdjustment.product_id == product_id)
+            .where(ProductZoneAdjustment.zone_code == zone_code)
+            .where(ProductZoneAdjustment.active == True)
+        ).first()
+        if zone:
+            applied_zone = zone
+            if zone.adjustment_type == 'Percent':
+                price = price * (1 + zone.amount / 100.0)
+            elif zone.adjustment_type == 'Absolute':
+                price = price + zone.amount
+    tier = session.exec(
+        select(ProductQuantityTier)
+        .where(ProductQuantityTier.product_id == product_id)
+        .where(ProductQuantityTier.min_qty <= quantity)
+        .where(ProductQuantityTier.active == True)
+        .order_by(ProductQuantityTier.min_qty.desc())
+    ).first()
+    if tier:
+        applied_tier = tier
+        if tier.discount_type == 'Percent':
+            price = price * (1 - tier.discount_amount / 100.0)
+        elif tier.discount_type == 'Absolute':
+            price = price - tier.discount_amount
+    if price < 0:
+        price = 0
+    unit_price = round(price, 2)
+    return {
+        'base_price': base_price,
+        'unit_price': unit_price,
+        'zone_adjustment': applied_zone.amount if applied_zone else None,
+        'zone_adjustment_type': applied_zone.adjustment_type if applied_zone else None,
+        'tier_discount': applied_tier.discount_amount if applied_tier else None,
+        'tier_discount_type': applied_tier.discount_type if applied_tier else None,
+        'applied_zone_code': applied_zone.zone_code if applied_zone else None,
+        'applied_tier_min_qty': applied_tier.min_qty if applied_tier else None,
+        'pricing_source': 'Auto'
+    }
+
+def seed_catalog(engine, products: int, zones: int, tiers: int, seed: int) -> Tuple[int, List[int]]:
+    """Insert a vendor with a synthetic catalog; returns (vendor_id, product_ids)"""
+    from sqlalchemy import func, insert
+    from sqlmodel import Session, select
+    from models import Organization, OrganizationType, Unit, Product, ProductZoneAdjustment, ProductQuantityTier
+
+    rnd = random.Random(seed)
+    zone_codes = ZONE_CODES[:max(1, min(zones, len(ZONE_CODES)))]
+    with Session(engine) as session:
+        vendor = Organization(name=f"Bench vendor {seed}", organization_type=OrganizationType.VENDOR)
+        session.add(vendor)
+        session.flush()
+        unit = Unit(unit_name="kg", vendor_id=vendor.id)
+        session.add(unit)
+        session.flush()
+        vendor_id, unit_id = vendor.id, unit.unit_id
+
+        first_id = (session.exec(select(func.max(Product.product_id))).one() or 0) + 1
+        session.execute(insert(Product), [
+            {"product_id": first_id + i, "product_name": f"Product {i}", "vendor_id": vendor_id, "unit_id": unit_id,
+             "price": round(rnd.uniform(0.5, 2000), rnd.choice([0, 1, 2, 3]))}
+            for i in range(products)
+        ])
+        product_ids = list(range(first_id, first_id + products))
+
+        zone_rows, tier_rows = [], []
+        for product_id in product_ids:
+            for code in rnd.sample(zone_codes, rnd.randint(0, len(zone_codes))):
+                # Occasional duplicate zone code: the lowest id must win
+                for _ in range(2 if rnd.random() < 0.05 else 1):
+                    zone_rows.append({
+                        "product_id": product_id, "zone_code": code,
+                        "adjustment_type": rnd.choice(["Percent", "Percent", "Absolute", "Unknown"]),
+                        "amount": round(rnd.uniform(-25, 40), rnd.choice([1, 2, 3])),
+                        "active": rnd.random() < 0.9,
+                    })
+            for _ in range(rnd.randint(0, tiers)):
+                tier_rows.append({
+                    "product_id": product_id, "min_qty": rnd.choice([1, 5, 10, 25, 50, 100, 250, 500]),
+                    "discount_type": rnd.choice(["Percent", "Absolute", "Absolute", "Unknown"]),
+                    "discount_amount": round(rnd.uniform(0, 60), rnd.choice([1, 2, 3])),
+                    "active": rnd.random() < 0.9,
+                })
+        if zone_rows:
+            session.execute(insert(ProductZoneAdjustment), zone_rows)
+        if tier_rows:
+            session.execute(insert(ProductQuantityTier), tier_rows)
+        session.commit()
+    return vendor_id, product_ids
+
+def random_lines(rnd: random.Random, product_ids: List[int], count: int) -> List[Tuple[int, int, Optional[str]]]:
+    quantities = [1, 2, 4, 5, 9, 10, 11, 24, 25, 26, 49, 50, 99, 100, 101, 250, 499, 500, 1000]
+    zones = [None, "", "UNKNOWN"] + ZONE_CODES
+    return [(rnd.choice(product_ids), rnd.choice(quantities), rnd.choice(zones)) for _ in range(count)]
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def _time_calls(fn, lines) -> Dict[str, float]:
+    samples = []
+    for line in lines:
+        started = time.perf_counter()
+        fn(*line)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return {"p50_us": statistics.median(samples), "p95_us": _percentile(samples, 0.95)}
+
+def run_benchmarks(engine, vendor_id: int, product_ids: List[int], calls: int, batch_size: int, seed: int) -> Dict[str, dict]:
+    """Return {metric: {"value", "unit", "higher_is_better"}}"""
+    from sqlmodel import Session
+    from pricing_engine import compute_price, compute_prices, rule_cache
+
+    rnd = random.Random(seed)
+    results: Dict[str, dict] = {}
+
+    def record(name: str, value: float, unit: str, higher_is_better: bool = False):
+        results[name] = {"value": round(value, 3), "unit": unit, "higher_is_better": higher_is_better}
+
+    # One session per call, like one request per call
+    def reference(product_id, quantity, zone_code):
+        with Session(engine) as session:
+            return reference_compute_price(session, product_id, quantity, zone_code)
+
+    def cached(product_id, quantity, zone_code):
+        with Session(engine) as session:
+            return compute_price(session, product_id, quantity, zone_code)
+
+    # Distinct products so every "cold" call really misses the cache
+    cold_products = rnd.sample(product_ids, min(calls, len(product_ids)))
+    lines = [(pid, rnd.choice([1, 10, 100]), rnd.choice([None] + ZONE_CODES[:3])) for pid in cold_products]
+
+    stats = _time_calls(reference, lines)
+    record("single_reference_p50", stats["p50_us"], "us")
+    record("single_reference_p95", stats["p95_us"], "us")
+
+    rule_cache.clear()
+    stats = _time_calls(cached, lines)
+    record("single_cold_p50", stats["p50_us"], "us")
+    record("single_cold_p95", stats["p95_us"], "us")
+
+    stats = _time_calls(cached, lines)
+    record("single_warm_p50", stats["p50_us"], "us")
+    record("single_warm_p95", stats["p95_us"], "us")
+
+    batch = random_lines(rnd, product_ids, batch_size)
+    for label in ("cold", "warm"):
+        # Best of a few runs; a single batch is short enough to be noisy
+        best = float("inf")
+        for _ in range(BATCH_RUNS):
+            if label == "cold":
+                rule_cache.clear()
+            with Session(engine) as session:
+                started = time.perf_counter()
+                compute_prices(session, batch)
+                best = min(best, time.perf_counter() - started)
+        record(f"batch_{label}_lines_per_s", len(batch) / best, "lines/s", higher_is_better=True)
+
+    try:
+        from pricing_matrix import load_rate_card, price_matrix
+    except ImportError:
+        print("numpy not installed; skipping rate card benchmark")
+        return results
+    with Session(engine) as session:
+        started = time.perf_counter()
+        card = load_rate_card(session, vendor_id)
+        loaded = time.perf_counter()
+        prices = price_matrix(card)
+        finished = time.perf_counter()
+    record("rate_card_load_ms", (loaded - started) * 1000, "ms")
+    record("rate_card_cells_per_s", prices.size / (finished - loaded), "cells/s", higher_is_better=True)
+    return results
+
+def check_equivalence(engine, vendor_id: int, product_ids: List[int], lines_count: int, seed: int) -> List[str]:
+    """Compare every pricing path against reference_compute_price; returns mismatch descriptions"""
+    from sqlmodel import Session
+    from pricing_engine import compute_price, compute_prices, rule_cache
+
+    rnd = random.Random(seed)
+    lines = random_lines(rnd, product_ids, lines_count)
+    mismatches = []
+    with Session(engine) as session:
+        expected = [reference_compute_price(session, *line) for line in lines]
+
+    for label in ("cold", "warm"):
+        if label == "cold":
+            rule_cache.clear()
+        with Session(engine) as session:
+            for line, want in zip(lines, expected):
+                got = compute_price(session, *line)
+                if got != want:
+                    mismatches.append(f"compute_price ({label}) {line}: {got} != {want}")
+
+    rule_cache.clear()
+    with Session(engine) as session:
+        for line, got, want in zip(lines, compute_prices(session, lines), expected):
+            if got != want:
+                mismatches.append(f"compute_prices {line}: {got} != {want}")
+
+    try:
+        from pricing_matrix import load_rate_card, iter_rate_card
+    except ImportError:
+        print("numpy not installed; skipping rate card check")
+        return mismatches
+    with Session(engine) as session:
+        card = load_rate_card(session, vendor_id)
+        for product_id, _, zone_code, quantity, base_price, unit_price in iter_rate_card(card):
+            want = reference_compute_price(session, product_id, quantity, zone_code)
+            if (base_price, unit_price) != (want["base_price"], want["unit_price"]):
+                mismatches.append(f"rate card {(product_id, quantity, zone_code)}: {unit_price} != {want['unit_price']}")
+    return mismatches
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """Print current vs baseline per metric; False if any metric regressed beyond tolerance"""
+    ok = True
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or not base["value"]:
+            continue
+        ratio = current["value"] / base["value"]
+        regressed = ratio < 1 - tolerance if current["higher_is_better"] else ratio > 1 + tolerance
+        ok = ok and not regressed
+        print(f"{name:>28}: {current['value']:>12} {current['unit']:<8} baseline {base['value']:>12}  "
+              f"{ratio:.2f}x{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--zones", type=int, default=4, help=f"Zone codes in use (max {len(ZONE_CODES)})")
+    parser.add_argument("--tiers", type=int, default=4, help="Most tiers per product")
+    parser.add_argument("--calls", type=int, default=500, help="Single compute_price calls per measurement")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Lines per compute_prices batch")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", metavar="PATH", nargs="?", const=DEFAULT_BASELINE,
+                        help="Write results as a JSON baseline (default: the committed baseline)")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="Compare against this baseline instead of the committed one")
+    parser.add_argument("--no-compare", action="store_true", help="Only print the results")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression vs baseline (fraction)")
+    parser.add_argument("--check", action="store_true", help="Run the randomized equivalence check instead")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3], help="Catalog seeds for --check")
+    parser.add_argument("--check-lines", type=int, default=3000, help="Random lines per seed for --check")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench_pricing.db')}"
+        from database import engine, create_db_and_tables
+        import models  # noqa: F401  register tables on the metadata
+
+        create_db_and_tables()
+        try:
+            if args.check:
+                failures = 0
+                for seed in args.seeds:
+                    vendor_id, product_ids = seed_catalog(engine, min(args.products, 500), args.zones, args.tiers, seed)
+                    mismatches = check_equivalence(engine, vendor_id, product_ids, args.check_lines, seed)
+                    failures += len(mismatches)
+                    print(f"seed {seed}: {'ok' if not mismatches else f'{len(mismatches)} mismatches'}")
+                    for line in mismatches[:10]:
+                        print(f"    {line}")
+                sys.exit(1 if failures else 0)
+
+            vendor_id, product_ids = seed_catalog(engine, args.products, args.zones, args.tiers, args.seed)
+            results = run_benchmarks(engine, vendor_id, product_ids, args.calls, args.batch_size, args.seed)
+        finally:
+            engine.dispose()
+
+    meta = {"products": args.products, "zones": args.zones, "tiers": args.tiers,
+            "calls": args.calls, "batch_size": args.batch_size, "seed": args.seed}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta") != meta:
+            print(f"warning: baseline was recorded with {baseline.get('meta')}")
+    elif not args.no_compare and os.path.exists(DEFAULT_BASELINE):
+        with open(DEFAULT_BASELINE) as f:
+            baseline = json.load(f)
+        if baseline.get("meta") != meta:
+            # Other catalog options measure something else; don't flag that as a regression
+            print(f"note: committed baseline was recorded with {baseline.get('meta')}; not comparing")
+            baseline = None
+    if baseline is not None:
+        ok = compare(results, baseline["results"], args.tolerance)
+    else:
+        ok = True
+        for name, result in results.items():
+            print(f"{name:>28}: {result['value']:>12} {result['unit']}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,117 @@
 from sqlmodel import SQLModel, create_engine, Session
 from sqlalchemy import event
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 from typing import Optional
 import os
+from db_instrumentation import instrument_engine
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./marketplace.db")
 
-# Create engine with SQLite optimizations
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,
-    connect_args={
-        "timeout": 30,  # wait up to 30s for locks
-        "check_same_thread": False,
-    },
-    poolclass=NullPool,  # close connections immediately to avoid lingering locks
-    pool_pre_ping=True,
+# Log every SQL statement (debugging only; slow queries are logged regardless, see db_instrumentation.py)
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+
+# Connection pooling: "queue" keeps connections open and reuses them (pragmas run
+# once per connection), "null" opens a fresh connection for every session.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))  # seconds, -1 disables
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Read-only connections used by GET endpoints get their own pool
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "20"))
+
+# Optional aiosqlite-backed engine for the async variants of the hot read endpoints
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 )
 
+# Per-connection SQLite tuning
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, i.e. 64 MiB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+def _pool_kwargs(pool_size: int, max_overflow: int) -> dict:
+    """Engine keyword arguments for the configured pool mode"""
+    if DB_POOL_MODE == "null":
+        # close connections immediately to avoid lingering locks
+        return {"poolclass": NullPool}
+    if DB_POOL_MODE != "queue":
+        raise ValueError(f"Unknown DB_POOL_MODE: {DB_POOL_MODE!r} (expected 'queue' or 'null')")
+    return {
+        "poolclass": QueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+def _create_engine(pool_kwargs: dict):
+    """Create an engine with SQLite optimizations"""
+    return create_engine(
+        DATABASE_URL,
+        echo=DB_ECHO,
+        connect_args={
+            "timeout": 30,  # wait up to 30s for locks
+            "check_same_thread": False,
+        },
+        # SQLite connections don't go stale, so skip the per-checkout ping there
+        pool_pre_ping=not DATABASE_URL.startswith("sqlite"),
+        **pool_kwargs,
+    )
+
+# Primary engine: startup, schema changes and scripts; request writes go through writer.run_write
+engine = _create_engine(_pool_kwargs(DB_POOL_SIZE, DB_MAX_OVERFLOW))
+
+# Reader engine: query_only connections for GET endpoints. In WAL mode readers
+# never wait on the writer lock, so list/detail pages can't hit "database is busy".
+read_engine = _create_engine(_pool_kwargs(DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW))
+
+# Single connection owned by the writer thread (see writer.py). Transactions are
+# started explicitly with BEGIN IMMEDIATE so a whole group commit holds the lock
+# from its first statement and per-job SAVEPOINTs nest inside it.
+writer_engine = _create_engine({"poolclass": QueuePool, "pool_size": 1, "max_overflow": 0,
+                                "pool_recycle": DB_POOL_RECYCLE})
+
+
+# Async reader engine (DB_ASYNC=1): awaiting a locked database parks a coroutine
+# instead of holding one of Starlette's worker threads.
+async_read_engine = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=DB_ECHO,
+        connect_args={"timeout": 30},
+        **({"poolclass": NullPool} if DB_POOL_MODE == "null" else {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": DB_READ_POOL_SIZE,
+            "max_overflow": DB_READ_MAX_OVERFLOW,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }),
+    )
+
+_sync_engines = [engine, read_engine, writer_engine]
+_read_engines = [read_engine]
+if async_read_engine is not None:
+    _sync_engines.append(async_read_engine.sync_engine)
+    _read_engines.append(async_read_engine.sync_engine)
+
+for _engine in _sync_engines:
+    instrument_engine(_engine)
+
 
-@event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
-    """Ensure SQLite is configured for better concurrency and safety."""
+    """Ensure SQLite is configured for better concurrency and safety.
+
+    Runs once per physical connection; with the queue pool that is once per
+    pooled connection rather than once per request.
+    """
     try:
         cursor = dbapi_connection.cursor()
         # Enable WAL for concurrent reads/writes and reduce writer starvation
@@ -33,16 +122,56 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor.execute("PRAGMA foreign_keys=ON")
         # Increase busy timeout so SQLite waits for locks instead of failing fast
         cursor.execute("PRAGMA busy_timeout=30000")  # 30 seconds
+        # Larger page cache and memory-mapped reads; pooled connections keep them warm
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Keep temp tables/indices (ORDER BY, DISTINCT) off disk
+        cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
         cursor.close()
     except Exception:
         # If we're not on SQLite or something fails, ignore silently
         pass
 
+
+def set_sqlite_query_only(dbapi_connection, connection_record):
+    """Make reader connections refuse writes so they never take the write lock."""
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    except Exception:
+        pass
+
+for _engine in _sync_engines:
+    event.listen(_engine, "connect", set_sqlite_pragma)
+for _engine in _read_engines:
+    event.listen(_engine, "connect", set_sqlite_query_only)
+
+
+@event.listens_for(writer_engine, "connect")
+def disable_pysqlite_transactions(dbapi_connection, connection_record):
+    """Stop pysqlite from issuing its own BEGIN so SAVEPOINTs behave."""
+    if DATABASE_URL.startswith("sqlite"):
+        dbapi_connection.isolation_level = None
+
+
+@event.listens_for(writer_engine, "begin")
+def begin_immediate(conn):
+    """Take the write lock up front instead of upgrading a read transaction."""
+    if DATABASE_URL.startswith("sqlite"):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 def create_db_and_tables():
     """Create database tables"""
     SQLModel.metadata.create_all(engine)
 
-def get_session():
-    """Get database session"""
-    with Session(engine) as session:
+def get_read_session():
+    """Get read-only database session (GET endpoints)"""
+    with Session(read_engine) as session:
+        yield session
+
+async def get_async_read_session():
+    """Get read-only async database session (requires DB_ASYNC=1)"""
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    async with AsyncSession(async_read_engine) as session:
         yield session
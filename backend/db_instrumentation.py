@@ -0,0 +1,119 @@
+"""Query instrumentation built on SQLAlchemy engine events.
+
+- Slow-query log: statements slower than DB_SLOW_QUERY_MS are logged (sampled by
+  DB_SLOW_QUERY_SAMPLE_RATE) together with their EXPLAIN QUERY PLAN on SQLite.
+- Per-request accounting: the number of statements and total time spent in the
+  database for the current request, collected through a context variable that
+  main.py's middleware opens per request and turns into response headers.
+"""
+import contextvars
+import logging
+import os
+import random
+import time
+from typing import Optional
+from sqlalchemy import event
+
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_SLOW_QUERY_SAMPLE_RATE = float(os.getenv("DB_SLOW_QUERY_SAMPLE_RATE", "1.0"))
+DB_EXPLAIN_SLOW_QUERIES = os.getenv("DB_EXPLAIN_SLOW_QUERIES", "1") == "1"
+# Bound parameters can hold phone numbers and password hashes, so they are opt-in
+DB_SLOW_QUERY_LOG_PARAMS = os.getenv("DB_SLOW_QUERY_LOG_PARAMS", "0") == "1"
+# Log a summary line for every request (otherwise only for requests over the warn limit)
+DB_LOG_REQUEST_STATS = os.getenv("DB_LOG_REQUEST_STATS", "0") == "1"
+DB_QUERY_COUNT_WARN = int(os.getenv("DB_QUERY_COUNT_WARN", "50"))
+
+logger = logging.getLogger("marketplace.db")
+if not logger.handlers:
+    # Don't configure the root logger: that would also enable SQLAlchemy's echo output
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+class QueryStats:
+    """Query count and total database time for one request"""
+    __slots__ = ("count", "total_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+
+_current_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "db_query_stats", default=None
+)
+
+def begin_request_stats():
+    """Start accounting for the current request; returns (stats, reset token)"""
+    stats = QueryStats()
+    return stats, _current_stats.set(stats)
+
+def end_request_stats(token):
+    _current_stats.reset(token)
+
+def log_request_stats(method: str, path: str, stats: QueryStats):
+    """Emit the per-request summary line when enabled or when the count looks like N+1"""
+    if stats.count >= DB_QUERY_COUNT_WARN:
+        logger.warning("%s %s ran %d queries (%.1f ms in DB)", method, path, stats.count, stats.total_ms)
+    elif DB_LOG_REQUEST_STATS:
+        logger.info("%s %s ran %d queries (%.1f ms in DB)", method, path, stats.count, stats.total_ms)
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    """EXPLAIN QUERY PLAN for a SELECT, run on a separate cursor of the same connection"""
+    if conn.dialect.name != "sqlite" or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            return "\n".join(f"  {row[3]}" for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"  (explain failed: {e})"
+
+def instrument_engine(engine):
+    """Attach slow-query logging and request accounting to an engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+
+        if elapsed_ms < DB_SLOW_QUERY_MS or random.random() >= DB_SLOW_QUERY_SAMPLE_RATE:
+            return
+        message = "Slow query (%.1f ms): %s"
+        args = [elapsed_ms, " ".join(statement.split())]
+        if DB_SLOW_QUERY_LOG_PARAMS:
+            message += " | params=%r"
+            args.append(parameters if not executemany else "<executemany>")
+        plan = _explain(conn, statement, parameters) if DB_EXPLAIN_SLOW_QUERIES and not executemany else None
+        if plan:
+            message += "\n%s"
+            args.append(plan)
+        logger.warning(message, *args)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # after_cursor_execute doesn't run for a failed statement; drop its start time so
+        # the next statement on this connection isn't timed from it
+        conn = exception_context.connection
+        if conn is None or exception_context.statement is None:
+            # Not a statement (e.g. connect or commit), so nothing was pushed
+            return
+        starts = conn.info.get("query_start_time")
+        if starts:
+            elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+            stats = _current_stats.get()
+            if stats is not None:
+                stats.count += 1
+                stats.total_ms += elapsed_ms
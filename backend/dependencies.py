@@ -1,20 +1,20 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session, select
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_read_session, get_async_read_session, read_engine
 from models import User, UserRole, OrganizationType
-from auth import verify_token
-from typing import Optional
+from auth import AUTH_STATELESS, decode_token, verify_token
+from user_cache import user_cache
+from token_versions import token_versions
+from typing import Optional, Union
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
-) -> User:
-    """Get current authenticated user"""
-    token = credentials.credentials
-    phone_number = verify_token(token)
+def _phone_for_token(token: Optional[str]) -> str:
+    phone_number = verify_token(token) if token else None
     
     if phone_number is None:
         raise HTTPException(
@@ -22,8 +22,9 @@ def get_current_user(
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = session.exec(select(User).where(User.phone_number == phone_number)).first()
+    return phone_number
+
+def _found_user(phone_number: str, user: Optional[User], generation: int, fresh_snapshot: bool) -> User:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -31,11 +32,122 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if fresh_snapshot:
+        user_cache.put(phone_number, user, generation)
     return user
 
+def _user_for_token(token: Optional[str], session: Session) -> User:
+    phone_number = _phone_for_token(token)
+    user = user_cache.get(phone_number)
+    if user is not None:
+        return user
+    
+    # Only a lookup that opens the session's snapshot is known to be newer than this generation
+    generation = user_cache.generation
+    fresh_snapshot = not session.in_transaction()
+    user = session.exec(select(User).where(User.phone_number == phone_number)).first()
+    return _found_user(phone_number, user, generation, fresh_snapshot)
+
+async def _user_for_token_async(token: Optional[str], session: AsyncSession) -> User:
+    phone_number = _phone_for_token(token)
+    user = user_cache.get(phone_number)
+    if user is not None:
+        return user
+    
+    generation = user_cache.generation
+    fresh_snapshot = not session.in_transaction()
+    user = (await session.exec(select(User).where(User.phone_number == phone_number))).first()
+    return _found_user(phone_number, user, generation, fresh_snapshot)
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: Session = Depends(get_read_session)
+) -> User:
+    """Get current authenticated user"""
+    return _user_for_token(credentials.credentials, session)
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_async_read_session)
+) -> User:
+    """get_current_user for the async routes (DB_ASYNC=1): runs on the event loop and
+    shares the route's aiosqlite session instead of taking a thread and a sync connection.
+    """
+    return await _user_for_token_async(credentials.credentials, session)
+
+class Principal:
+    """The caller as described by a stateless token's claims. Carries the attributes
+    routes read from the current user, so it stands in for a loaded User in
+    authorization checks and org scoping.
+    """
+    __slots__ = ("user_id", "organization_id", "organization_type", "role")
+
+    def __init__(self, user_id: int, organization_id: Optional[int], organization_type: OrganizationType, role: UserRole):
+        self.user_id = user_id
+        self.organization_id = organization_id
+        self.organization_type = organization_type
+        self.role = role
+
+def _principal_from_claims(payload: dict) -> Principal:
+    try:
+        principal = Principal(
+            int(payload["uid"]),
+            payload.get("org"),
+            OrganizationType(payload["org_type"]),
+            UserRole(payload["role"]),
+        )
+        valid = token_versions.is_current(principal.user_id, int(payload["ver"]), float(payload["iat"]))
+    except (KeyError, TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> Union[Principal, User]:
+    """Caller identity for authorization checks. In stateless mode a token with claims
+    is trusted after the revocation check, without a query; other tokens load the user.
+    """
+    if AUTH_STATELESS:
+        payload = decode_token(credentials.credentials)
+        if payload is not None and "uid" in payload:
+            return _principal_from_claims(payload)
+    with Session(read_engine) as session:
+        return _user_for_token(credentials.credentials, session)
+
+async def get_current_principal_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_async_read_session),
+) -> Union[Principal, User]:
+    """get_current_principal for the async routes (DB_ASYNC=1)"""
+    if AUTH_STATELESS:
+        payload = decode_token(credentials.credentials)
+        if payload is not None and "uid" in payload:
+            if token_versions.reload_due():
+                # The periodic version reload is a sync query; keep it off the event loop
+                return await run_in_threadpool(_principal_from_claims, payload)
+            return _principal_from_claims(payload)
+    return await _user_for_token_async(credentials.credentials, session)
+
+def get_stream_user(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> User:
+    """Authenticate a long-lived stream. EventSource can't send headers, so the token
+    may also come as ?token=. Uses its own short session instead of get_read_session,
+    which would keep a pooled connection checked out for the whole stream.
+    """
+    with Session(read_engine) as session:
+        return _user_for_token(credentials.credentials if credentials else token, session)
+
 def require_role(required_roles: list[UserRole]):
     """Decorator to require specific roles"""
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    def role_checker(current_user: Principal = Depends(get_current_principal)) -> Principal:
         if current_user.role not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -44,7 +156,7 @@ def require_role(required_roles: list[UserRole]):
         return current_user
     return role_checker
 
-def require_app_owner(current_user: User = Depends(get_current_user)) -> User:
+def require_app_owner(current_user: Principal = Depends(get_current_principal)) -> Principal:
     """Require AppOwner role"""
     if current_user.organization_type != OrganizationType.APP_OWNER:
         raise HTTPException(
@@ -53,7 +165,7 @@ def require_app_owner(current_user: User = Depends(get_current_user)) -> User:
         )
     return current_user
 
-def require_company_or_app_owner(current_user: User = Depends(get_current_user)) -> User:
+def require_company_or_app_owner(current_user: Principal = Depends(get_current_principal)) -> Principal:
     """Allow Company or AppOwner users"""
     if current_user.organization_type not in [OrganizationType.COMPANY, OrganizationType.APP_OWNER]:
         raise HTTPException(
@@ -62,7 +174,7 @@ def require_company_or_app_owner(current_user: User = Depends(get_current_user))
         )
     return current_user
 
-def require_super_admin_or_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_super_admin_or_admin(current_user: Principal = Depends(get_current_principal)) -> Principal:
     """Require SuperAdmin or Admin role"""
     if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
         raise HTTPException(
@@ -71,9 +183,9 @@ def require_super_admin_or_admin(current_user: User = Depends(get_current_user))
         )
     return current_user
 
-def require_same_organization(current_user: User = Depends(get_current_user)):
+def require_same_organization(current_user: Principal = Depends(get_current_principal)):
     """Check if user belongs to the same organization"""
-    def org_checker(organization_id: int) -> User:
+    def org_checker(organization_id: int) -> Principal:
         if current_user.organization_id != organization_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,124 @@
+"""In-process publish/subscribe of order and item status changes.
+
+Write paths call ``publish`` after their writer job has committed. Every
+event gets an increasing id and is kept in a ring buffer of the last
+EVENTS_BUFFER_SIZE events, so a client reconnecting with ``Last-Event-ID``
+replays what it missed. Subscribers are asyncio queues owned by the
+streaming response's event loop; publishers run on worker threads and hand
+events over with ``call_soon_threadsafe``.
+
+Events are scoped like the order lists: the company that placed the order
+and the vendors with items in it (item events only go to the item's
+vendor). Ids start at the process start time in milliseconds so they keep
+increasing across restarts. When the requested id has already left the
+buffer (or a subscriber falls too far behind) the client receives a
+``reset`` event and should re-fetch its lists once.
+
+This bus is per process: with several workers, a client only sees events
+from writes handled by the worker it is connected to.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+# Events kept for Last-Event-ID resume
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "1000"))
+# Undelivered events per subscriber before it is reset
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+# Seconds between keep-alive comments on idle streams
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+
+class Event:
+    """One status change, visible to ``company_org_id`` and ``vendor_ids``"""
+    __slots__ = ("id", "type", "company_org_id", "vendor_ids", "data")
+
+    def __init__(self, event_id: int, event_type: str, company_org_id: Optional[int],
+                 vendor_ids: Set[int], data: Dict[str, Any]):
+        self.id = event_id
+        self.type = event_type
+        self.company_org_id = company_org_id
+        self.vendor_ids = vendor_ids
+        self.data = data
+
+    def visible_to(self, organization_id: int) -> bool:
+        return organization_id == self.company_org_id or organization_id in self.vendor_ids
+
+# Sentinel queued when a subscriber must re-fetch instead of replaying
+RESET = object()
+
+class Subscription:
+    """A stream's queue of events for one organization"""
+
+    def __init__(self, organization_id: int, loop: asyncio.AbstractEventLoop):
+        self.organization_id = organization_id
+        self.loop = loop
+        self.queue: "asyncio.Queue" = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE + 1)
+        self.overflowed = False
+
+    def _deliver(self, item):
+        # Runs on the subscriber's loop; the last slot is kept for RESET
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= EVENTS_QUEUE_SIZE:
+            self.overflowed = True
+            item = RESET
+        self.queue.put_nowait(item)
+
+class EventBus:
+    def __init__(self, buffer_size: int = EVENTS_BUFFER_SIZE):
+        self._buffer: "deque[Event]" = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._next_id = int(time.time() * 1000)
+
+    def publish(self, event_type: str, company_org_id: Optional[int], vendor_ids: Iterable[int],
+                data: Dict[str, Any]) -> Event:
+        """Record an event and push it to the subscribers allowed to see it (any thread)"""
+        with self._lock:
+            self._next_id += 1
+            event = Event(self._next_id, event_type, company_org_id,
+                          {v for v in vendor_ids if v is not None},
+                          {**data, "at": datetime.utcnow().isoformat()})
+            self._buffer.append(event)
+            targets = [s for s in self._subscribers if event.visible_to(s.organization_id)]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # Loop already closed; the stream is gone
+                pass
+        return event
+
+    def subscribe(self, organization_id: int, last_event_id: Optional[int] = None) -> Subscription:
+        """Register a subscriber on the running loop, queueing missed events after ``last_event_id``"""
+        subscription = Subscription(organization_id, asyncio.get_running_loop())
+        with self._lock:
+            if last_event_id is not None:
+                if self._buffer and last_event_id < self._buffer[0].id - 1:
+                    subscription._deliver(RESET)
+                else:
+                    for event in self._buffer:
+                        if event.id > last_event_id and event.visible_to(organization_id):
+                            subscription._deliver(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def last_id(self) -> int:
+        """Id of the newest event; a reset is sent with it so the client resumes from there"""
+        with self._lock:
+            return self._next_id
+
+event_bus = EventBus()
+
+def publish(event_type: str, company_org_id: Optional[int], vendor_ids: Iterable[int], **data) -> Event:
+    """Publish a committed change; see EventBus.publish"""
+    return event_bus.publish(event_type, company_org_id, vendor_ids, data)
@@ -1,15 +1,17 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
-from database import create_db_and_tables, get_session, engine
+from database import create_db_and_tables, engine
+from writer import write_queue
+from repricing import stop_repricing
+from db_instrumentation import begin_request_stats, end_request_stats, log_request_stats
 from models import User, Organization, UserRole, OrganizationType
 from auth import get_password_hash
 from routers import (
     auth, users, organizations, products, units, 
-    orders, order_items, invoices, documents, pricing
+    orders, order_items, invoices, documents, pricing, events
 )
-from sqlalchemy import text as sa_text
-from models import OrderItem
+from migrations import ensure_schema_current
 
 # Create FastAPI app
 app = FastAPI(
@@ -25,8 +27,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms", "X-Next-Cursor", "Link"],
 )
 
+@app.middleware("http")
+async def db_query_accounting(request: Request, call_next):
+    """Count queries and DB time per request; exposed as X-DB-* response headers"""
+    stats, token = begin_request_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request_stats(token)
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+    log_request_stats(request.method, request.url.path, stats)
+    return response
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -38,11 +54,14 @@ app.include_router(order_items.router)
 app.include_router(invoices.router)
 app.include_router(documents.router)
 app.include_router(pricing.router)
+app.include_router(events.router)
 
 @app.on_event("startup")
 def on_startup():
     """Initialize database and create default AppOwner"""
     create_db_and_tables()
+    # Cheap version check; pending migrations run once (see migrations.py)
+    ensure_schema_current(engine)
     
     # Create default AppOwner organization
     with Session(engine) as session:
@@ -84,61 +103,11 @@ def on_startup():
             print("Phone: 9999999999")
             print("Password: admin123")
 
-        # Auto-heal: ensure new pricing columns exist on orderitem (SQLite lacks migrations here)
-        try:
-            # Quick pragma table_info to inspect columns
-            cols = session.exec(sa_text('PRAGMA table_info(orderitem)')).all()
-            col_names = {c[1] for c in cols}
-            alters = []
-            pending = {
-                'quantity': 'INTEGER DEFAULT 1',
-                'zone_code': 'TEXT',
-                'calculated_unit_price': 'REAL',
-                'final_unit_price': 'REAL',
-                'pricing_source': 'TEXT'
-            }
-            for name, ddl in pending.items():
-                if name not in col_names:
-                    alters.append(f'ALTER TABLE orderitem ADD COLUMN {name} {ddl}')
-            for stmt in alters:
-                try:
-                    session.exec(sa_text(stmt))
-                except Exception:
-                    session.rollback()
-            if alters:
-                session.commit()
-            # Backfill null final_unit_price with existing item_price where present
-            session.exec(sa_text('UPDATE orderitem SET final_unit_price = item_price WHERE final_unit_price IS NULL'))
-            session.exec(sa_text('UPDATE orderitem SET calculated_unit_price = item_price WHERE calculated_unit_price IS NULL'))
-            session.exec(sa_text("UPDATE orderitem SET pricing_source = 'Auto' WHERE pricing_source IS NULL"))
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            print('Pricing auto-heal failed:', e)
-
-        # Auto-heal: ensure orderitemhistory has pricing change columns (old_price, new_price, price_change_reason)
-        try:
-            hist_cols = session.exec(sa_text('PRAGMA table_info(orderitemhistory)')).all()
-            hist_col_names = {c[1] for c in hist_cols}
-            hist_alters = []
-            history_pending = {
-                'old_price': 'REAL',
-                'new_price': 'REAL',
-                'price_change_reason': 'TEXT'
-            }
-            for name, ddl in history_pending.items():
-                if name not in hist_col_names:
-                    hist_alters.append(f'ALTER TABLE orderitemhistory ADD COLUMN {name} {ddl}')
-            for stmt in hist_alters:
-                try:
-                    session.exec(sa_text(stmt))
-                except Exception:
-                    session.rollback()
-            if hist_alters:
-                session.commit()
-        except Exception as e:
-            session.rollback()
-            print('OrderItemHistory auto-heal failed:', e)
+@app.on_event("shutdown")
+def on_shutdown():
+    """Flush queued write transactions before the process exits"""
+    stop_repricing()
+    write_queue.stop(timeout=30)
 
 @app.get("/")
 def read_root():
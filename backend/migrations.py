@@ -0,0 +1,303 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in the ``schema_migrations`` table, so each
+migration runs exactly once per database. Startup only compares the recorded
+version with the latest one (a single query) and returns; pending migrations
+are applied there only when AUTO_MIGRATE is enabled (the default).
+
+Usage (from backend/):
+    python migrations.py status
+    python migrations.py upgrade
+"""
+import os
+import sys
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
+
+SCHEMA_TABLE = "schema_migrations"
+
+def _columns(conn: Connection, table: str) -> set:
+    return {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+
+def _add_missing_columns(conn: Connection, table: str, columns: dict):
+    existing = _columns(conn, table)
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}')
+
+def _m001_orderitem_pricing(conn: Connection):
+    """Pricing columns on orderitem (previously auto-healed on every boot)"""
+    _add_missing_columns(conn, "orderitem", {
+        "product_id": "INTEGER",
+        "quantity": "INTEGER DEFAULT 1",
+        "zone_code": "TEXT",
+        "calculated_unit_price": "REAL",
+        "final_unit_price": "REAL",
+        "pricing_source": "TEXT",
+    })
+    # Backfill from the legacy item_price
+    conn.exec_driver_sql("UPDATE orderitem SET final_unit_price = item_price WHERE final_unit_price IS NULL")
+    conn.exec_driver_sql("UPDATE orderitem SET calculated_unit_price = item_price WHERE calculated_unit_price IS NULL")
+    conn.exec_driver_sql("UPDATE orderitem SET pricing_source = 'Auto' WHERE pricing_source IS NULL")
+
+def _m002_orderitemhistory_price_changes(conn: Connection):
+    """Price change snapshot columns on orderitemhistory"""
+    _add_missing_columns(conn, "orderitemhistory", {
+        "old_price": "REAL",
+        "new_price": "REAL",
+        "price_change_reason": "TEXT",
+    })
+
+# Hot-path indexes; names match what SQLModel.metadata.create_all generates from models.py
+HOT_PATH_INDEXES = [
+    ("ix_user_organization_id", "user", "organization_id"),
+    ("ix_unit_vendor_id", "unit", "vendor_id"),
+    ("ix_product_vendor_id", "product", "vendor_id"),
+    ("ix_order_placed_by_org_id", "order", "placed_by_org_id"),
+    ("ix_orderitem_order_id", "orderitem", "order_id"),
+    ("ix_orderitem_product_id", "orderitem", "product_id"),
+    ("ix_orderitemhistory_item_created", "orderitemhistory", "order_item_id, created_at"),
+    ("ix_invoice_order_id", "invoice", "order_id"),
+    ("ix_document_order_id", "document", "order_id"),
+    ("ix_productzoneadjustment_product_zone_active", "productzoneadjustment", "product_id, zone_code, active"),
+    ("ix_productquantitytier_product_active_min_qty", "productquantitytier", "product_id, active, min_qty"),
+]
+
+def _m003_hot_path_indexes(conn: Connection):
+    """Indexes behind the routers' joins and filters and compute_price's lookups"""
+    for name, table, columns in HOT_PATH_INDEXES:
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({columns})')
+    # Single-column product_id indexes are prefixes of the composites above
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_productzoneadjustment_product_id")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_productquantitytier_product_id")
+    # Give the planner statistics for the new indexes
+    conn.exec_driver_sql("ANALYZE")
+
+def _m004_order_vendor_mapping(conn: Connection):
+    """orderitem.vendor_id and the ordervendor mapping, backfilled from products"""
+    _add_missing_columns(conn, "orderitem", {"vendor_id": "INTEGER REFERENCES organization (id)"})
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_orderitem_vendor_id ON orderitem (vendor_id)")
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS ordervendor ("
+        "order_id INTEGER NOT NULL REFERENCES \"order\" (order_id), "
+        "vendor_id INTEGER NOT NULL REFERENCES organization (id), "
+        "PRIMARY KEY (order_id, vendor_id))"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_ordervendor_vendor_order ON ordervendor (vendor_id, order_id)")
+    conn.exec_driver_sql(
+        "UPDATE orderitem SET vendor_id = "
+        "(SELECT product.vendor_id FROM product WHERE product.product_id = orderitem.product_id) "
+        "WHERE vendor_id IS NULL"
+    )
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO ordervendor (order_id, vendor_id) "
+        "SELECT DISTINCT order_id, vendor_id FROM orderitem WHERE vendor_id IS NOT NULL"
+    )
+    conn.exec_driver_sql("ANALYZE")
+
+def _m005_order_totals(conn: Connection):
+    """Stored order aggregates, backfilled from the order items"""
+    _add_missing_columns(conn, "order", {
+        "line_count": "INTEGER NOT NULL DEFAULT 0",
+        "total_quantity": "INTEGER NOT NULL DEFAULT 0",
+        "total_value": "FLOAT NOT NULL DEFAULT 0",
+        "accepted_count": "INTEGER NOT NULL DEFAULT 0",
+        "out_of_stock_count": "INTEGER NOT NULL DEFAULT 0",
+        "rejected_count": "INTEGER NOT NULL DEFAULT 0",
+        "out_for_delivery_count": "INTEGER NOT NULL DEFAULT 0",
+        "delivered_count": "INTEGER NOT NULL DEFAULT 0",
+    })
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_order_org_total_value ON "order" (placed_by_org_id, total_value)'
+    )
+    # item_status holds enum names
+    status_counts = {
+        "accepted_count": "ACCEPTED",
+        "out_of_stock_count": "OUT_OF_STOCK",
+        "rejected_count": "REJECTED",
+        "out_for_delivery_count": "OUT_FOR_DELIVERY",
+        "delivered_count": "DELIVERED",
+    }
+    conn.exec_driver_sql(
+        'UPDATE "order" SET '
+        "line_count = (SELECT count(*) FROM orderitem i WHERE i.order_id = \"order\".order_id), "
+        "total_quantity = (SELECT coalesce(sum(i.quantity), 0) FROM orderitem i WHERE i.order_id = \"order\".order_id), "
+        "total_value = (SELECT coalesce(round(sum(coalesce(i.quantity, 0) * coalesce(i.final_unit_price, 0)), 2), 0) "
+        "FROM orderitem i WHERE i.order_id = \"order\".order_id), "
+        + ", ".join(
+            f"{column} = (SELECT count(*) FROM orderitem i WHERE i.order_id = \"order\".order_id "
+            f"AND i.item_status = '{name}')"
+            for column, name in status_counts.items()
+        )
+    )
+    conn.exec_driver_sql("ANALYZE")
+
+def _m006_approval_inbox_indexes(conn: Connection):
+    """Indexes behind the pending-approvals inbox and bulk approve/reject"""
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_order_org_status ON "order" (placed_by_org_id, status)'
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_orderapproval_order_status ON orderapproval (order_id, status)"
+    )
+    conn.exec_driver_sql("ANALYZE")
+
+def _m007_user_token_version(conn: Connection):
+    """Per-user token version and deleted-user tombstones for revoking stateless tokens"""
+    _add_missing_columns(conn, "user", {"token_version": "INTEGER NOT NULL DEFAULT 0"})
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_user_token_version ON "user" (token_version) WHERE token_version > 0'
+    )
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS usertombstone ("
+        "tombstone_id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, deleted_at FLOAT NOT NULL)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_usertombstone_deleted_at ON usertombstone (deleted_at)"
+    )
+
+def _m008_orderitem_placed_by_org(conn: Connection):
+    """orderitem.placed_by_org_id, backfilled from orders, for company item pages"""
+    _add_missing_columns(conn, "orderitem", {"placed_by_org_id": "INTEGER REFERENCES organization (id)"})
+    conn.exec_driver_sql(
+        'UPDATE orderitem SET placed_by_org_id = '
+        '(SELECT "order".placed_by_org_id FROM "order" WHERE "order".order_id = orderitem.order_id) '
+        "WHERE placed_by_org_id IS NULL"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_orderitem_org_item ON orderitem (placed_by_org_id, order_item_id)"
+    )
+    conn.exec_driver_sql("ANALYZE")
+
+def _m009_invoice_document_scopes(conn: Connection):
+    """Placing org on invoices/documents and their vendor mappings, backfilled, for list pages"""
+    for table, key in (("invoice", "invoice_id"), ("document", "document_id")):
+        _add_missing_columns(conn, table, {"placed_by_org_id": "INTEGER REFERENCES organization (id)"})
+        conn.exec_driver_sql(
+            f'UPDATE {table} SET placed_by_org_id = '
+            f'(SELECT "order".placed_by_org_id FROM "order" WHERE "order".order_id = {table}.order_id) '
+            "WHERE placed_by_org_id IS NULL"
+        )
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_org_{table} ON {table} (placed_by_org_id, {key})"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {table}vendor ("
+            f"{key} INTEGER NOT NULL REFERENCES {table} ({key}), "
+            "vendor_id INTEGER NOT NULL REFERENCES organization (id), "
+            f"PRIMARY KEY ({key}, vendor_id))"
+        )
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}vendor_vendor_{table} ON {table}vendor (vendor_id, {key})"
+        )
+        conn.exec_driver_sql(
+            f"INSERT OR IGNORE INTO {table}vendor ({key}, vendor_id) "
+            f"SELECT {table}.{key}, ordervendor.vendor_id FROM {table} "
+            f"JOIN ordervendor ON ordervendor.order_id = {table}.order_id"
+        )
+    conn.exec_driver_sql("ANALYZE")
+
+# (version, name, function) in the order they must run; never renumber or edit
+# an applied migration, add a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "orderitem_pricing", _m001_orderitem_pricing),
+    (2, "orderitemhistory_price_changes", _m002_orderitemhistory_price_changes),
+    (3, "hot_path_indexes", _m003_hot_path_indexes),
+    (4, "order_vendor_mapping", _m004_order_vendor_mapping),
+    (5, "order_totals", _m005_order_totals),
+    (6, "approval_inbox_indexes", _m006_approval_inbox_indexes),
+    (7, "user_token_version", _m007_user_token_version),
+    (8, "orderitem_placed_by_org", _m008_orderitem_placed_by_org),
+    (9, "invoice_document_scopes", _m009_invoice_document_scopes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def _ensure_schema_table(conn: Connection):
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE} ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+
+def current_version(conn: Connection) -> int:
+    """Highest applied migration version (0 for an unversioned database)"""
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SCHEMA_TABLE,)
+    ).first()
+    if not exists:
+        return 0
+    return conn.exec_driver_sql(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_TABLE}").scalar()
+
+def upgrade(engine) -> List[int]:
+    """Apply pending migrations, each in its own transaction; returns applied versions"""
+    applied = []
+    with engine.connect() as conn:
+        _ensure_schema_table(conn)
+        conn.commit()
+        for version, name, migrate in MIGRATIONS:
+            # Take the write lock before re-checking so concurrent workers don't double-apply
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                if current_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                migrate(conn)
+                conn.execute(
+                    text(f"INSERT INTO {SCHEMA_TABLE} (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": datetime.utcnow().isoformat()},
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+    return applied
+
+def ensure_schema_current(engine):
+    """Startup check: return immediately when the schema is up to date"""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return
+    if not AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {LATEST_VERSION}. "
+            "Run `python migrations.py upgrade`."
+        )
+    applied = upgrade(engine)
+    if applied:
+        print(f"Applied schema migrations: {applied}")
+
+def _database_exists(engine) -> bool:
+    path = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not path or path == ":memory:" or path.startswith("file:"):
+        return True
+    return os.path.exists(path)
+
+def main(argv: List[str]) -> int:
+    from database import engine, create_db_and_tables
+    import models  # noqa: F401  register tables on the metadata
+
+    command = argv[1] if len(argv) > 1 else "status"
+    if command == "upgrade":
+        create_db_and_tables()
+        applied = upgrade(engine)
+        print(f"Applied migrations: {applied}" if applied else "Nothing to apply")
+    elif command != "status":
+        print(__doc__)
+        return 2
+    elif not _database_exists(engine):
+        # Connecting would create an empty database file
+        print(f"Database not found: {engine.url.database}")
+        return 1
+    with engine.connect() as conn:
+        version = current_version(conn)
+    print(f"Schema version: {version} (latest {LATEST_VERSION})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -44,12 +45,19 @@ class UserBase(SQLModel):
     full_name: str
     phone_number: str = Field(unique=True, index=True)
     role: UserRole
-    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id", index=True)
     organization_type: OrganizationType
 
 class User(UserBase, table=True):
+    # Users with revoked tokens: small, scanned by the stateless-auth revocation map
+    __table_args__ = (
+        Index("ix_user_token_version", "token_version", sqlite_where=text("token_version > 0")),
+    )
+
     user_id: Optional[int] = Field(default=None, primary_key=True)
     password_hash: str
+    # Bumped when the user's role changes; stateless tokens carry the version they were issued with
+    token_version: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     created_by: Optional[int] = Field(default=None, foreign_key="user.user_id")
     updated_by: Optional[int] = Field(default=None, foreign_key="user.user_id")
@@ -112,7 +120,7 @@ class ProductBase(SQLModel):
     product_description: Optional[str] = None
     price: float
     unit_id: int = Field(foreign_key="unit.unit_id")
-    vendor_id: int = Field(foreign_key="organization.id")
+    vendor_id: int = Field(foreign_key="organization.id", index=True)
 
 class Product(ProductBase, table=True):
     product_id: Optional[int] = Field(default=None, primary_key=True)
@@ -145,7 +153,7 @@ class ProductRead(ProductBase):
 class UnitBase(SQLModel):
     unit_name: str
     unit_description: Optional[str] = None
-    vendor_id: int = Field(foreign_key="organization.id")
+    vendor_id: int = Field(foreign_key="organization.id", index=True)
 
 class Unit(UnitBase, table=True):
     unit_id: Optional[int] = Field(default=None, primary_key=True)
@@ -173,10 +181,17 @@ class UnitUpdateInput(SQLModel):
 
 # Order model
 class OrderBase(SQLModel):
-    placed_by_org_id: int = Field(foreign_key="organization.id")
+    placed_by_org_id: int = Field(foreign_key="organization.id", index=True)
     status: OrderStatus = OrderStatus.REQUESTED
 
 class Order(OrderBase, table=True):
+    # A company's orders by value, and by status for the approval inbox
+    # (order_id is the implicit last key of both)
+    __table_args__ = (
+        Index("ix_order_org_total_value", "placed_by_org_id", "total_value"),
+        Index("ix_order_org_status", "placed_by_org_id", "status"),
+    )
+
     order_id: Optional[int] = Field(default=None, primary_key=True)
     placed_by_user_id: int = Field(foreign_key="user.user_id")
     approved_by_user_id: Optional[int] = Field(default=None, foreign_key="user.user_id")
@@ -184,6 +199,15 @@ class Order(OrderBase, table=True):
     placed_at: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Aggregates of the order's items, maintained by order_totals.py
+    line_count: int = 0
+    total_quantity: int = 0
+    total_value: float = 0.0
+    accepted_count: int = 0
+    out_of_stock_count: int = 0
+    rejected_count: int = 0
+    out_for_delivery_count: int = 0
+    delivered_count: int = 0
     
     # Relationships
     placed_by_user: Optional[User] = Relationship(back_populates="placed_orders", sa_relationship_kwargs={"foreign_keys": "Order.placed_by_user_id"})
@@ -203,11 +227,20 @@ class OrderRead(OrderBase):
     placed_at: datetime
     created_at: datetime
     updated_at: datetime
+    # None where the caller may not see them (see order_totals.vendor_order_view)
+    line_count: Optional[int] = 0
+    total_quantity: Optional[int] = 0
+    total_value: Optional[float] = 0.0
+    accepted_count: Optional[int] = 0
+    out_of_stock_count: Optional[int] = 0
+    rejected_count: Optional[int] = 0
+    out_for_delivery_count: Optional[int] = 0
+    delivered_count: Optional[int] = 0
 
 # Order Item model
 class OrderItemBase(SQLModel):
-    order_id: int = Field(foreign_key="order.order_id")
-    product_id: int = Field(foreign_key="product.product_id")  # Direct reference to product
+    order_id: int = Field(foreign_key="order.order_id", index=True)
+    product_id: int = Field(foreign_key="product.product_id", index=True)  # Direct reference to product
     item_name: str
     item_price: float | None = None
     item_status: ItemStatus = ItemStatus.ACCEPTED
@@ -220,7 +253,17 @@ class OrderItemBase(SQLModel):
     pricing_source: Optional[str] = None  # 'Auto' | 'ManualOverride'
 
 class OrderItem(OrderItemBase, table=True):
+    # A company's items in order_item_id order, so item pages don't sort the org's history
+    __table_args__ = (
+        Index("ix_orderitem_org_item", "placed_by_org_id", "order_item_id"),
+    )
+
     order_item_id: Optional[int] = Field(default=None, primary_key=True)
+    # Copy of product.vendor_id, set when the item is created; the index also
+    # yields a vendor's items in order_item_id order (rowid is the implicit last key)
+    vendor_id: Optional[int] = Field(default=None, foreign_key="organization.id", index=True)
+    # Copy of order.placed_by_org_id, set when the item is created
+    placed_by_org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     # Relationships
@@ -228,6 +271,24 @@ class OrderItem(OrderItemBase, table=True):
     product: Optional[Product] = Relationship()
     history: List["OrderItemHistory"] = Relationship(back_populates="order_item")
 
+# Deleted users whose stateless tokens may not have expired yet (see token_versions.py);
+# user ids can be reused, so each deletion gets its own row
+class UserTombstone(SQLModel, table=True):
+    tombstone_id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    # Epoch seconds, comparable with the tokens' iat claim
+    deleted_at: float = Field(index=True)
+
+# Vendors with at least one item in an order; maintained whenever items are added
+class OrderVendor(SQLModel, table=True):
+    # The primary key serves per-order access checks; this index the vendor's order list
+    __table_args__ = (
+        Index("ix_ordervendor_vendor_order", "vendor_id", "order_id"),
+    )
+
+    order_id: int = Field(foreign_key="order.order_id", primary_key=True)
+    vendor_id: int = Field(foreign_key="organization.id", primary_key=True)
+
 class OrderItemCreate(OrderItemBase):
     pass
 
@@ -240,6 +301,46 @@ class OrderItemRead(OrderItemBase):
     order_item_id: int
     created_at: datetime
 
+class OrderItemStatusChange(SQLModel):
+    order_item_id: int
+    new_status: ItemStatus
+
+class OrderItemPriceOverride(SQLModel):
+    order_item_id: int
+    new_price: float
+    reason: Optional[str] = None
+
+class OrderItemBulkPriceOverride(SQLModel):
+    items: List[OrderItemPriceOverride]
+
+class OrderItemBulkStatusUpdate(SQLModel):
+    # Either explicit (order_item_id, new_status) pairs, or order_id + new_status for all of the vendor's lines in it
+    items: List[OrderItemStatusChange] = []
+    order_id: Optional[int] = None
+    new_status: Optional[ItemStatus] = None
+
+class CheckoutLine(SQLModel):
+    product_id: int
+    quantity: int = 1
+    zone_code: Optional[str] = None
+    item_name: Optional[str] = None
+    purchase_order: Optional[str] = None
+
+class CheckoutRequest(SQLModel):
+    lines: List[CheckoutLine]
+
+class OrderWithItemsRead(OrderRead):
+    order_items: List[OrderItemRead] = []
+
+class OrderBulkStatusUpdate(SQLModel):
+    order_ids: List[int]
+    status: OrderStatus
+    expected_status: Optional[OrderStatus] = None  # only move orders currently in this status
+
+class OrderBulkStatusResult(SQLModel):
+    updated: List[int]
+    skipped: List[int]  # not found, not yours, or not in a status that can move to the target
+
 # Order Item History model
 class OrderItemHistoryBase(SQLModel):
     order_item_id: int = Field(foreign_key="orderitem.order_item_id")
@@ -250,6 +351,11 @@ class OrderItemHistoryBase(SQLModel):
     price_change_reason: Optional[str] = None
 
 class OrderItemHistory(OrderItemHistoryBase, table=True):
+    # Serves the per-item history listing (newest first) without a sort
+    __table_args__ = (
+        Index("ix_orderitemhistory_item_created", "order_item_id", "created_at"),
+    )
+
     order_item_history_id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -265,8 +371,13 @@ class OrderItemHistoryRead(OrderItemHistoryBase):
 
 # Pricing rule tables (Phase 2)
 class ProductZoneAdjustment(SQLModel, table=True):
+    # Serves the per-product active zone load in pricing_engine and per-product listing
+    __table_args__ = (
+        Index("ix_productzoneadjustment_product_zone_active", "product_id", "zone_code", "active"),
+    )
+
     product_zone_adjustment_id: Optional[int] = Field(default=None, primary_key=True)
-    product_id: int = Field(foreign_key="product.product_id", index=True)
+    product_id: int = Field(foreign_key="product.product_id")
     zone_code: str  # e.g., 'NEAR', 'MID', 'FAR'
     adjustment_type: str  # 'Absolute' | 'Percent'
     amount: float
@@ -285,8 +396,13 @@ class ProductZoneAdjustmentRead(ProductZoneAdjustmentCreate):
     created_at: datetime
 
 class ProductQuantityTier(SQLModel, table=True):
+    # Serves the per-product active tier load in pricing_engine (already in min_qty order)
+    __table_args__ = (
+        Index("ix_productquantitytier_product_active_min_qty", "product_id", "active", "min_qty"),
+    )
+
     product_quantity_tier_id: Optional[int] = Field(default=None, primary_key=True)
-    product_id: int = Field(foreign_key="product.product_id", index=True)
+    product_id: int = Field(foreign_key="product.product_id")
     min_qty: int
     discount_type: str  # 'Absolute' | 'Percent'
     discount_amount: float
@@ -304,19 +420,44 @@ class ProductQuantityTierRead(ProductQuantityTierCreate):
     product_id: int
     created_at: datetime
 
+class PriceQuoteLine(SQLModel):
+    product_id: int
+    quantity: int = 1
+    zone_code: Optional[str] = None
+
+class PriceQuoteBatch(SQLModel):
+    lines: List[PriceQuoteLine]
+
 # Invoice model
 class InvoiceBase(SQLModel):
-    order_id: int = Field(foreign_key="order.order_id")
+    order_id: int = Field(foreign_key="order.order_id", index=True)
     file_url: str
 
 class Invoice(InvoiceBase, table=True):
+    # A company's invoices in invoice_id order (list pages)
+    __table_args__ = (
+        Index("ix_invoice_org_invoice", "placed_by_org_id", "invoice_id"),
+    )
+
     invoice_id: Optional[int] = Field(default=None, primary_key=True)
     created_by_user_id: int = Field(foreign_key="user.user_id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Copy of order.placed_by_org_id, set when the invoice is created
+    placed_by_org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
     
     # Relationships
     order: Optional[Order] = Relationship(back_populates="invoices")
 
+# Vendors with items in an invoice's order; maintained by order_vendors.py
+class InvoiceVendor(SQLModel, table=True):
+    # The index serves the vendor's invoice list in invoice_id order
+    __table_args__ = (
+        Index("ix_invoicevendor_vendor_invoice", "vendor_id", "invoice_id"),
+    )
+
+    invoice_id: int = Field(foreign_key="invoice.invoice_id", primary_key=True)
+    vendor_id: int = Field(foreign_key="organization.id", primary_key=True)
+
 class InvoiceCreate(InvoiceBase):
     pass
 
@@ -327,18 +468,35 @@ class InvoiceRead(InvoiceBase):
 
 # Document model
 class DocumentBase(SQLModel):
-    order_id: int = Field(foreign_key="order.order_id")
+    order_id: int = Field(foreign_key="order.order_id", index=True)
     file_url: str
     document_type: DocumentType
 
 class Document(DocumentBase, table=True):
+    # A company's documents in document_id order (list pages)
+    __table_args__ = (
+        Index("ix_document_org_document", "placed_by_org_id", "document_id"),
+    )
+
     document_id: Optional[int] = Field(default=None, primary_key=True)
     uploaded_by_user_id: int = Field(foreign_key="user.user_id")
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    # Copy of order.placed_by_org_id, set when the document is uploaded
+    placed_by_org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
     
     # Relationships
     order: Optional[Order] = Relationship(back_populates="documents")
 
+# Vendors with items in a document's order; maintained by order_vendors.py
+class DocumentVendor(SQLModel, table=True):
+    # The index serves the vendor's document list in document_id order
+    __table_args__ = (
+        Index("ix_documentvendor_vendor_document", "vendor_id", "document_id"),
+    )
+
+    document_id: int = Field(foreign_key="document.document_id", primary_key=True)
+    vendor_id: int = Field(foreign_key="organization.id", primary_key=True)
+
 class DocumentCreate(DocumentBase):
     pass
 
@@ -354,6 +512,11 @@ class OrderApprovalBase(SQLModel):
     status: ApprovalStatus = ApprovalStatus.PENDING
 
 class OrderApproval(OrderApprovalBase, table=True):
+    # Pending approval of an order: inbox join and approve/reject lookups
+    __table_args__ = (
+        Index("ix_orderapproval_order_status", "order_id", "status"),
+    )
+
     approval_id: Optional[int] = Field(default=None, primary_key=True)
     approved_by_user_id: Optional[int] = Field(default=None, foreign_key="user.user_id")
     requested_at: datetime = Field(default_factory=datetime.utcnow)
@@ -369,3 +532,22 @@ class OrderApprovalRead(OrderApprovalBase):
     approval_id: int
     requested_at: datetime
     approved_at: Optional[datetime] = None
+
+class PendingApprovalRead(OrderApprovalRead):
+    order_line_count: int
+    order_total_value: float
+    order_placed_at: datetime
+
+class OrderApprovalBulkDecision(SQLModel):
+    order_ids: List[int]
+    status: ApprovalStatus
+
+# Order detail: the order with everything the caller may see, in one response
+class OrderItemWithHistoryRead(OrderItemRead):
+    history: List[OrderItemHistoryRead] = []
+
+class OrderDetailRead(OrderRead):
+    order_items: List[OrderItemWithHistoryRead] = []
+    approvals: List[OrderApprovalRead] = []
+    invoices: List[InvoiceRead] = []
+    documents: List[DocumentRead] = []
@@ -0,0 +1,96 @@
+"""Order status state machine with compare-and-swap transitions.
+
+A transition is one conditional ``UPDATE "order" SET status = :new WHERE
+order_id IN (...) AND status IN (:expected) AND <caller's scope>``; the rows
+it returns are exactly the orders that moved, so two users racing to accept
+the same order can't both succeed. RETURNING only sees the new values, so
+the previous statuses come from a primary-key read just before the UPDATE;
+both run in the writer's transaction, which holds SQLite's write lock, so
+nothing can change the rows in between. Callers only read the order
+afterwards, to explain why nothing moved.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import exists, select, update
+from sqlmodel import Session
+from models import ApprovalStatus, Order, OrderApproval, OrderStatus, OrderVendor, OrganizationType, User
+
+# Allowed moves; Delivered and Rejected are final
+ORDER_TRANSITIONS: Dict[OrderStatus, Set[OrderStatus]] = {
+    OrderStatus.REQUESTED: {OrderStatus.APPROVED, OrderStatus.WAITING_TO_BE_ACCEPTED, OrderStatus.REJECTED},
+    OrderStatus.APPROVED: {OrderStatus.WAITING_TO_BE_ACCEPTED, OrderStatus.ACCEPTED, OrderStatus.REJECTED},
+    OrderStatus.WAITING_TO_BE_ACCEPTED: {OrderStatus.ACCEPTED, OrderStatus.REJECTED},
+    OrderStatus.ACCEPTED: {OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED, OrderStatus.REJECTED},
+    OrderStatus.OUT_FOR_DELIVERY: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.REJECTED: set(),
+}
+
+def can_transition(old: OrderStatus, new: OrderStatus) -> bool:
+    return new in ORDER_TRANSITIONS.get(old, set())
+
+def sources_of(target: OrderStatus) -> List[OrderStatus]:
+    """Statuses an order may move to ``target`` from"""
+    return [status for status, targets in ORDER_TRANSITIONS.items() if target in targets]
+
+def order_scope(current_user: User):
+    """SQL condition for orders the user's organization may change (None = unrestricted)"""
+    table = Order.__table__
+    if current_user.organization_type == OrganizationType.COMPANY:
+        return table.c.placed_by_org_id == current_user.organization_id
+    if current_user.organization_type == OrganizationType.VENDOR:
+        mapping = OrderVendor.__table__
+        return exists().where(mapping.c.order_id == table.c.order_id).where(
+            mapping.c.vendor_id == current_user.organization_id
+        )
+    return None
+
+def transition_orders(session: Session, order_ids: Iterable[int], target: OrderStatus,
+                      expected: Optional[Iterable[OrderStatus]] = None, scope=None,
+                      values: Optional[dict] = None, allow_any: bool = False) -> List[Tuple[int, int, OrderStatus]]:
+    """Move every order in ``order_ids`` whose status is in ``expected`` (default: any status
+    allowed to reach ``target``) and that matches ``scope``, in one UPDATE. ``allow_any``
+    skips the transition table (AppOwner corrections).
+    Returns (order_id, placed_by_org_id, previous status) of the orders that moved.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    if allow_any:
+        expected = list(expected) if expected is not None else list(OrderStatus)
+    else:
+        expected = [s for s in (expected if expected is not None else sources_of(target)) if can_transition(s, target)]
+    if not order_ids or not expected:
+        return []
+    table = Order.__table__
+    previous = dict(session.execute(
+        select(table.c.order_id, table.c.status).where(table.c.order_id.in_(order_ids))
+    ).all())
+    statement = (
+        update(table)
+        .where(table.c.order_id.in_(order_ids))
+        .where(table.c.status.in_(expected))
+        .values(status=target, updated_at=datetime.utcnow(), **(values or {}))
+        .returning(table.c.order_id, table.c.placed_by_org_id)
+    )
+    if scope is not None:
+        statement = statement.where(scope)
+    return [(order_id, org_id, previous[order_id]) for order_id, org_id in session.execute(statement).all()]
+
+def transition_order(session: Session, order_id: int, target: OrderStatus,
+                     expected: Optional[Iterable[OrderStatus]] = None, scope=None,
+                     values: Optional[dict] = None, allow_any: bool = False) -> Optional[Tuple[int, OrderStatus]]:
+    """Single-order transition; returns (placed_by_org_id, previous status) if it moved, else None"""
+    moved = transition_orders(session, [order_id], target, expected, scope, values, allow_any)
+    return moved[0][1:] if moved else None
+
+def resolve_pending_approvals(session: Session, order_ids: Iterable[int], decision: ApprovalStatus, user_id: int):
+    """Close the pending approval requests of ``order_ids`` with ``decision`` (one UPDATE)"""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    table = OrderApproval.__table__
+    session.execute(
+        update(table)
+        .where(table.c.order_id.in_(order_ids))
+        .where(table.c.status == ApprovalStatus.PENDING)
+        .values(status=decision, approved_by_user_id=user_id, approved_at=datetime.utcnow())
+    )
@@ -0,0 +1,103 @@
+"""Maintenance of the stored per-order aggregates.
+
+Order.line_count, total_quantity, total_value (sum of quantity *
+final_unit_price) and the per-status item counts are kept up to date by the
+code paths that write order items, in the same write transaction, so order
+lists can show, sort and filter by totals without reading any items.
+Single-line changes apply deltas with one ``UPDATE "order" SET x = x + ...``;
+bulk rewrites (repricing) recompute the affected orders from their items.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import case, func, select, update
+from sqlmodel import Session
+from models import Order, OrderItem, ItemStatus
+
+# Item status -> Order column counting items in that status
+STATUS_COLUMNS: Dict[ItemStatus, str] = {
+    ItemStatus.ACCEPTED: "accepted_count",
+    ItemStatus.OUT_OF_STOCK: "out_of_stock_count",
+    ItemStatus.REJECTED: "rejected_count",
+    ItemStatus.OUT_FOR_DELIVERY: "out_for_delivery_count",
+    ItemStatus.DELIVERED: "delivered_count",
+}
+
+# Every stored aggregate column, as exposed on OrderRead
+TOTAL_COLUMNS = ["line_count", "total_quantity", "total_value", *STATUS_COLUMNS.values()]
+
+def line_value(quantity: Optional[int], unit_price: Optional[float]) -> float:
+    """Value of one order line; unpriced lines count as 0"""
+    return (quantity or 0) * (unit_price or 0.0)
+
+def totals_for_lines(lines: Iterable[Tuple[Optional[int], Optional[float], ItemStatus]]) -> Dict[str, float]:
+    """Aggregate column values of (quantity, final_unit_price, item_status) lines"""
+    totals: Dict[str, float] = {"line_count": 0, "total_quantity": 0, "total_value": 0.0}
+    for quantity, unit_price, item_status in lines:
+        totals["line_count"] += 1
+        totals["total_quantity"] += quantity or 0
+        totals["total_value"] += line_value(quantity, unit_price)
+        column = STATUS_COLUMNS[ItemStatus(item_status)]
+        totals[column] = totals.get(column, 0) + 1
+    totals["total_value"] = round(totals["total_value"], 2)
+    return totals
+
+def vendor_order_view(order: Order, lines=None, hide_prices: bool = False) -> dict:
+    """An order as a vendor may see it. The stored totals cover every vendor's lines,
+    so they are replaced by totals of the vendor's own ``lines`` (model rows), or
+    hidden when the lines aren't at hand; ``hide_prices`` drops the value as well.
+    """
+    view = {**order.dict(), **dict.fromkeys(TOTAL_COLUMNS)}
+    if lines is not None:
+        view.update(dict.fromkeys(TOTAL_COLUMNS, 0))
+        view.update(totals_for_lines((it.quantity, it.final_unit_price, it.item_status) for it in lines))
+    if hide_prices:
+        view["total_value"] = None
+    return view
+
+def _apply_deltas(session: Session, order_id: int, deltas: Dict[str, float]):
+    table = Order.__table__
+    values = {name: table.c[name] + delta for name, delta in deltas.items() if delta}
+    if "total_value" in values:
+        values["total_value"] = func.round(values["total_value"], 2)
+    if values:
+        session.execute(update(table).where(table.c.order_id == order_id).values(**values))
+
+def add_order_lines(session: Session, order_id: int, lines: Iterable[Tuple[Optional[int], Optional[float], ItemStatus]]):
+    """Count new (quantity, final_unit_price, item_status) lines into the order's totals"""
+    _apply_deltas(session, order_id, totals_for_lines(lines))
+
+def change_line_price(session: Session, order_id: int, quantity: Optional[int],
+                      old_price: Optional[float], new_price: Optional[float]):
+    """Move the order's total_value for a line whose final_unit_price changed"""
+    _apply_deltas(session, order_id, {"total_value": line_value(quantity, new_price) - line_value(quantity, old_price)})
+
+def change_line_status(session: Session, order_id: int, old_status: ItemStatus, new_status: ItemStatus):
+    """Move one line between the order's per-status counts"""
+    old_column, new_column = STATUS_COLUMNS[ItemStatus(old_status)], STATUS_COLUMNS[ItemStatus(new_status)]
+    if old_column != new_column:
+        _apply_deltas(session, order_id, {old_column: -1, new_column: 1})
+
+def recompute_order_totals(session: Session, order_ids: Iterable[int]):
+    """Recompute the totals of ``order_ids`` from their items (one UPDATE, served by ix_orderitem_order_id)"""
+    order_ids = list(set(order_ids))
+    if not order_ids:
+        return
+    table = Order.__table__
+    items = OrderItem.__table__
+
+    def _aggregate(expression):
+        return (
+            select(func.coalesce(expression, 0))
+            .where(items.c.order_id == table.c.order_id)
+            .scalar_subquery()
+        )
+
+    values = {
+        "line_count": _aggregate(func.count()),
+        "total_quantity": _aggregate(func.sum(items.c.quantity)),
+        "total_value": _aggregate(func.round(
+            func.sum(func.coalesce(items.c.quantity, 0) * func.coalesce(items.c.final_unit_price, 0)), 2
+        )),
+    }
+    for item_status, column in STATUS_COLUMNS.items():
+        values[column] = _aggregate(func.sum(case((items.c.item_status == item_status, 1), else_=0)))
+    session.execute(update(table).where(table.c.order_id.in_(order_ids)).values(**values))
@@ -0,0 +1,49 @@
+"""Maintenance of the denormalized order -> vendor mapping.
+
+OrderItem.vendor_id copies the product's vendor and the OrderVendor table
+holds one row per (order, vendor) pair, so vendor order lists and access
+checks are single indexed lookups instead of OrderItem x Product joins.
+Every code path that inserts order items must call link_order_vendors in
+the same write transaction.
+
+InvoiceVendor and DocumentVendor extend the mapping to the order's invoices
+and documents so vendor lists page on a (vendor_id, id) index. They are
+filled by share_order_records, which link_order_vendors calls for vendors
+joining an order and the invoice/document routers call for new records.
+"""
+from typing import Iterable, List
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+from models import Document, DocumentVendor, Invoice, InvoiceVendor, OrderVendor
+
+# (records, their vendor mapping, key column)
+_RECORD_MAPPINGS = [
+    (Invoice.__table__, InvoiceVendor.__table__, "invoice_id"),
+    (Document.__table__, DocumentVendor.__table__, "document_id"),
+]
+
+def link_order_vendors(session: Session, order_id: int, vendor_ids: Iterable[int]):
+    """Record that ``vendor_ids`` have items in ``order_id`` (idempotent)"""
+    rows = [{"order_id": order_id, "vendor_id": vendor_id} for vendor_id in set(vendor_ids) if vendor_id is not None]
+    if rows:
+        session.execute(insert(OrderVendor.__table__).on_conflict_do_nothing(), rows)
+        share_order_records(session, order_id)
+
+def share_order_records(session: Session, order_id: int):
+    """Map the order's invoices and documents to every vendor with items in it (idempotent)"""
+    mapping = OrderVendor.__table__
+    for records, vendors, key in _RECORD_MAPPINGS:
+        pairs = (
+            select(records.c[key], mapping.c.vendor_id)
+            .join(mapping, mapping.c.order_id == records.c.order_id)
+            .where(records.c.order_id == order_id)
+        )
+        session.execute(insert(vendors).from_select([key, "vendor_id"], pairs).on_conflict_do_nothing())
+
+def vendor_has_order(session: Session, order_id: int, vendor_id: int) -> bool:
+    """Whether the vendor has items in the order (primary key lookup)"""
+    return session.get(OrderVendor, (order_id, vendor_id)) is not None
+
+def order_vendor_ids(session: Session, order_id: int) -> List[int]:
+    """Vendors with items in the order (primary key prefix scan)"""
+    return list(session.exec(select(OrderVendor.vendor_id).where(OrderVendor.order_id == order_id)).all())
@@ -0,0 +1,78 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Pages are ordered by primary key, or by a sort column with the primary key
+as tie-breaker. ``cursor`` is an opaque token holding the last key (and sort
+value) of the previous page, so the next page is ``WHERE pk > :last`` (or
+``(sort, pk) > (:value, :last)``) served from an index no matter how deep it
+is, and rows inserted meanwhile never shift later pages. The old ``skip`` offset is still accepted when no
+cursor is given. When more rows exist the response carries the next cursor
+in ``X-Next-Cursor`` and as a ``Link: <...>; rel="next"`` header.
+"""
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import tuple_
+from sqlmodel import Session
+
+CURSOR_VERSION = 1
+
+def encode_cursor(last_key: int, sort_value: Any = None) -> str:
+    data = {"v": CURSOR_VERSION, "k": last_key}
+    if sort_value is not None:
+        data["s"] = sort_value
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sorted_by_value: bool = False) -> Tuple[int, Any]:
+    """(last key, last sort value) of a cursor; the sort value is None for plain key order"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data.get("v") != CURSOR_VERSION or not isinstance(data.get("k"), int):
+            raise ValueError
+        if sorted_by_value != ("s" in data):
+            raise ValueError
+        return data["k"], data.get("s")
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(session: Session, query, key_column, limit: int, skip: int = 0,
+             cursor: Optional[str] = None, sort_column=None, descending: bool = False) -> Tuple[List[Any], Optional[str]]:
+    """Run ``query`` ordered by ``key_column`` for one page; returns (rows, next cursor or None).
+    With ``sort_column`` pages are ordered by (sort_column, key_column), ascending or descending.
+    """
+    if limit <= 0:
+        return [], None
+    if sort_column is None:
+        query = query.order_by(key_column)
+    elif descending:
+        query = query.order_by(sort_column.desc(), key_column.desc())
+    else:
+        query = query.order_by(sort_column, key_column)
+    if cursor:
+        last_key, last_value = decode_cursor(cursor, sort_column is not None)
+        if sort_column is None:
+            query = query.where(key_column > last_key)
+        elif descending:
+            query = query.where(tuple_(sort_column, key_column) < tuple_(last_value, last_key))
+        else:
+            query = query.where(tuple_(sort_column, key_column) > tuple_(last_value, last_key))
+    elif skip:
+        query = query.offset(skip)
+    # One extra row tells whether another page exists
+    rows = session.exec(query.limit(limit + 1)).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+    return rows, encode_cursor(getattr(last, key_column.key), sort_value)
+
+def set_next_page_headers(request: Request, response: Response, next_cursor: Optional[str]):
+    """Advertise the next page via X-Next-Cursor and a Link rel="next" header"""
+    if not next_cursor:
+        return
+    url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{url}>; rel="next"'
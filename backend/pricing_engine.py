@@ -1,15 +1,177 @@
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session as _ORMSession
 from sqlmodel import Session, select
 from models import Product, ProductZoneAdjustment, ProductQuantityTier
-from typing import Optional, Dict, Any
+from writer import WRITER_JOB
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 
-def compute_price(session: Session, product_id: int, quantity: int, zone_code: Optional[str]) -> Dict[str, Any]:
-    """Compute pricing for a product given quantity and zone.
-    Returns dict with keys: base_price, zone_adjustment, tier_discount, unit_price, applied_zone, applied_tier.
+# Compiled pricing rules per product; 0 disables the cache
+PRICING_CACHE_SIZE = int(os.getenv("PRICING_CACHE_SIZE", "10000"))
+# Upper bound on staleness for changes made outside this process (other workers, scripts)
+PRICING_CACHE_TTL = float(os.getenv("PRICING_CACHE_TTL", "60"))
+
+class CompiledRules:
+    """Active pricing rules of one product in lookup-ready form"""
+    __slots__ = ("base_price", "zones", "tier_min_qtys", "tiers", "expires_at")
+
+    def __init__(self, base_price: float, zones: Dict[str, Tuple[str, float]], tiers: List[Tuple[int, str, float]]):
+        self.base_price = base_price
+        # zone_code -> (adjustment_type, amount)
+        self.zones = zones
+        # (min_qty, discount_type, discount_amount) sorted by min_qty; bisect over tier_min_qtys
+        self.tiers = tiers
+        self.tier_min_qtys = [t[0] for t in tiers]
+        self.expires_at = time.monotonic() + PRICING_CACHE_TTL
+
+class PricingRuleCache:
+    """Bounded LRU of CompiledRules keyed by product_id.
+
+    Every invalidation bumps a generation counter. Sessions record the
+    generation when their transaction begins, and rules loaded through a
+    session are only stored if nothing was invalidated since, so a reader
+    whose snapshot predates a rule change can't cache the old rules.
     """
-    product = session.get(Product, product_id)
-    if not product:
+
+    def __init__(self, max_size: int = PRICING_CACHE_SIZE):
+        self.max_size = max_size
+        self.generation = 0
+        self._entries: "OrderedDict[int, CompiledRules]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product_id: int) -> Optional[CompiledRules]:
+        with self._lock:
+            rules = self._entries.get(product_id)
+            if rules is None:
+                return None
+            if rules.expires_at <= time.monotonic():
+                del self._entries[product_id]
+                return None
+            self._entries.move_to_end(product_id)
+            return rules
+
+    def put(self, product_id: int, rules: CompiledRules, generation: int):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[product_id] = rules
+            self._entries.move_to_end(product_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, product_id: int):
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+rule_cache = PricingRuleCache()
+
+@event.listens_for(_ORMSession, "after_begin")
+def _stamp_pricing_generation(session, transaction, connection):
+    # Only the outermost transaction fixes the snapshot
+    session.info.setdefault("pricing_generation", rule_cache.generation)
+
+@event.listens_for(_ORMSession, "after_transaction_end")
+def _clear_pricing_generation(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("pricing_generation", None)
+
+def invalidate_product(product_id: int):
+    """Drop a product's compiled rules; call after its price, zones or tiers change"""
+    rule_cache.invalidate(product_id)
+
+def invalidate_all():
+    rule_cache.clear()
+
+# Bound parameters per IN (...) query; stays well under SQLite's variable limit
+PRICING_LOAD_CHUNK = 500
+
+def _chunked(items: List[int], size: int = PRICING_LOAD_CHUNK) -> Iterable[List[int]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _load_rules(session: Session, product_ids: List[int]) -> Dict[int, CompiledRules]:
+    """Load and compile the active rules of many products with set-based queries"""
+    prices: Dict[int, float] = {}
+    zone_rows = []
+    tier_rows = []
+    for chunk in _chunked(product_ids):
+        prices.update(session.exec(
+            select(Product.product_id, Product.price).where(Product.product_id.in_(chunk))
+        ).all())
+        zone_rows.extend(session.exec(
+            select(
+                ProductZoneAdjustment.product_zone_adjustment_id, ProductZoneAdjustment.product_id,
+                ProductZoneAdjustment.zone_code, ProductZoneAdjustment.adjustment_type, ProductZoneAdjustment.amount,
+            )
+            .where(ProductZoneAdjustment.product_id.in_(chunk))
+            .where(ProductZoneAdjustment.active == True)
+        ).all())
+        tier_rows.extend(session.exec(
+            select(
+                ProductQuantityTier.product_quantity_tier_id, ProductQuantityTier.product_id,
+                ProductQuantityTier.min_qty, ProductQuantityTier.discount_type, ProductQuantityTier.discount_amount,
+            )
+            .where(ProductQuantityTier.product_id.in_(chunk))
+            .where(ProductQuantityTier.active == True)
+        ).all())
+
+    zones: Dict[int, Dict[str, Tuple[str, float]]] = {pid: {} for pid in prices}
+    # Lowest id wins for duplicate zone codes, like the index-ordered .first() lookup did
+    for _, product_id, zone_code, adjustment_type, amount in sorted(zone_rows):
+        if product_id in zones:
+            zones[product_id].setdefault(zone_code, (adjustment_type, amount))
+    tiers: Dict[int, List[Tuple[int, str, float]]] = {pid: [] for pid in prices}
+    # Ties on min_qty go to the highest id (last in this order), matching ORDER BY min_qty DESC
+    for _, product_id, min_qty, discount_type, discount_amount in sorted(tier_rows, key=lambda t: (t[2], t[0])):
+        if product_id in tiers:
+            tiers[product_id].append((min_qty, discount_type, discount_amount))
+
+    return {pid: CompiledRules(price, zones[pid], tiers[pid]) for pid, price in prices.items()}
+
+def get_rules_many(session: Session, product_ids: Iterable[int]) -> Dict[int, CompiledRules]:
+    """Compiled rules for each existing product in ``product_ids``; unknown ids are left out"""
+    found: Dict[int, CompiledRules] = {}
+    misses = []
+    for product_id in dict.fromkeys(product_ids):
+        rules = rule_cache.get(product_id)
+        if rules is None:
+            misses.append(product_id)
+        else:
+            found[product_id] = rules
+    if not misses:
+        return found
+    # Sessions that aren't in a transaction yet will begin one with the current generation
+    generation = session.info.get("pricing_generation", rule_cache.generation)
+    loaded = _load_rules(session, misses)
+    # Writer jobs run in savepoints and may see uncommitted rule changes; don't cache those
+    if not session.info.get(WRITER_JOB):
+        for product_id, rules in loaded.items():
+            rule_cache.put(product_id, rules, generation)
+    found.update(loaded)
+    return found
+
+def get_rules(session: Session, product_id: int) -> CompiledRules:
+    """Compiled rules for a product, from the cache or loaded through ``session``"""
+    rules = get_rules_many(session, [product_id]).get(product_id)
+    if rules is None:
         raise ValueError("Product not found")
-    base_price = product.price
+    return rules
+
+def apply_rules(rules: CompiledRules, quantity: int, zone_code: Optional[str]) -> Dict[str, Any]:
+    """Price ``quantity`` units in ``zone_code`` using compiled rules"""
+    base_price = rules.base_price
     price = base_price
 
     applied_zone = None
@@ -17,33 +179,23 @@ def compute_price(session: Session, product_id: int, quantity: int, zone_code: O
 
     # Zone adjustment
     if zone_code:
-        zone = session.exec(
-            select(ProductZoneAdjustment)
-            .where(ProductZoneAdjustment.product_id == product_id)
-            .where(ProductZoneAdjustment.zone_code == zone_code)
-            .where(ProductZoneAdjustment.active == True)
-        ).first()
-        if zone:
-            applied_zone = zone
-            if zone.adjustment_type == 'Percent':
-                price = price * (1 + zone.amount / 100.0)
-            elif zone.adjustment_type == 'Absolute':
-                price = price + zone.amount
-
-    # Quantity tier
-    tier = session.exec(
-        select(ProductQuantityTier)
-        .where(ProductQuantityTier.product_id == product_id)
-        .where(ProductQuantityTier.min_qty <= quantity)
-        .where(ProductQuantityTier.active == True)
-        .order_by(ProductQuantityTier.min_qty.desc())
-    ).first()
-    if tier:
-        applied_tier = tier
-        if tier.discount_type == 'Percent':
-            price = price * (1 - tier.discount_amount / 100.0)
-        elif tier.discount_type == 'Absolute':
-            price = price - tier.discount_amount
+        applied_zone = rules.zones.get(zone_code)
+        if applied_zone:
+            adjustment_type, amount = applied_zone
+            if adjustment_type == 'Percent':
+                price = price * (1 + amount / 100.0)
+            elif adjustment_type == 'Absolute':
+                price = price + amount
+
+    # Quantity tier: highest min_qty <= quantity
+    i = bisect_right(rules.tier_min_qtys, quantity)
+    if i:
+        applied_tier = rules.tiers[i - 1]
+        _, discount_type, discount_amount = applied_tier
+        if discount_type == 'Percent':
+            price = price * (1 - discount_amount / 100.0)
+        elif discount_type == 'Absolute':
+            price = price - discount_amount
 
     # Clamp
     if price < 0:
@@ -55,11 +207,27 @@ def compute_price(session: Session, product_id: int, quantity: int, zone_code: O
     return {
         'base_price': base_price,
         'unit_price': unit_price,
-        'zone_adjustment': applied_zone.amount if applied_zone else None,
-        'zone_adjustment_type': applied_zone.adjustment_type if applied_zone else None,
-        'tier_discount': applied_tier.discount_amount if applied_tier else None,
-        'tier_discount_type': applied_tier.discount_type if applied_tier else None,
-        'applied_zone_code': applied_zone.zone_code if applied_zone else None,
-        'applied_tier_min_qty': applied_tier.min_qty if applied_tier else None,
+        'zone_adjustment': applied_zone[1] if applied_zone else None,
+        'zone_adjustment_type': applied_zone[0] if applied_zone else None,
+        'tier_discount': applied_tier[2] if applied_tier else None,
+        'tier_discount_type': applied_tier[1] if applied_tier else None,
+        'applied_zone_code': zone_code if applied_zone else None,
+        'applied_tier_min_qty': applied_tier[0] if applied_tier else None,
         'pricing_source': 'Auto'
     }
+
+def compute_price(session: Session, product_id: int, quantity: int, zone_code: Optional[str]) -> Dict[str, Any]:
+    """Compute pricing for a product given quantity and zone.
+    Returns dict with keys: base_price, zone_adjustment, tier_discount, unit_price, applied_zone, applied_tier.
+    """
+    return apply_rules(get_rules(session, product_id), quantity, zone_code)
+
+def compute_prices(session: Session, lines: List[Tuple[int, int, Optional[str]]]) -> List[Dict[str, Any]]:
+    """Price many (product_id, quantity, zone_code) lines; same per-line result as compute_price.
+    Raises ValueError naming every unknown product.
+    """
+    rules = get_rules_many(session, (product_id for product_id, _, _ in lines))
+    missing = sorted({product_id for product_id, _, _ in lines if product_id not in rules})
+    if missing:
+        raise ValueError(f"Products not found: {missing}")
+    return [apply_rules(rules[product_id], quantity, zone_code) for product_id, quantity, zone_code in lines]
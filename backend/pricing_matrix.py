@@ -0,0 +1,169 @@
+"""Vectorized rate cards: every product x zone x tier breakpoint of a vendor.
+
+A vendor's products, active zone adjustments and active tiers are loaded with
+three queries into NumPy arrays, and the zone adjustment, tier discount, clamp
+and rounding of ``pricing_engine.apply_rules`` are applied as whole-array
+operations in the same order, so every cell equals ``compute_price`` for that
+product, zone and quantity.
+
+Rows are the tier breakpoints of each product (quantity 1 plus every active
+tier's min_qty); columns are "no zone" followed by every zone code the vendor
+uses. A product without an adjustment for a zone is priced as if no zone was
+given, exactly like compute_price.
+"""
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from sqlmodel import Session, select
+from models import Product, ProductZoneAdjustment, ProductQuantityTier
+
+# Rule kinds as array codes; anything else leaves the price unchanged, as in apply_rules
+NO_RULE, PERCENT, ABSOLUTE = 0, 1, 2
+_KINDS = {'Percent': PERCENT, 'Absolute': ABSOLUTE}
+
+class RateCard:
+    """Inputs of a vendor's rate card as arrays; rows are (product, breakpoint) pairs"""
+
+    def __init__(self, product_ids: List[int], product_names: List[str], zone_codes: List[Optional[str]],
+                 row_product: np.ndarray, quantities: np.ndarray, base_prices: np.ndarray,
+                 zone_kinds: np.ndarray, zone_amounts: np.ndarray,
+                 tier_kinds: np.ndarray, tier_amounts: np.ndarray, tier_min_qtys: np.ndarray):
+        self.product_ids = product_ids
+        self.product_names = product_names
+        self.zone_codes = zone_codes               # column labels; None is "no zone"
+        self.row_product = row_product             # (rows,) index into product_ids
+        self.quantities = quantities               # (rows,) breakpoint quantity
+        self.base_prices = base_prices             # (products,)
+        self.zone_kinds = zone_kinds               # (products, zones)
+        self.zone_amounts = zone_amounts           # (products, zones)
+        self.tier_kinds = tier_kinds               # (rows,) tier applied at the breakpoint
+        self.tier_amounts = tier_amounts           # (rows,)
+        self.tier_min_qtys = tier_min_qtys         # (rows,) applied tier's min_qty, -1 for none
+
+    @property
+    def rows(self) -> int:
+        return len(self.quantities)
+
+def load_rate_card(session: Session, vendor_id: int) -> RateCard:
+    """Load a vendor's pricing rules into a RateCard"""
+    products = session.exec(
+        select(Product.product_id, Product.product_name, Product.price)
+        .where(Product.vendor_id == vendor_id)
+        .order_by(Product.product_id)
+    ).all()
+    zone_rows = session.exec(
+        select(
+            ProductZoneAdjustment.product_zone_adjustment_id, ProductZoneAdjustment.product_id,
+            ProductZoneAdjustment.zone_code, ProductZoneAdjustment.adjustment_type, ProductZoneAdjustment.amount,
+        )
+        .join(Product, Product.product_id == ProductZoneAdjustment.product_id)
+        .where(Product.vendor_id == vendor_id)
+        .where(ProductZoneAdjustment.active == True)
+    ).all()
+    tier_rows = session.exec(
+        select(
+            ProductQuantityTier.product_quantity_tier_id, ProductQuantityTier.product_id,
+            ProductQuantityTier.min_qty, ProductQuantityTier.discount_type, ProductQuantityTier.discount_amount,
+        )
+        .join(Product, Product.product_id == ProductQuantityTier.product_id)
+        .where(Product.vendor_id == vendor_id)
+        .where(ProductQuantityTier.active == True)
+    ).all()
+
+    product_ids = [p[0] for p in products]
+    index = {pid: i for i, pid in enumerate(product_ids)}
+    zone_codes: List[Optional[str]] = [None] + sorted({z[2] for z in zone_rows if z[2]})
+    zone_index = {code: j for j, code in enumerate(zone_codes)}
+
+    zone_kinds = np.zeros((len(products), len(zone_codes)), dtype=np.int8)
+    zone_amounts = np.zeros((len(products), len(zone_codes)), dtype=np.float64)
+    # Lowest id wins for duplicate zone codes (same as the rule cache)
+    for _, product_id, zone_code, adjustment_type, amount in sorted(zone_rows, reverse=True):
+        if zone_code in zone_index:
+            i, j = index[product_id], zone_index[zone_code]
+            zone_kinds[i, j] = _KINDS.get(adjustment_type, NO_RULE)
+            zone_amounts[i, j] = amount
+
+    # Per product: min_qty -> applied tier; ties on min_qty go to the highest id
+    tiers_by_product: List[dict] = [{} for _ in products]
+    for _, product_id, min_qty, discount_type, discount_amount in sorted(tier_rows, key=lambda t: (t[2], t[0])):
+        tiers_by_product[index[product_id]][min_qty] = (discount_type, discount_amount)
+
+    row_product, quantities, tier_kinds, tier_amounts, tier_min_qtys = [], [], [], [], []
+    for i, tiers in enumerate(tiers_by_product):
+        breakpoints = sorted({1, *(q for q in tiers if q >= 1)})
+        min_qtys = sorted(tiers)
+        for quantity in breakpoints:
+            # Highest tier min_qty <= quantity (tiers are few per product)
+            applied = max((q for q in min_qtys if q <= quantity), default=None)
+            row_product.append(i)
+            quantities.append(quantity)
+            if applied is None:
+                tier_kinds.append(NO_RULE)
+                tier_amounts.append(0.0)
+                tier_min_qtys.append(-1)
+            else:
+                discount_type, discount_amount = tiers[applied]
+                tier_kinds.append(_KINDS.get(discount_type, NO_RULE))
+                tier_amounts.append(discount_amount)
+                tier_min_qtys.append(applied)
+
+    return RateCard(
+        product_ids=product_ids,
+        product_names=[p[1] for p in products],
+        zone_codes=zone_codes,
+        row_product=np.array(row_product, dtype=np.int64),
+        quantities=np.array(quantities, dtype=np.int64),
+        base_prices=np.array([p[2] for p in products], dtype=np.float64),
+        zone_kinds=zone_kinds,
+        zone_amounts=zone_amounts,
+        tier_kinds=np.array(tier_kinds, dtype=np.int8),
+        tier_amounts=np.array(tier_amounts, dtype=np.float64),
+        tier_min_qtys=np.array(tier_min_qtys, dtype=np.int64),
+    )
+
+def round2(prices: np.ndarray) -> np.ndarray:
+    """Elementwise round(x, 2) with Python's exact semantics.
+
+    np.round scales by 100 first, which can land on the wrong side of a .5
+    tie; those few near-tie values are re-rounded with the builtin.
+    """
+    rounded = np.round(prices, 2)
+    scaled = prices * 100.0
+    frac = scaled - np.floor(scaled)
+    near_tie = np.abs(frac - 0.5) <= 1e-6 * np.maximum(1.0, np.abs(scaled))
+    for idx in zip(*np.nonzero(near_tie)):
+        rounded[idx] = round(float(prices[idx]), 2)
+    return rounded
+
+def price_matrix(card: RateCard, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """Unit prices for rows[start:stop] x zones, same operation order as apply_rules"""
+    rows = slice(start, stop)
+    products = card.row_product[rows]
+    price = np.repeat(card.base_prices[products][:, None], len(card.zone_codes), axis=1)
+
+    # Zone adjustment
+    zone_kinds = card.zone_kinds[products]
+    zone_amounts = card.zone_amounts[products]
+    price = np.where(zone_kinds == PERCENT, price * (1 + zone_amounts / 100.0), price)
+    price = np.where(zone_kinds == ABSOLUTE, price + zone_amounts, price)
+
+    # Quantity tier
+    tier_kinds = card.tier_kinds[rows][:, None]
+    tier_amounts = card.tier_amounts[rows][:, None]
+    price = np.where(tier_kinds == PERCENT, price * (1 - tier_amounts / 100.0), price)
+    price = np.where(tier_kinds == ABSOLUTE, price - tier_amounts, price)
+
+    # Clamp, then round to 2 decimals
+    price = np.where(price < 0, 0.0, price)
+    return round2(price)
+
+def iter_rate_card(card: RateCard, block_rows: int = 4096) -> Iterator[Tuple]:
+    """Yield (product_id, product_name, zone_code, quantity, base_price, unit_price) per cell, a block at a time"""
+    for start in range(0, card.rows, block_rows):
+        prices = price_matrix(card, start, start + block_rows)
+        for r, row in enumerate(range(start, min(start + block_rows, card.rows))):
+            i = card.row_product[row]
+            product_id, name, base_price = card.product_ids[i], card.product_names[i], float(card.base_prices[i])
+            quantity = int(card.quantities[row])
+            for j, zone_code in enumerate(card.zone_codes):
+                yield product_id, name, zone_code, quantity, base_price, float(prices[r, j])
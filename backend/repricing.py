@@ -0,0 +1,227 @@
+"""Background re-pricing of a vendor's open order lines.
+
+After a vendor changes zones or tiers, lines of Requested/Approved orders
+still carry the old calculated price. A repricing job walks those lines by
+primary key in chunks: each chunk is read and priced on a read-only session
+(rules come from the pricing cache / bulk loader), then written as one short
+job on the writer queue (see writer.py), so interactive writes interleave
+between chunks and the SQLite write lock is never held for long.
+
+Lines with pricing_source 'ManualOverride' are left alone, and so are lines
+whose order left Requested/Approved between the read and the write. Every
+changed line gets an OrderItemHistory row, and the affected orders' stored
+totals are recomputed in the same job. Job progress, including which orders
+were updated or skipped, lives in memory in this process and is reported by
+GET /pricing/reprice-jobs/{job_id}.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+from sqlalchemy import bindparam, func, insert, or_, update
+from sqlmodel import Session, select
+from database import read_engine
+from models import Order, OrderItem, OrderItemHistory, OrderStatus
+from pricing_engine import get_rules_many, apply_rules
+from order_totals import recompute_order_totals
+from writer import run_write
+
+REPRICE_CHUNK_SIZE = int(os.getenv("REPRICE_CHUNK_SIZE", "500"))
+# Pause between chunks so a large job leaves room for interactive traffic
+REPRICE_CHUNK_PAUSE = float(os.getenv("REPRICE_CHUNK_PAUSE", "0.01"))
+# Finished jobs kept for status queries
+REPRICE_JOB_HISTORY = int(os.getenv("REPRICE_JOB_HISTORY", "100"))
+
+OPEN_ORDER_STATUSES = [OrderStatus.REQUESTED, OrderStatus.APPROVED]
+MANUAL_OVERRIDE = 'ManualOverride'
+REPRICE_REASON = 'Repriced after pricing rule change'
+
+logger = logging.getLogger("marketplace.repricing")
+
+class RepricingJob:
+    """Progress of one repricing run"""
+
+    def __init__(self, vendor_id: int, product_id: Optional[int] = None):
+        self.job_id = uuid.uuid4().hex
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.status = "Queued"  # Queued | Running | Completed | Failed | Cancelled
+        self.total = 0
+        self.processed = 0
+        self.repriced = 0
+        self.skipped_manual = 0
+        self.updated_orders: Set[int] = set()
+        # Orders that were no longer open when their lines were written
+        self.skipped_orders: Set[int] = set()
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("Completed", "Failed", "Cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "vendor_id": self.vendor_id,
+            "product_id": self.product_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "repriced": self.repriced,
+            "skipped_manual": self.skipped_manual,
+            "updated_order_ids": sorted(self.updated_orders),
+            "skipped_order_ids": sorted(self.skipped_orders - self.updated_orders),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+_jobs: "OrderedDict[str, RepricingJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_stopping = threading.Event()
+
+def _open_lines(job: RepricingJob):
+    """Open order lines of the job's vendor (optionally one product)"""
+    query = (
+        select(OrderItem)
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .where(Order.status.in_(OPEN_ORDER_STATUSES))
+        .where(OrderItem.vendor_id == job.vendor_id)
+    )
+    if job.product_id is not None:
+        query = query.where(OrderItem.product_id == job.product_id)
+    return query
+
+def _count(job: RepricingJob) -> int:
+    with Session(read_engine) as session:
+        subquery = _open_lines(job).with_only_columns(OrderItem.order_item_id).subquery()
+        return session.exec(select(func.count()).select_from(subquery)).one()
+
+def _price_chunk(job: RepricingJob, after_id: int) -> Optional[tuple]:
+    """Read and price the next chunk; returns (last_id, {item_id: new_price}, manual_count, size) or None when done"""
+    with Session(read_engine) as session:
+        items = session.exec(
+            _open_lines(job)
+            .where(OrderItem.order_item_id > after_id)
+            .order_by(OrderItem.order_item_id)
+            .limit(REPRICE_CHUNK_SIZE)
+        ).all()
+        if not items:
+            return None
+        rules = get_rules_many(session, {item.product_id for item in items})
+
+    changes: Dict[int, float] = {}
+    manual = 0
+    for item in items:
+        if item.pricing_source == MANUAL_OVERRIDE:
+            manual += 1
+            continue
+        if item.product_id not in rules:
+            continue
+        unit_price = apply_rules(rules[item.product_id], item.quantity or 1, item.zone_code)['unit_price']
+        if unit_price != item.final_unit_price or unit_price != item.calculated_unit_price:
+            changes[item.order_item_id] = unit_price
+    return items[-1].order_item_id, changes, manual, len(items)
+
+def _write_chunk(changes: Dict[int, float]) -> Tuple[int, Set[int], Set[int]]:
+    """Apply one chunk's new prices in a single writer job; returns (lines updated, updated orders, skipped orders)"""
+
+    def _apply(session: Session) -> Tuple[int, Set[int], Set[int]]:
+        # Re-check under the write lock: skip lines overridden or orders moved on since the read
+        rows = session.exec(
+            select(OrderItem.order_item_id, OrderItem.final_unit_price, OrderItem.item_status, OrderItem.order_id,
+                   Order.status)
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .where(OrderItem.order_item_id.in_(list(changes)))
+            .where(or_(OrderItem.pricing_source.is_(None), OrderItem.pricing_source != MANUAL_OVERRIDE))
+        ).all()
+        closed = {order_id for _, _, _, order_id, status in rows if status not in OPEN_ORDER_STATUSES}
+        current = [row[:4] for row in rows if row[4] in OPEN_ORDER_STATUSES]
+        if not current:
+            return 0, set(), closed
+        session.execute(
+            update(OrderItem.__table__)
+            .where(OrderItem.__table__.c.order_item_id == bindparam("b_order_item_id"))
+            .values(
+                calculated_unit_price=bindparam("b_price"),
+                final_unit_price=bindparam("b_price"),
+                item_price=bindparam("b_price"),
+                pricing_source='Auto',
+            ),
+            [{"b_order_item_id": item_id, "b_price": changes[item_id]} for item_id, _, _, _ in current],
+        )
+        now = datetime.utcnow()
+        session.execute(insert(OrderItemHistory.__table__), [
+            {
+                "order_item_id": item_id,
+                "status": item_status,
+                "old_price": old_price,
+                "new_price": changes[item_id],
+                "price_change_reason": REPRICE_REASON,
+                "created_at": now,
+            }
+            for item_id, old_price, item_status, _ in current
+        ])
+        updated = {order_id for _, _, _, order_id in current}
+        recompute_order_totals(session, updated)
+        return len(current), updated, closed
+
+    return run_write(_apply)
+
+def _run(job: RepricingJob):
+    job.status = "Running"
+    try:
+        job.total = _count(job)
+        after_id = 0
+        while True:
+            if _stopping.is_set():
+                job.status = "Cancelled"
+                return
+            chunk = _price_chunk(job, after_id)
+            if chunk is None:
+                break
+            after_id, changes, manual, size = chunk
+            if changes:
+                repriced, updated, skipped = _write_chunk(changes)
+                job.repriced += repriced
+                job.updated_orders |= updated
+                job.skipped_orders |= skipped
+            job.skipped_manual += manual
+            job.processed += size
+            if REPRICE_CHUNK_PAUSE:
+                time.sleep(REPRICE_CHUNK_PAUSE)
+        job.status = "Completed"
+    except Exception as e:
+        logger.exception("Repricing job %s failed", job.job_id)
+        job.status = "Failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+
+def start_repricing(vendor_id: int, product_id: Optional[int] = None) -> RepricingJob:
+    """Start a repricing job in the background; an unfinished job for the same scope is returned instead"""
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.vendor_id == vendor_id and job.product_id == product_id and not job.finished:
+                return job
+        job = RepricingJob(vendor_id, product_id)
+        _jobs[job.job_id] = job
+        finished = [job_id for job_id, j in _jobs.items() if j.finished]
+        for job_id in finished[:max(0, len(_jobs) - REPRICE_JOB_HISTORY)]:
+            del _jobs[job_id]
+    threading.Thread(target=_run, args=(job,), name=f"repricing-{job.job_id[:8]}", daemon=True).start()
+    return job
+
+def get_job(job_id: str) -> Optional[RepricingJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def stop_repricing():
+    """Ask running jobs to stop after their current chunk (called on shutdown)"""
+    _stopping.set()
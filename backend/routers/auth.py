@@ -2,10 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from datetime import timedelta
-from database import get_session
+from database import get_read_session
 from models import User, UserCreate, UserRead, UserRole, OrganizationType
-from auth import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import verify_password, get_password_hash, create_access_token, token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
 from dependencies import get_current_user
+from writer import run_write
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -19,7 +21,7 @@ class LoginRequest(BaseModel):
     password: str
 
 @router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, session: Session = Depends(get_session)):
+def login(login_data: LoginRequest, session: Session = Depends(get_read_session)):
     """Login with phone number and password"""
     user = session.exec(select(User).where(User.phone_number == login_data.phone_number)).first()
     
@@ -32,7 +34,7 @@ def login(login_data: LoginRequest, session: Session = Depends(get_session)):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.phone_number}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -45,7 +47,7 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 @router.post("/register", response_model=UserRead)
 def register_user(
     user_data: UserCreate,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Register a new user (only SuperAdmin can create users for their org)"""
@@ -64,19 +66,28 @@ def register_user(
             detail="Phone number already registered"
         )
     
-    # Create user with same organization as current user
-    db_user = User(
-        full_name=user_data.full_name,
-        phone_number=user_data.phone_number,
-        password_hash=get_password_hash(user_data.password),
-        role=user_data.role,
-        organization_id=current_user.organization_id,
-        organization_type=current_user.organization_type,
-        created_by=current_user.user_id
-    )
-    
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    
-    return db_user
+    # Hash outside the write transaction so bcrypt doesn't hold the writer
+    password_hash = get_password_hash(user_data.password)
+
+    def _create(write_session: Session) -> User:
+        # Create user with same organization as current user
+        db_user = User(
+            full_name=user_data.full_name,
+            phone_number=user_data.phone_number,
+            password_hash=password_hash,
+            role=user_data.role,
+            organization_id=current_user.organization_id,
+            organization_type=current_user.organization_type,
+            created_by=current_user.user_id
+        )
+        write_session.add(db_user)
+        return db_user
+
+    try:
+        return run_write(_create)
+    except IntegrityError:
+        # Lost a race with another request registering the same phone
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Phone number already registered"
+        )
@@ -1,52 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
-from models import Document, DocumentCreate, DocumentRead, User, UserRole, OrganizationType
-from dependencies import get_current_user, require_super_admin_or_admin
+from database import get_read_session
+from models import Document, DocumentCreate, DocumentRead, DocumentVendor, OrderVendor, UserRole, OrganizationType
+from dependencies import Principal, get_current_user, require_super_admin_or_admin
+from writer import run_write
+from order_vendors import share_order_records, vendor_has_order
+from pagination import paginate, set_next_page_headers
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 @router.get("/", response_model=List[DocumentRead])
 def read_documents(
+    request: Request,
+    response: Response,
     order_id: int = None,
     skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Get documents for current organization (only SuperAdmin/Admin)"""
-    from models import Order, OrderItem, Product
+    from models import Order
     
-    if current_user.organization_type == OrganizationType.COMPANY:
+    key = Document.document_id
+    if order_id:
+        # One order: check access through the order so its (order_id, document_id) index drives the page
+        query = select(Document).where(Document.order_id == order_id)
+        if current_user.organization_type == OrganizationType.COMPANY:
+            query = (
+                query.join(Order, Document.order_id == Order.order_id)
+                .where(Order.placed_by_org_id == current_user.organization_id)
+            )
+        else:
+            query = (
+                query.join(OrderVendor, OrderVendor.order_id == Document.order_id)
+                .where(OrderVendor.vendor_id == current_user.organization_id)
+            )
+    elif current_user.organization_type == OrganizationType.COMPANY:
         # Company sees documents for orders they placed
-        query = (
-            select(Document)
-            .join(Order, Document.order_id == Order.order_id)
-            .where(Order.placed_by_org_id == current_user.organization_id)
-        )
+        query = select(Document).where(Document.placed_by_org_id == current_user.organization_id)
     else:
         # Vendors see documents for orders containing their products
         query = (
             select(Document)
-            .join(Order, Document.order_id == Order.order_id)
-            .join(OrderItem, Order.order_id == OrderItem.order_id)
-            .join(Product, Product.product_id == OrderItem.product_id)
-            .where(Product.vendor_id == current_user.organization_id)
-            .distinct()
+            .join(DocumentVendor, DocumentVendor.document_id == Document.document_id)
+            .where(DocumentVendor.vendor_id == current_user.organization_id)
         )
-    
-    if order_id:
-        query = query.where(Document.order_id == order_id)
+        # Keyed on the mapping's document_id so the (vendor_id, document_id) index supplies the order
+        key = DocumentVendor.document_id
         
-    documents = session.exec(query.offset(skip).limit(limit)).all()
+    documents, next_cursor = paginate(session, query, key, limit, skip, cursor)
+    set_next_page_headers(request, response, next_cursor)
     return documents
 
 @router.get("/{document_id}", response_model=DocumentRead)
 def read_document(
     document_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Get document by ID (only SuperAdmin/Admin of same organization)"""
     document = session.get(Document, document_id)
@@ -54,7 +68,7 @@ def read_document(
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Check if user has access to this document
-    from models import Order, OrderItem, Product
+    from models import Order
     order = session.get(Order, document.order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -67,12 +81,7 @@ def read_document(
             )
     elif current_user.organization_type == OrganizationType.VENDOR:
         # Check if vendor has products in this order
-        vendor_has_items = session.exec(
-            select(OrderItem)
-            .join(Product, Product.product_id == OrderItem.product_id)
-            .where(OrderItem.order_id == order.order_id)
-            .where(Product.vendor_id == current_user.organization_id)
-        ).first()
+        vendor_has_items = vendor_has_order(session, order.order_id, current_user.organization_id)
         
         if not vendor_has_items:
             raise HTTPException(
@@ -85,31 +94,37 @@ def read_document(
 @router.post("/", response_model=DocumentRead)
 def create_document(
     document_data: DocumentCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Upload a new document (only SuperAdmin/Admin)"""
-    db_document = Document(
-        **document_data.dict(),
-        uploaded_by_user_id=current_user.user_id
-    )
+    from models import Order
+    def _create(session: Session) -> Document:
+        db_document = Document(
+            **document_data.dict(),
+            uploaded_by_user_id=current_user.user_id,
+            placed_by_org_id=session.exec(
+                select(Order.placed_by_org_id).where(Order.order_id == document_data.order_id)
+            ).first()
+        )
+        session.add(db_document)
+        session.flush()  # assigns document_id
+        share_order_records(session, db_document.order_id)
+        return db_document
     
-    session.add(db_document)
-    session.commit()
-    session.refresh(db_document)
-    return db_document
+    return run_write(_create)
 
 @router.delete("/{document_id}")
 def delete_document(
     document_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Delete document (only SuperAdmin/Admin)"""
-    document = session.get(Document, document_id)
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+    def _delete(session: Session):
+        document = session.get(Document, document_id)
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        session.execute(delete(DocumentVendor).where(DocumentVendor.document_id == document_id))
+        session.delete(document)
     
-    session.delete(document)
-    session.commit()
+    run_write(_delete)
     return {"message": "Document deleted successfully"}
@@ -0,0 +1,56 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from models import User
+from dependencies import get_stream_user
+from events import event_bus, EVENTS_HEARTBEAT, RESET
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+def _format(event_id: int, event_type: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    last_event_id: str | None = None,
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+    current_user: User = Depends(get_stream_user)
+):
+    """Server-sent events for status changes of the organization's orders and items.
+    Resume with the Last-Event-ID header (sent by EventSource on reconnect) or ?last_event_id=.
+    """
+    resume_from = last_event_id_header or last_event_id
+    try:
+        resume_id = int(resume_from) if resume_from else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    subscription = event_bus.subscribe(current_user.organization_id, resume_id)
+
+    async def _events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), timeout=EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is RESET:
+                    # Missed events are gone: the client re-fetches, then continues from the newest id
+                    subscription.overflowed = False
+                    yield _format(event_bus.last_id, "reset", {})
+                    continue
+                yield _format(item.id, item.type, item.data)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
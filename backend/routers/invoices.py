@@ -1,52 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
-from models import Invoice, InvoiceCreate, InvoiceRead, User, UserRole, OrganizationType
-from dependencies import get_current_user, require_super_admin_or_admin
+from database import get_read_session
+from models import Invoice, InvoiceCreate, InvoiceRead, InvoiceVendor, UserRole, OrganizationType
+from dependencies import Principal, get_current_user, require_super_admin_or_admin
+from writer import run_write
+from order_vendors import share_order_records, vendor_has_order
+from pagination import paginate, set_next_page_headers
 
 router = APIRouter(prefix="/invoices", tags=["Invoices"])
 
 @router.get("/", response_model=List[InvoiceRead])
 def read_invoices(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Get invoices for current organization (only SuperAdmin/Admin)"""
     # Only show invoices related to current user's organization
-    from models import Order
     if current_user.organization_type == OrganizationType.COMPANY:
         # Company sees invoices for orders they placed
-        invoices = session.exec(
-            select(Invoice)
-            .join(Order, Invoice.order_id == Order.order_id)
-            .where(Order.placed_by_org_id == current_user.organization_id)
-            .offset(skip)
-            .limit(limit)
-        ).all()
+        query = select(Invoice).where(Invoice.placed_by_org_id == current_user.organization_id)
+        key = Invoice.invoice_id
     else:
         # Vendors see invoices for orders containing their products
-        from models import OrderItem, Product
-        invoices = session.exec(
+        query = (
             select(Invoice)
-            .join(Order, Invoice.order_id == Order.order_id)
-            .join(OrderItem, Order.order_id == OrderItem.order_id)
-            .join(Product, Product.product_id == OrderItem.product_id)
-            .where(Product.vendor_id == current_user.organization_id)
-            .distinct()
-            .offset(skip)
-            .limit(limit)
-        ).all()
+            .join(InvoiceVendor, InvoiceVendor.invoice_id == Invoice.invoice_id)
+            .where(InvoiceVendor.vendor_id == current_user.organization_id)
+        )
+        # Keyed on the mapping's invoice_id so the (vendor_id, invoice_id) index supplies the order
+        key = InvoiceVendor.invoice_id
     
+    invoices, next_cursor = paginate(session, query, key, limit, skip, cursor)
+    set_next_page_headers(request, response, next_cursor)
     return invoices
 
 @router.get("/{invoice_id}", response_model=InvoiceRead)
 def read_invoice(
     invoice_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Get invoice by ID (only SuperAdmin/Admin of same organization)"""
     invoice = session.get(Invoice, invoice_id)
@@ -67,13 +66,7 @@ def read_invoice(
             )
     elif current_user.organization_type == OrganizationType.VENDOR:
         # Check if vendor has products in this order
-        from models import OrderItem, Product
-        vendor_has_items = session.exec(
-            select(OrderItem)
-            .join(Product, Product.product_id == OrderItem.product_id)
-            .where(OrderItem.order_id == order.order_id)
-            .where(Product.vendor_id == current_user.organization_id)
-        ).first()
+        vendor_has_items = vendor_has_order(session, order.order_id, current_user.organization_id)
         
         if not vendor_has_items:
             raise HTTPException(
@@ -86,31 +79,37 @@ def read_invoice(
 @router.post("/", response_model=InvoiceRead)
 def create_invoice(
     invoice_data: InvoiceCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Create a new invoice (only SuperAdmin/Admin)"""
-    db_invoice = Invoice(
-        **invoice_data.dict(),
-        created_by_user_id=current_user.user_id
-    )
+    from models import Order
+    def _create(session: Session) -> Invoice:
+        db_invoice = Invoice(
+            **invoice_data.dict(),
+            created_by_user_id=current_user.user_id,
+            placed_by_org_id=session.exec(
+                select(Order.placed_by_org_id).where(Order.order_id == invoice_data.order_id)
+            ).first()
+        )
+        session.add(db_invoice)
+        session.flush()  # assigns invoice_id
+        share_order_records(session, db_invoice.order_id)
+        return db_invoice
     
-    session.add(db_invoice)
-    session.commit()
-    session.refresh(db_invoice)
-    return db_invoice
+    return run_write(_create)
 
 @router.delete("/{invoice_id}")
 def delete_invoice(
     invoice_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Delete invoice (only SuperAdmin/Admin)"""
-    invoice = session.get(Invoice, invoice_id)
-    if not invoice:
-        raise HTTPException(status_code=404, detail="Invoice not found")
+    def _delete(session: Session):
+        invoice = session.get(Invoice, invoice_id)
+        if not invoice:
+            raise HTTPException(status_code=404, detail="Invoice not found")
+        session.execute(delete(InvoiceVendor).where(InvoiceVendor.invoice_id == invoice_id))
+        session.delete(invoice)
     
-    session.delete(invoice)
-    session.commit()
+    run_write(_delete)
     return {"message": "Invoice deleted successfully"}
@@ -1,47 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import bindparam, case, insert, literal, update
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_read_session, get_async_read_session, DB_ASYNC
 from models import (
-    OrderItem, OrderItemCreate, OrderItemRead, OrderItemHistory,
+    Order, OrderItem, OrderItemCreate, OrderItemRead, OrderItemHistory,
     OrderItemHistoryCreate, OrderItemHistoryRead, User, UserRole,
-    OrganizationType, ItemStatus, Product, OrderItemCreateRequest
+    OrganizationType, ItemStatus, Product, OrderItemCreateRequest, OrderItemBulkStatusUpdate,
+    OrderItemBulkPriceOverride
 )
 from pricing_engine import compute_price
-from dependencies import get_current_user
+from dependencies import get_current_user, get_current_user_async
+from writer import run_write
+from order_vendors import link_order_vendors
+from order_totals import add_order_lines, change_line_price, change_line_status, recompute_order_totals
+from events import publish
+from pagination import paginate, set_next_page_headers
 
 router = APIRouter(prefix="/order-items", tags=["Order Items"])
 
-@router.get("/", response_model=List[OrderItemRead])
-def read_order_items(
-    order_id: int | None = None,
-    skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
-):
-    """Get order items with org-based filtering"""
+ITEM_BULK_MAX = int(os.getenv("ITEM_BULK_MAX", "1000"))
+
+def _list_order_items(session: Session, current_user: User, order_id: int | None, skip: int, limit: int,
+                      cursor: str | None = None):
+    """One page of order items visible to the current user (shared by the sync and async routes)"""
     query = select(OrderItem)
+    # Scope in SQL so every page holds exactly `limit` visible items
+    if current_user.organization_type == OrganizationType.COMPANY:
+        # Company: only their orders' items. One order's items are checked through the order's
+        # primary key so its (order_id, order_item_id) index drives the page
+        if order_id:
+            query = (
+                query.join(Order, Order.order_id == OrderItem.order_id)
+                .where(Order.placed_by_org_id == current_user.organization_id)
+            )
+        else:
+            query = query.where(OrderItem.placed_by_org_id == current_user.organization_id)
+    elif current_user.organization_type == OrganizationType.VENDOR:
+        # Vendor: only items for products that belong to vendor
+        query = query.where(OrderItem.vendor_id == current_user.organization_id)
     if order_id:
         query = query.where(OrderItem.order_id == order_id)
-    order_items = session.exec(query.offset(skip).limit(limit)).all()
-
-    # Company: only their orders' items
-    if current_user.organization_type == OrganizationType.COMPANY:
-        from models import Order as OrderModel
-        company_order_ids = session.exec(
-            select(OrderModel.order_id).where(OrderModel.placed_by_org_id == current_user.organization_id)
-        ).all()
-        company_order_ids_set = {oid[0] if isinstance(oid, tuple) else oid for oid in company_order_ids}
-        order_items = [it for it in order_items if it.order_id in company_order_ids_set]
-
-    # Vendor: only items for products that belong to vendor
-    if current_user.organization_type == OrganizationType.VENDOR:
-        product_ids = {it.product_id for it in order_items}
-        if product_ids:
-            products = session.exec(select(Product).where(Product.product_id.in_(product_ids))).all()
-            allowed = {p.product_id for p in products if p.vendor_id == current_user.organization_id}
-            order_items = [it for it in order_items if it.product_id in allowed]
+    order_items, next_cursor = paginate(session, query, OrderItem.order_item_id, limit, skip, cursor)
 
     # Hide price info for vendor basic users
     if (current_user.organization_type == OrganizationType.VENDOR and current_user.role == UserRole.USER):
@@ -52,14 +55,49 @@ def read_order_items(
             d['final_unit_price'] = None
             d['calculated_unit_price'] = None
             sanitized.append(d)
-        return sanitized
+        return sanitized, next_cursor
+
+    return order_items, next_cursor
 
+def read_order_items(
+    request: Request,
+    response: Response,
+    order_id: int | None = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Get order items with org-based filtering"""
+    order_items, next_cursor = _list_order_items(session, current_user, order_id, skip, limit, cursor)
+    set_next_page_headers(request, response, next_cursor)
     return order_items
 
+async def read_order_items_async(
+    request: Request,
+    response: Response,
+    order_id: int | None = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Get order items with org-based filtering"""
+    order_items, next_cursor = await session.run_sync(_list_order_items, current_user, order_id, skip, limit, cursor)
+    set_next_page_headers(request, response, next_cursor)
+    return order_items
+
+router.add_api_route(
+    "/", read_order_items_async if DB_ASYNC else read_order_items,
+    methods=["GET"], response_model=List[OrderItemRead]
+)
+
 @router.get("/{order_item_id}", response_model=OrderItemRead)
 def read_order_item(
     order_item_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get order item by ID"""
@@ -81,7 +119,7 @@ def create_order_item(
     order_item_data: OrderItemCreateRequest,
     quantity: int = 1,
     zone_code: str | None = None,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new order item (Company side). Applies pricing rules automatically."""
@@ -99,39 +137,47 @@ def create_order_item(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    db_order_item = OrderItem(
-        order_id=order_item_data.order_id,
-        product_id=order_item_data.product_id,
-        item_name=order_item_data.item_name or product.product_name,
-        item_status=ItemStatus.ACCEPTED,
-        quantity=quantity,
-        zone_code=zone_code,
-        calculated_unit_price=pricing['unit_price'],
-        final_unit_price=pricing['unit_price'],
-        pricing_source=pricing['pricing_source'],
-        item_price=pricing['unit_price']
-    )
-    session.add(db_order_item)
-    session.commit()
-    session.refresh(db_order_item)
-
-    history = OrderItemHistory(
-        order_item_id=db_order_item.order_item_id,
-        status=db_order_item.item_status,
-        old_price=None,
-        new_price=db_order_item.final_unit_price,
-        price_change_reason="Initial auto pricing"
-    )
-    session.add(history)
-    session.commit()
-    return db_order_item
+    def _create(write_session: Session) -> OrderItem:
+        db_order_item = OrderItem(
+            order_id=order_item_data.order_id,
+            product_id=order_item_data.product_id,
+            vendor_id=product.vendor_id,
+            placed_by_org_id=write_session.exec(
+                select(Order.placed_by_org_id).where(Order.order_id == order_item_data.order_id)
+            ).first(),
+            item_name=order_item_data.item_name or product.product_name,
+            item_status=ItemStatus.ACCEPTED,
+            quantity=quantity,
+            zone_code=zone_code,
+            calculated_unit_price=pricing['unit_price'],
+            final_unit_price=pricing['unit_price'],
+            pricing_source=pricing['pricing_source'],
+            item_price=pricing['unit_price']
+        )
+        write_session.add(db_order_item)
+        write_session.flush()  # assigns order_item_id
+
+        history = OrderItemHistory(
+            order_item_id=db_order_item.order_item_id,
+            status=db_order_item.item_status,
+            old_price=None,
+            new_price=db_order_item.final_unit_price,
+            price_change_reason="Initial auto pricing"
+        )
+        write_session.add(history)
+        link_order_vendors(write_session, db_order_item.order_id, [product.vendor_id])
+        add_order_lines(write_session, db_order_item.order_id, [
+            (db_order_item.quantity, db_order_item.final_unit_price, db_order_item.item_status)
+        ])
+        return db_order_item
+
+    return run_write(_create)
 
 @router.put("/{order_item_id}/override-price", response_model=OrderItemRead)
 def override_price(
     order_item_id: int,
     new_price: float,
     reason: str | None = None,
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """Vendor SuperAdmin/Admin can override final price."""
@@ -142,46 +188,123 @@ def override_price(
     if new_price < 0:
         raise HTTPException(status_code=400, detail="Price cannot be negative")
 
-    order_item = session.get(OrderItem, order_item_id)
-    if not order_item:
-        raise HTTPException(status_code=404, detail="Order item not found")
+    def _override(session: Session) -> OrderItem:
+        order_item = session.get(OrderItem, order_item_id)
+        if not order_item:
+            raise HTTPException(status_code=404, detail="Order item not found")
 
-    old = order_item.final_unit_price or order_item.item_price
-    order_item.final_unit_price = new_price
-    order_item.pricing_source = 'ManualOverride'
-    order_item.item_price = new_price  # maintain legacy consumption
-    session.add(order_item)
-    session.commit()
-
-    hist = OrderItemHistory(
-        order_item_id=order_item_id,
-        status=order_item.item_status,
-        old_price=old,
-        new_price=new_price,
-        price_change_reason=reason or 'Manual override'
-    )
-    session.add(hist)
-    session.commit()
-    session.refresh(order_item)
-    return order_item
+        old = order_item.final_unit_price or order_item.item_price
+        change_line_price(session, order_item.order_id, order_item.quantity, order_item.final_unit_price, new_price)
+        order_item.final_unit_price = new_price
+        order_item.pricing_source = 'ManualOverride'
+        order_item.item_price = new_price  # maintain legacy consumption
+        session.add(order_item)
+
+        hist = OrderItemHistory(
+            order_item_id=order_item_id,
+            status=order_item.item_status,
+            old_price=old,
+            new_price=new_price,
+            price_change_reason=reason or 'Manual override'
+        )
+        session.add(hist)
+        return order_item
+
+    return run_write(_override)
+
+@router.post("/bulk-override-price", response_model=List[OrderItemRead])
+def bulk_override_price(
+    data: OrderItemBulkPriceOverride,
+    current_user: User = Depends(get_current_user)
+):
+    """Vendor SuperAdmin/Admin override the final price of many lines at once; all or nothing."""
+    if current_user.organization_type != OrganizationType.VENDOR:
+        raise HTTPException(status_code=403, detail="Only vendors can override pricing")
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(status_code=403, detail="Only SuperAdmin/Admin can override price")
+    if not data.items:
+        raise HTTPException(status_code=400, detail="No order items given")
+    if len(data.items) > ITEM_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ITEM_BULK_MAX} order items per request")
+    overrides = {entry.order_item_id: entry for entry in data.items}
+    if len(overrides) != len(data.items):
+        raise HTTPException(status_code=400, detail="Each order item may appear only once")
+    negative = sorted(entry.order_item_id for entry in data.items if entry.new_price < 0)
+    if negative:
+        raise HTTPException(status_code=400, detail=f"Price cannot be negative (order items {negative})")
+
+    def _override(session: Session) -> List[OrderItem]:
+        rows = session.exec(
+            select(OrderItem.order_item_id, OrderItem.order_id, OrderItem.vendor_id,
+                   OrderItem.final_unit_price, OrderItem.item_price, OrderItem.item_status)
+            .where(OrderItem.order_item_id.in_(list(overrides)))
+        ).all()
+        missing = sorted(set(overrides) - {row[0] for row in rows})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Order items not found: {missing}")
+        foreign = sorted(row[0] for row in rows if row[2] != current_user.organization_id)
+        if foreign:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Access denied: order items {foreign} are not your products"
+            )
+
+        items = OrderItem.__table__
+        session.execute(
+            update(items)
+            .where(items.c.order_item_id == bindparam("b_order_item_id"))
+            .values(
+                final_unit_price=bindparam("b_price"),
+                item_price=bindparam("b_price"),  # maintain legacy consumption
+                pricing_source='ManualOverride',
+            ),
+            [{"b_order_item_id": item_id, "b_price": entry.new_price} for item_id, entry in overrides.items()],
+        )
+        now = datetime.utcnow()
+        session.execute(insert(OrderItemHistory.__table__).values([
+            {
+                "order_item_id": item_id,
+                "status": item_status,
+                "old_price": final_unit_price or item_price,
+                "new_price": overrides[item_id].new_price,
+                "price_change_reason": overrides[item_id].reason or 'Manual override',
+                "created_at": now,
+            }
+            for item_id, _, _, final_unit_price, item_price, item_status in rows
+        ]))
+        recompute_order_totals(session, {row[1] for row in rows})
+        return session.exec(
+            select(OrderItem)
+            .where(OrderItem.order_item_id.in_(list(overrides)))
+            .order_by(OrderItem.order_item_id)
+            .execution_options(populate_existing=True)
+        ).all()
+
+    return run_write(_override)
 
 @router.put("/{order_item_id}/status")
 def update_order_item_status(
     order_item_id: int,
     new_status: ItemStatus,
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """Update order item status"""
-    order_item = session.get(OrderItem, order_item_id)
-    if not order_item:
-        raise HTTPException(status_code=404, detail="Order item not found")
-    
-    # Vendors can update item status
-    if current_user.organization_type == OrganizationType.VENDOR:
+    def _update(session: Session):
+        order_item = session.get(OrderItem, order_item_id)
+        if not order_item:
+            raise HTTPException(status_code=404, detail="Order item not found")
+        
+        # Vendors can update item status
+        if current_user.organization_type != OrganizationType.VENDOR:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        
         # Vendor users can accept/work on orders but with restrictions
         old_status = order_item.item_status
         order_item.item_status = new_status
+        change_line_status(session, order_item.order_id, old_status, new_status)
         
         # Create history record
         history = OrderItemHistory(
@@ -191,19 +314,114 @@ def update_order_item_status(
         
         session.add(order_item)
         session.add(history)
-        session.commit()
-        
-        return {"message": f"Order item status updated from {old_status} to {new_status}"}
-    
-    raise HTTPException(
-        status_code=status.HTTP_403_FORBIDDEN,
-        detail="Access denied"
-    )
+        company_id = session.get(Order, order_item.order_id).placed_by_org_id
+        return old_status, order_item.order_id, order_item.vendor_id, company_id
+
+    old_status, order_id, vendor_id, company_id = run_write(_update)
+    publish("item.status", company_id, [vendor_id], order_id=order_id, order_item_id=order_item_id,
+            old_status=old_status, status=new_status)
+    return {"message": f"Order item status updated from {old_status} to {new_status}"}
+
+@router.post("/bulk-status")
+def bulk_update_order_item_status(
+    data: OrderItemBulkStatusUpdate,
+    current_user: User = Depends(get_current_user)
+):
+    """Update the status of many order items in one transaction (Vendor).
+    Takes (order_item_id, new_status) pairs, or order_id + new_status for all of the vendor's lines in that order.
+    """
+    if current_user.organization_type != OrganizationType.VENDOR:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    if data.items and data.order_id is not None:
+        raise HTTPException(status_code=400, detail="Give either items or order_id, not both")
+    if data.order_id is not None and data.new_status is None:
+        raise HTTPException(status_code=400, detail="new_status is required with order_id")
+    if data.order_id is None and not data.items:
+        raise HTTPException(status_code=400, detail="No order items given")
+    changes = {change.order_item_id: change.new_status for change in data.items}
+    if len(changes) > ITEM_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ITEM_BULK_MAX} order items per request")
+
+    def _bulk(session: Session):
+        # Ownership and current state of every line in one query
+        query = (
+            select(OrderItem.order_item_id, OrderItem.order_id, OrderItem.item_status,
+                   OrderItem.vendor_id, Order.placed_by_org_id)
+            .join(Order, Order.order_id == OrderItem.order_id)
+        )
+        if data.order_id is not None:
+            query = query.where(OrderItem.order_id == data.order_id).where(
+                OrderItem.vendor_id == current_user.organization_id
+            )
+        else:
+            query = query.where(OrderItem.order_item_id.in_(list(changes)))
+        rows = session.exec(query).all()
+
+        if data.order_id is not None:
+            if not rows:
+                raise HTTPException(status_code=404, detail="No order items of yours in this order")
+            if len(rows) > ITEM_BULK_MAX:
+                raise HTTPException(status_code=400, detail=f"At most {ITEM_BULK_MAX} order items per request")
+            targets = {row[0]: data.new_status for row in rows}
+        else:
+            missing = sorted(set(changes) - {row[0] for row in rows})
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Order items not found: {missing}")
+            foreign = sorted(row[0] for row in rows if row[3] != current_user.organization_id)
+            if foreign:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"Access denied: order items {foreign} are not your products"
+                )
+            targets = changes
+
+        # One set-based UPDATE ... SET item_status = CASE order_item_id ... END
+        items = OrderItem.__table__
+        session.execute(
+            update(items)
+            .where(items.c.order_item_id.in_(list(targets)))
+            .values(item_status=case(
+                {item_id: literal(new_status, items.c.item_status.type) for item_id, new_status in targets.items()},
+                value=items.c.order_item_id,
+            ))
+        )
+        # One multi-row INSERT for the history
+        now = datetime.utcnow()
+        session.execute(insert(OrderItemHistory.__table__).values([
+            {
+                "order_item_id": item_id,
+                "status": new_status,
+                "old_price": None,
+                "new_price": None,
+                "price_change_reason": None,
+                "created_at": now,
+            }
+            for item_id, new_status in targets.items()
+        ]))
+        recompute_order_totals(session, {row[1] for row in rows})
+        return [(row[0], row[1], row[2], row[4]) for row in rows]
+
+    rows = run_write(_bulk)
+    # One event per order, so a large batch doesn't push everything else out of the replay buffer
+    by_order = {}
+    for order_item_id, order_id, old_status, company_id in sorted(rows):
+        company_items = by_order.setdefault(order_id, (company_id, []))
+        company_items[1].append({
+            "order_item_id": order_item_id,
+            "old_status": old_status,
+            "status": data.new_status if data.order_id is not None else changes[order_item_id],
+        })
+    for order_id, (company_id, items) in by_order.items():
+        publish("items.status", company_id, [current_user.organization_id], order_id=order_id, items=items)
+    return {"message": f"Updated status of {len(rows)} order items", "updated": len(rows)}
 
 @router.get("/{order_item_id}/history", response_model=List[OrderItemHistoryRead])
 def read_order_item_history(
     order_item_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get order item history"""
@@ -1,66 +1,195 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_read_session, get_async_read_session, DB_ASYNC
 from models import (
     Order, OrderCreate, OrderRead, OrderItem, OrderItemCreate, OrderItemRead,
     OrderApproval, OrderApprovalCreate, OrderApprovalRead, User, UserRole, 
-    OrganizationType, OrderStatus, ApprovalStatus
+    OrganizationType, OrderStatus, ApprovalStatus, ItemStatus, Product,
+    OrderItemHistory, OrderVendor, CheckoutRequest, OrderWithItemsRead, OrderDetailRead,
+    OrderBulkStatusUpdate, OrderBulkStatusResult, PendingApprovalRead, OrderApprovalBulkDecision
 )
-from dependencies import get_current_user, require_super_admin_or_admin
+from dependencies import Principal, get_current_user, get_current_user_async, require_super_admin_or_admin
+from pricing_engine import compute_prices
+from writer import run_write
+from order_vendors import link_order_vendors, vendor_has_order, order_vendor_ids
+from events import publish
+from order_state import order_scope, transition_order, transition_orders, resolve_pending_approvals
+from order_totals import totals_for_lines, vendor_order_view
+from pagination import paginate, set_next_page_headers
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
-@router.get("/", response_model=List[OrderRead])
-def read_orders(
-    skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
-):
-    """Get all orders (filtered by organization)"""
-    if current_user.organization_type == OrganizationType.COMPANY:
+CHECKOUT_MAX_LINES = int(os.getenv("CHECKOUT_MAX_LINES", "5000"))
+ORDER_BULK_MAX = int(os.getenv("ORDER_BULK_MAX", "1000"))
+
+# sort query value -> (sort column or None for plain order_id order, descending)
+ORDER_SORTS = {
+    "order_id": (None, False),
+    "total_value": (Order.total_value, False),
+    "-total_value": (Order.total_value, True),
+}
+
+def _list_orders(session: Session, current_user: User, skip: int, limit: int, cursor: str | None = None,
+                 sort: str = "order_id", min_value: float | None = None, max_value: float | None = None):
+    """One page of orders visible to the current user (shared by the sync and async routes)"""
+    if sort not in ORDER_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {list(ORDER_SORTS)}")
+    sort_column, descending = ORDER_SORTS[sort]
+    is_company = current_user.organization_type == OrganizationType.COMPANY
+    if not is_company and (sort_column is not None or min_value is not None or max_value is not None):
+        # Order totals include other vendors' lines
+        raise HTTPException(status_code=400, detail="Only companies can sort or filter orders by value")
+
+    if is_company:
         # Companies see orders they placed
-        orders = session.exec(
-            select(Order)
-            .where(Order.placed_by_org_id == current_user.organization_id)
-            .offset(skip)
-            .limit(limit)
-        ).all()
+        query = select(Order).where(Order.placed_by_org_id == current_user.organization_id)
     else:
         # Vendors see only orders that contain their products
-        from models import OrderItem, Product
-        from sqlalchemy.exc import OperationalError
-        from sqlalchemy import text as sa_text
-        vendor_orders_query = (
+        query = (
             select(Order)
-            .join(OrderItem, Order.order_id == OrderItem.order_id)
-            .join(Product, Product.product_id == OrderItem.product_id)
-            .where(Product.vendor_id == current_user.organization_id)
-            .distinct()
-            .offset(skip)
-            .limit(limit)
+            .join(OrderVendor, OrderVendor.order_id == Order.order_id)
+            .where(OrderVendor.vendor_id == current_user.organization_id)
         )
-        try:
-            orders = session.exec(vendor_orders_query).all()
-        except OperationalError as e:
-            # Auto-heal schema if product_id column is missing on orderitem (legacy DBs)
-            if 'no such column: orderitem.product_id' in str(e).lower():
-                try:
-                    session.exec(sa_text('ALTER TABLE orderitem ADD COLUMN product_id INTEGER'))
-                    session.commit()
-                except Exception:
-                    session.rollback()
-                # After adding column, return empty until data is populated
-                return []
-            raise
+    # Stored totals: filtering by value reads no order items
+    if min_value is not None:
+        query = query.where(Order.total_value >= min_value)
+    if max_value is not None:
+        query = query.where(Order.total_value <= max_value)
     
+    # Vendor pages are keyed on the mapping's order_id so the (vendor_id, order_id) index supplies the order
+    key = Order.order_id if is_company else OrderVendor.order_id
+    orders, next_cursor = paginate(session, query, key, limit, skip, cursor, sort_column, descending)
+    if not is_company:
+        orders = [vendor_order_view(order) for order in orders]
+    return orders, next_cursor
+
+def read_orders(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    sort: str = "order_id",
+    min_value: float | None = None,
+    max_value: float | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all orders (filtered by organization), optionally sorted or filtered by total value"""
+    orders, next_cursor = _list_orders(session, current_user, skip, limit, cursor, sort, min_value, max_value)
+    set_next_page_headers(request, response, next_cursor)
+    return orders
+
+async def read_orders_async(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    sort: str = "order_id",
+    min_value: float | None = None,
+    max_value: float | None = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Get all orders (filtered by organization), optionally sorted or filtered by total value"""
+    orders, next_cursor = await session.run_sync(
+        _list_orders, current_user, skip, limit, cursor, sort, min_value, max_value
+    )
+    set_next_page_headers(request, response, next_cursor)
     return orders
 
+router.add_api_route(
+    "/", read_orders_async if DB_ASYNC else read_orders,
+    methods=["GET"], response_model=List[OrderRead]
+)
+
+def _require_company_admin(current_user: Principal):
+    if current_user.organization_type != OrganizationType.COMPANY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only companies approve orders"
+        )
+
+@router.get("/approvals/pending", response_model=List[PendingApprovalRead])
+def read_pending_approvals(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
+):
+    """Approval inbox: the organization's Requested orders with a pending approval request"""
+    _require_company_admin(current_user)
+    query = (
+        select(OrderApproval, Order.line_count, Order.total_value, Order.placed_at, Order.order_id)
+        .join(Order, Order.order_id == OrderApproval.order_id)
+        .where(Order.placed_by_org_id == current_user.organization_id)
+        .where(Order.status == OrderStatus.REQUESTED)
+        .where(OrderApproval.status == ApprovalStatus.PENDING)
+    )
+    rows, next_cursor = paginate(session, query, Order.order_id, limit, skip, cursor)
+    set_next_page_headers(request, response, next_cursor)
+    return [
+        {**approval.dict(), "order_line_count": line_count, "order_total_value": total_value, "order_placed_at": placed_at}
+        for approval, line_count, total_value, placed_at, _ in rows
+    ]
+
+@router.post("/approvals/bulk", response_model=OrderBulkStatusResult)
+def bulk_decide_approvals(
+    data: OrderApprovalBulkDecision,
+    current_user: Principal = Depends(require_super_admin_or_admin)
+):
+    """Approve or reject many Requested orders of the organization in one transaction"""
+    _require_company_admin(current_user)
+    if data.status not in (ApprovalStatus.APPROVED, ApprovalStatus.REJECTED):
+        raise HTTPException(status_code=400, detail="status must be Approved or Rejected")
+    order_ids = list(dict.fromkeys(data.order_ids))
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="No orders given")
+    if len(order_ids) > ORDER_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ORDER_BULK_MAX} orders per request")
+    target = OrderStatus.APPROVED if data.status == ApprovalStatus.APPROVED else OrderStatus.REJECTED
+
+    def _decide(session: Session):
+        moved = transition_orders(
+            session, order_ids, target,
+            expected=[OrderStatus.REQUESTED],
+            scope=Order.__table__.c.placed_by_org_id == current_user.organization_id,
+            values={"approved_by_user_id": current_user.user_id} if target == OrderStatus.APPROVED else None,
+        )
+        moved_ids = [order_id for order_id, _, _ in moved]
+        resolve_pending_approvals(session, moved_ids, data.status, current_user.user_id)
+        vendors = {}
+        if moved_ids:
+            for moved_id, vendor_id in session.exec(
+                select(OrderVendor.order_id, OrderVendor.vendor_id).where(OrderVendor.order_id.in_(moved_ids))
+            ):
+                vendors.setdefault(moved_id, []).append(vendor_id)
+        return moved, vendors
+
+    moved, vendors = run_write(_decide)
+    for order_id, company_id, old_status in moved:
+        publish("order.status", company_id, vendors.get(order_id, []),
+                order_id=order_id, old_status=old_status, status=target)
+    updated = {order_id for order_id, _, _ in moved}
+    return {
+        "updated": [order_id for order_id in order_ids if order_id in updated],
+        "skipped": [order_id for order_id in order_ids if order_id not in updated],
+    }
+
 @router.get("/{order_id}", response_model=OrderRead)
 def read_order(
     order_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get order by ID"""
@@ -77,25 +206,94 @@ def read_order(
             )
     elif current_user.organization_type == OrganizationType.VENDOR:
         # Vendors can only see orders containing their products
-        from models import OrderItem, Product
-        vendor_has_items = session.exec(
-            select(OrderItem)
-            .join(Product, Product.product_id == OrderItem.product_id)
-            .where(OrderItem.order_id == order_id)
-            .where(Product.vendor_id == current_user.organization_id)
-        ).first()
+        vendor_has_items = vendor_has_order(session, order_id, current_user.organization_id)
         
         if not vendor_has_items:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access denied: Order does not contain your products"
             )
+        return vendor_order_view(order)
     
     return order
 
+@router.get("/{order_id}/detail", response_model=OrderDetailRead)
+def read_order_detail(
+    order_id: int,
+    include_history: bool = False,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Get an order with its items, approvals, invoices, documents and optionally item histories.
+    Related rows are eager-loaded with one SELECT ... IN per relationship, whatever the number of lines.
+    """
+    is_vendor = current_user.organization_type == OrganizationType.VENDOR
+    is_admin = current_user.role in [UserRole.SUPER_ADMIN, UserRole.ADMIN]
+
+    items_loader = selectinload(Order.order_items)
+    if include_history:
+        items_loader = items_loader.selectinload(OrderItem.history)
+    options = [items_loader]
+    if not is_vendor:
+        # Approvals are the company's internal workflow
+        options.append(selectinload(Order.approvals))
+    if is_admin:
+        # Invoices and documents are SuperAdmin/Admin only, as in their own routers
+        options += [selectinload(Order.invoices), selectinload(Order.documents)]
+
+    order = session.exec(select(Order).where(Order.order_id == order_id).options(*options)).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    # Same access rules as read_order
+    if current_user.organization_type == OrganizationType.COMPANY:
+        if order.placed_by_org_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Cannot view other company's orders"
+            )
+    elif is_vendor:
+        if not vendor_has_order(session, order_id, current_user.organization_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Order does not contain your products"
+            )
+
+    # Vendors only see their own lines; vendor basic users don't see prices
+    hide_prices = is_vendor and current_user.role == UserRole.USER
+    items = []
+    for it in sorted(order.order_items, key=lambda it: it.order_item_id):
+        if is_vendor and it.vendor_id != current_user.organization_id:
+            continue
+        d = it.dict()
+        if include_history:
+            history = sorted(it.history, key=lambda h: h.created_at, reverse=True)
+            d['history'] = [h.dict() for h in history]
+            if hide_prices:
+                for h in d['history']:
+                    h['old_price'] = None
+                    h['new_price'] = None
+        if hide_prices:
+            d['item_price'] = None
+            d['final_unit_price'] = None
+            d['calculated_unit_price'] = None
+        items.append(d)
+
+    if is_vendor:
+        own_lines = [it for it in order.order_items if it.vendor_id == current_user.organization_id]
+        summary = vendor_order_view(order, own_lines, hide_prices)
+    else:
+        summary = order.dict()
+    return {
+        **summary,
+        "order_items": items,
+        "approvals": [] if is_vendor else order.approvals,
+        "invoices": order.invoices if is_admin else [],
+        "documents": order.documents if is_admin else [],
+    }
+
 @router.post("/", response_model=OrderRead)
 def create_order(
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new order"""
@@ -113,21 +311,112 @@ def create_order(
             detail="Users must request order approval first"
         )
     
-    # SuperAdmin and Admin can place orders directly
-    db_order = Order(
-        placed_by_user_id=current_user.user_id,
-        placed_by_org_id=current_user.organization_id,
-        status=OrderStatus.REQUESTED
-    )
+    def _create(session: Session) -> Order:
+        # SuperAdmin and Admin can place orders directly
+        db_order = Order(
+            placed_by_user_id=current_user.user_id,
+            placed_by_org_id=current_user.organization_id,
+            status=OrderStatus.REQUESTED
+        )
+        session.add(db_order)
+        return db_order
     
-    session.add(db_order)
-    session.commit()
-    session.refresh(db_order)
-    return db_order
+    return run_write(_create)
+
+@router.post("/checkout", response_model=OrderWithItemsRead)
+def checkout(
+    cart: CheckoutRequest,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Place an order with all its items in one transaction, pricing every line in bulk"""
+    if current_user.organization_type != OrganizationType.COMPANY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only companies can place orders"
+        )
+    if current_user.role == UserRole.USER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Users must request order approval first"
+        )
+    if not cart.lines:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    if len(cart.lines) > CHECKOUT_MAX_LINES:
+        raise HTTPException(status_code=400, detail=f"At most {CHECKOUT_MAX_LINES} lines per order")
+    bad = [i for i, line in enumerate(cart.lines) if line.quantity <= 0]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Quantity must be positive (lines {bad})")
+
+    try:
+        prices = compute_prices(session, [(line.product_id, line.quantity, line.zone_code) for line in cart.lines])
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    product_ids = list({line.product_id for line in cart.lines})
+    products = {}
+    for i in range(0, len(product_ids), 500):
+        for product_id, name, vendor_id in session.exec(
+            select(Product.product_id, Product.product_name, Product.vendor_id)
+            .where(Product.product_id.in_(product_ids[i:i + 500]))
+        ):
+            products[product_id] = (name, vendor_id)
+
+    def _checkout(write_session: Session):
+        db_order = Order(
+            placed_by_user_id=current_user.user_id,
+            placed_by_org_id=current_user.organization_id,
+            status=OrderStatus.REQUESTED,
+            **totals_for_lines(
+                (line.quantity, pricing['unit_price'], ItemStatus.ACCEPTED) for line, pricing in zip(cart.lines, prices)
+            )
+        )
+        write_session.add(db_order)
+        write_session.flush()  # assigns order_id
+
+        # Core executemany inserts: the ORM would insert row by row to get each id back
+        now = datetime.utcnow()
+        write_session.execute(insert(OrderItem.__table__), [
+            {
+                "order_id": db_order.order_id,
+                "product_id": line.product_id,
+                "vendor_id": products[line.product_id][1],
+                "placed_by_org_id": db_order.placed_by_org_id,
+                "item_name": line.item_name or products[line.product_id][0],
+                "item_status": ItemStatus.ACCEPTED,
+                "purchase_order": line.purchase_order,
+                "quantity": line.quantity,
+                "zone_code": line.zone_code,
+                "calculated_unit_price": pricing['unit_price'],
+                "final_unit_price": pricing['unit_price'],
+                "pricing_source": pricing['pricing_source'],
+                "item_price": pricing['unit_price'],
+                "created_at": now,
+            }
+            for line, pricing in zip(cart.lines, prices)
+        ])
+        # New order, so its items are exactly the rows just inserted, in cart order
+        items = write_session.exec(
+            select(OrderItem).where(OrderItem.order_id == db_order.order_id).order_by(OrderItem.order_item_id)
+        ).all()
+        write_session.execute(insert(OrderItemHistory.__table__), [
+            {
+                "order_item_id": item.order_item_id,
+                "status": item.item_status,
+                "old_price": None,
+                "new_price": item.final_unit_price,
+                "price_change_reason": "Initial auto pricing",
+                "created_at": now,
+            }
+            for item in items
+        ])
+        link_order_vendors(write_session, db_order.order_id, (vendor_id for _, vendor_id in products.values()))
+        return db_order, items
+
+    db_order, items = run_write(_checkout)
+    return {**db_order.dict(), "order_items": items}
 
 @router.post("/request-approval", response_model=OrderApprovalRead)
 def request_order_approval(
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """Request order approval (for Users)"""
@@ -137,71 +426,74 @@ def request_order_approval(
             detail="Only Users need to request approval"
         )
     
-    # Create order first
-    db_order = Order(
-        placed_by_user_id=current_user.user_id,
-        placed_by_org_id=current_user.organization_id,
-        status=OrderStatus.REQUESTED
-    )
-    
-    session.add(db_order)
-    session.commit()
-    session.refresh(db_order)
+    def _request(session: Session) -> OrderApproval:
+        # Create order first
+        db_order = Order(
+            placed_by_user_id=current_user.user_id,
+            placed_by_org_id=current_user.organization_id,
+            status=OrderStatus.REQUESTED
+        )
+        session.add(db_order)
+        session.flush()  # assigns order_id
+        
+        # Create approval request
+        approval = OrderApproval(
+            order_id=db_order.order_id,
+            requested_by_user_id=current_user.user_id,
+            status=ApprovalStatus.PENDING
+        )
+        session.add(approval)
+        return approval
     
-    # Create approval request
-    approval = OrderApproval(
-        order_id=db_order.order_id,
-        requested_by_user_id=current_user.user_id,
-        status=ApprovalStatus.PENDING
+    return run_write(_request)
+
+def _explain_failed_transition(session: Session, order_id: int, target: OrderStatus, current_user: Principal,
+                               forbidden_detail: str):
+    """Raise the error for a transition whose conditional UPDATE matched no row"""
+    order = session.get(Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if current_user.organization_type == OrganizationType.COMPANY:
+        if order.placed_by_org_id != current_user.organization_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden_detail)
+    elif current_user.organization_type == OrganizationType.VENDOR:
+        if not vendor_has_order(session, order_id, current_user.organization_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden_detail)
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Order is {order.status.value}; it cannot move to {target.value}"
     )
-    
-    session.add(approval)
-    session.commit()
-    session.refresh(approval)
-    
-    return approval
 
 @router.put("/{order_id}/approve")
 def approve_order(
     order_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Approve order"""
-    order = session.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Check if order belongs to same organization
-    if order.placed_by_org_id != current_user.organization_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied: Cannot approve other organization's orders"
+    def _approve(session: Session):
+        # Only the placing organization's Requested orders can be approved
+        moved = transition_order(
+            session, order_id, OrderStatus.APPROVED,
+            expected=[OrderStatus.REQUESTED],
+            scope=Order.__table__.c.placed_by_org_id == current_user.organization_id,
+            values={"approved_by_user_id": current_user.user_id},
         )
+        if moved is None:
+            _explain_failed_transition(session, order_id, OrderStatus.APPROVED, current_user,
+                                       "Access denied: Cannot approve other organization's orders")
+        
+        # Close the approval request if there is one
+        resolve_pending_approvals(session, [order_id], ApprovalStatus.APPROVED, current_user.user_id)
+        return moved, order_vendor_ids(session, order_id)
     
-    # Update order status
-    order.status = OrderStatus.APPROVED
-    order.approved_by_user_id = current_user.user_id
-    
-    # Update approval record if exists
-    approval = session.exec(
-        select(OrderApproval).where(OrderApproval.order_id == order_id)
-    ).first()
-    
-    if approval:
-        approval.status = ApprovalStatus.APPROVED
-        approval.approved_by_user_id = current_user.user_id
-        session.add(approval)
-    
-    session.add(order)
-    session.commit()
-    
+    (company_id, old_status), vendor_ids = run_write(_approve)
+    publish("order.status", company_id, vendor_ids,
+            order_id=order_id, old_status=old_status, status=OrderStatus.APPROVED)
     return {"message": "Order approved successfully"}
 
 @router.put("/{order_id}/accept")
 def accept_order(
     order_id: int,
-    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """Accept order (vendor side)"""
@@ -211,46 +503,90 @@ def accept_order(
             detail="Only vendors can accept orders"
         )
     
-    order = session.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order.status != OrderStatus.APPROVED:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Order must be approved before accepting"
+    def _accept(session: Session):
+        # One conditional UPDATE: of two concurrent accepts only one matches an Approved row
+        moved = transition_order(
+            session, order_id, OrderStatus.ACCEPTED,
+            expected=[OrderStatus.APPROVED],
+            scope=order_scope(current_user),
+            values={"accepted_by_user_id": current_user.user_id},
         )
+        if moved is None:
+            order = session.get(Order, order_id)
+            if order and order.status == OrderStatus.REQUESTED:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Order must be approved before accepting"
+                )
+            _explain_failed_transition(session, order_id, OrderStatus.ACCEPTED, current_user,
+                                       "Access denied: Order does not contain your products")
+        return moved, order_vendor_ids(session, order_id)
     
-    order.status = OrderStatus.ACCEPTED
-    order.accepted_by_user_id = current_user.user_id
-    
-    session.add(order)
-    session.commit()
-    
+    (company_id, old_status), vendor_ids = run_write(_accept)
+    publish("order.status", company_id, vendor_ids,
+            order_id=order_id, old_status=old_status, status=OrderStatus.ACCEPTED)
     return {"message": "Order accepted successfully"}
 
 @router.put("/{order_id}/status")
 def update_order_status(
     order_id: int,
     status: OrderStatus,
-    session: Session = Depends(get_session),
+    expected_status: OrderStatus | None = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Update order status"""
-    order = session.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Check permissions based on organization type
-    if current_user.organization_type == OrganizationType.COMPANY:
-        if order.placed_by_org_id != current_user.organization_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
+    """Update order status. With expected_status the change only happens if the order is
+    still in that status (409 otherwise); without it any allowed transition applies.
+    AppOwner users may make any change, e.g. to correct a status.
+    """
+    new_status = status
+    expected = [expected_status] if expected_status else None
+    allow_any = current_user.organization_type == OrganizationType.APP_OWNER
     
-    order.status = status
-    session.add(order)
-    session.commit()
+    def _update(session: Session):
+        moved = transition_order(session, order_id, new_status, expected=expected,
+                                 scope=order_scope(current_user), allow_any=allow_any)
+        if moved is None:
+            _explain_failed_transition(session, order_id, new_status, current_user, "Access denied")
+        return moved, order_vendor_ids(session, order_id)
     
+    (company_id, old_status), vendor_ids = run_write(_update)
+    publish("order.status", company_id, vendor_ids, order_id=order_id, old_status=old_status, status=new_status)
     return {"message": "Order status updated successfully"}
+
+@router.post("/bulk-status", response_model=OrderBulkStatusResult)
+def bulk_update_order_status(
+    data: OrderBulkStatusUpdate,
+    current_user: Principal = Depends(require_super_admin_or_admin)
+):
+    """Move many orders to one status with a single conditional UPDATE.
+    Orders that are missing, not visible to the caller, or can't make the transition are skipped.
+    """
+    order_ids = list(dict.fromkeys(data.order_ids))
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="No orders given")
+    if len(order_ids) > ORDER_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ORDER_BULK_MAX} orders per request")
+    expected = [data.expected_status] if data.expected_status else None
+    allow_any = current_user.organization_type == OrganizationType.APP_OWNER
+
+    def _bulk(session: Session):
+        moved = transition_orders(session, order_ids, data.status, expected=expected,
+                                  scope=order_scope(current_user), allow_any=allow_any)
+        vendors = {}
+        if moved:
+            for moved_id, vendor_id in session.exec(
+                select(OrderVendor.order_id, OrderVendor.vendor_id)
+                .where(OrderVendor.order_id.in_([order_id for order_id, _, _ in moved]))
+            ):
+                vendors.setdefault(moved_id, []).append(vendor_id)
+        return moved, vendors
+
+    moved, vendors = run_write(_bulk)
+    for order_id, company_id, old_status in moved:
+        publish("order.status", company_id, vendors.get(order_id, []),
+                order_id=order_id, old_status=old_status, status=data.status)
+    updated = {order_id for order_id, _, _ in moved}
+    return {
+        "updated": [order_id for order_id in order_ids if order_id in updated],
+        "skipped": [order_id for order_id in order_ids if order_id not in updated],
+    }
@@ -1,24 +1,33 @@
+import csv
+import io
+import os
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_read_session, get_async_read_session, DB_ASYNC
 from models import (
     ProductZoneAdjustment, ProductZoneAdjustmentCreate, ProductZoneAdjustmentRead,
     ProductQuantityTier, ProductQuantityTierCreate, ProductQuantityTierRead,
-    User, UserRole, OrganizationType
+    PriceQuoteBatch, UserRole, OrganizationType
 )
-from dependencies import get_current_user, require_super_admin_or_admin
-from pricing_engine import compute_price
+from dependencies import Principal, get_current_principal, get_current_principal_async, require_super_admin_or_admin
+from pricing_engine import compute_price, compute_prices, invalidate_product
+from pricing_matrix import load_rate_card, iter_rate_card
+from repricing import start_repricing, get_job
+from writer import run_write
 
 router = APIRouter(prefix="/pricing", tags=["Pricing"])
 
-@router.post("/preview")
+PRICING_BATCH_MAX_LINES = int(os.getenv("PRICING_BATCH_MAX_LINES", "5000"))
+
 def preview_price(
     product_id: int,
     quantity: int = 1,
     zone_code: str | None = None,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be positive")
@@ -28,12 +37,87 @@ def preview_price(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+async def preview_price_async(
+    product_id: int,
+    quantity: int = 1,
+    zone_code: str | None = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    if quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    try:
+        return await session.run_sync(compute_price, product_id, quantity, zone_code)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+router.add_api_route("/preview", preview_price_async if DB_ASYNC else preview_price, methods=["POST"])
+
+def _batch_lines(data: PriceQuoteBatch):
+    if len(data.lines) > PRICING_BATCH_MAX_LINES:
+        raise HTTPException(status_code=400, detail=f"At most {PRICING_BATCH_MAX_LINES} lines per request")
+    bad = [i for i, line in enumerate(data.lines) if line.quantity <= 0]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Quantity must be positive (lines {bad})")
+    return [(line.product_id, line.quantity, line.zone_code) for line in data.lines]
+
+def preview_price_batch(
+    data: PriceQuoteBatch,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Price a whole cart; results are in line order, each as returned by /pricing/preview"""
+    lines = _batch_lines(data)
+    try:
+        return compute_prices(session, lines)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def preview_price_batch_async(
+    data: PriceQuoteBatch,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: Principal = Depends(get_current_principal_async)
+):
+    lines = _batch_lines(data)
+    try:
+        return await session.run_sync(compute_prices, lines)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+router.add_api_route("/preview-batch", preview_price_batch_async if DB_ASYNC else preview_price_batch, methods=["POST"])
+
+@router.get("/rate-card")
+def download_rate_card(
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
+):
+    """Vendor's full rate card as CSV: every product x zone x tier breakpoint"""
+    if current_user.organization_type != OrganizationType.VENDOR:
+        raise HTTPException(status_code=403, detail="Only vendors manage pricing")
+    # Load eagerly; the CSV is produced after the session has been released
+    card = load_rate_card(session, current_user.organization_id)
+
+    def _csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["product_id", "product_name", "zone_code", "min_quantity", "base_price", "unit_price"])
+        for n, (product_id, name, zone_code, quantity, base_price, unit_price) in enumerate(iter_rate_card(card), 1):
+            writer.writerow([product_id, name, zone_code or "", quantity, base_price, f"{unit_price:.2f}"])
+            if n % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f"rate-card-{current_user.organization_id}.csv"
+    return StreamingResponse(_csv(), media_type="text/csv", headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
 # Zone adjustments CRUD (vendor admins only)
 @router.get("/zones/{product_id}", response_model=List[ProductZoneAdjustmentRead])
 def list_zones(
     product_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     if current_user.organization_type != OrganizationType.VENDOR:
         raise HTTPException(status_code=403, detail="Only vendors manage pricing")
@@ -44,61 +128,68 @@ def list_zones(
 def create_zone(
     product_id: int,
     data: ProductZoneAdjustmentCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     if current_user.organization_type != OrganizationType.VENDOR:
         raise HTTPException(status_code=403, detail="Only vendors manage pricing")
-    # ensure uniqueness (product_id, zone_code)
-    existing = session.exec(select(ProductZoneAdjustment).where(ProductZoneAdjustment.product_id == product_id, ProductZoneAdjustment.zone_code == data.zone_code)).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Zone already exists")
-    zone = ProductZoneAdjustment(product_id=product_id, **data.dict())
-    session.add(zone)
-    session.commit()
-    session.refresh(zone)
+
+    def _create(session: Session) -> ProductZoneAdjustment:
+        # ensure uniqueness (product_id, zone_code)
+        existing = session.exec(select(ProductZoneAdjustment).where(ProductZoneAdjustment.product_id == product_id, ProductZoneAdjustment.zone_code == data.zone_code)).first()
+        if existing:
+            raise HTTPException(status_code=400, detail="Zone already exists")
+        zone = ProductZoneAdjustment(product_id=product_id, **data.dict())
+        session.add(zone)
+        return zone
+
+    zone = run_write(_create)
+    invalidate_product(product_id)
     return zone
 
 @router.put("/zones/{zone_id}", response_model=ProductZoneAdjustmentRead)
 def update_zone(
     zone_id: int,
     data: ProductZoneAdjustmentCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
-    zone = session.get(ProductZoneAdjustment, zone_id)
-    if not zone:
-        raise HTTPException(status_code=404, detail="Zone not found")
-    if current_user.organization_type != OrganizationType.VENDOR:
-        raise HTTPException(status_code=403, detail="Only vendors manage pricing")
-    for k, v in data.dict(exclude_unset=True).items():
-        setattr(zone, k, v)
-    session.add(zone)
-    session.commit()
-    session.refresh(zone)
+    def _update(session: Session) -> ProductZoneAdjustment:
+        zone = session.get(ProductZoneAdjustment, zone_id)
+        if not zone:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        if current_user.organization_type != OrganizationType.VENDOR:
+            raise HTTPException(status_code=403, detail="Only vendors manage pricing")
+        for k, v in data.dict(exclude_unset=True).items():
+            setattr(zone, k, v)
+        session.add(zone)
+        return zone
+
+    zone = run_write(_update)
+    invalidate_product(zone.product_id)
     return zone
 
 @router.delete("/zones/{zone_id}")
 def delete_zone(
     zone_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
-    zone = session.get(ProductZoneAdjustment, zone_id)
-    if not zone:
-        raise HTTPException(status_code=404, detail="Zone not found")
-    if current_user.organization_type != OrganizationType.VENDOR:
-        raise HTTPException(status_code=403, detail="Only vendors manage pricing")
-    session.delete(zone)
-    session.commit()
+    def _delete(session: Session):
+        zone = session.get(ProductZoneAdjustment, zone_id)
+        if not zone:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        if current_user.organization_type != OrganizationType.VENDOR:
+            raise HTTPException(status_code=403, detail="Only vendors manage pricing")
+        session.delete(zone)
+        return zone.product_id
+
+    invalidate_product(run_write(_delete))
     return {"message": "Zone deleted"}
 
 # Quantity tiers CRUD
 @router.get("/tiers/{product_id}", response_model=List[ProductQuantityTierRead])
 def list_tiers(
     product_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     if current_user.organization_type != OrganizationType.VENDOR:
         raise HTTPException(status_code=403, detail="Only vendors manage pricing")
@@ -109,47 +200,76 @@ def list_tiers(
 def create_tier(
     product_id: int,
     data: ProductQuantityTierCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     if current_user.organization_type != OrganizationType.VENDOR:
         raise HTTPException(status_code=403, detail="Only vendors manage pricing")
-    tier = ProductQuantityTier(product_id=product_id, **data.dict())
-    session.add(tier)
-    session.commit()
-    session.refresh(tier)
+
+    def _create(session: Session) -> ProductQuantityTier:
+        tier = ProductQuantityTier(product_id=product_id, **data.dict())
+        session.add(tier)
+        return tier
+
+    tier = run_write(_create)
+    invalidate_product(product_id)
     return tier
 
 @router.put("/tiers/{tier_id}", response_model=ProductQuantityTierRead)
 def update_tier(
     tier_id: int,
     data: ProductQuantityTierCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
-    tier = session.get(ProductQuantityTier, tier_id)
-    if not tier:
-        raise HTTPException(status_code=404, detail="Tier not found")
-    if current_user.organization_type != OrganizationType.VENDOR:
-        raise HTTPException(status_code=403, detail="Only vendors manage pricing")
-    for k, v in data.dict(exclude_unset=True).items():
-        setattr(tier, k, v)
-    session.add(tier)
-    session.commit()
-    session.refresh(tier)
+    def _update(session: Session) -> ProductQuantityTier:
+        tier = session.get(ProductQuantityTier, tier_id)
+        if not tier:
+            raise HTTPException(status_code=404, detail="Tier not found")
+        if current_user.organization_type != OrganizationType.VENDOR:
+            raise HTTPException(status_code=403, detail="Only vendors manage pricing")
+        for k, v in data.dict(exclude_unset=True).items():
+            setattr(tier, k, v)
+        session.add(tier)
+        return tier
+
+    tier = run_write(_update)
+    invalidate_product(tier.product_id)
     return tier
 
 @router.delete("/tiers/{tier_id}")
 def delete_tier(
     tier_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
+):
+    def _delete(session: Session):
+        tier = session.get(ProductQuantityTier, tier_id)
+        if not tier:
+            raise HTTPException(status_code=404, detail="Tier not found")
+        if current_user.organization_type != OrganizationType.VENDOR:
+            raise HTTPException(status_code=403, detail="Only vendors manage pricing")
+        session.delete(tier)
+        return tier.product_id
+
+    invalidate_product(run_write(_delete))
+    return {"message": "Tier deleted"}
+
+# Re-pricing of open orders after rule changes
+@router.post("/reprice-open-orders", status_code=202)
+def reprice_open_orders(
+    product_id: int | None = None,
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
-    tier = session.get(ProductQuantityTier, tier_id)
-    if not tier:
-        raise HTTPException(status_code=404, detail="Tier not found")
+    """Start re-pricing the vendor's Requested/Approved order lines (optionally one product) in the background"""
     if current_user.organization_type != OrganizationType.VENDOR:
         raise HTTPException(status_code=403, detail="Only vendors manage pricing")
-    session.delete(tier)
-    session.commit()
-    return {"message": "Tier deleted"}
+    return start_repricing(current_user.organization_id, product_id).to_dict()
+
+@router.get("/reprice-jobs/{job_id}")
+def read_reprice_job(
+    job_id: str,
+    current_user: Principal = Depends(require_super_admin_or_admin)
+):
+    """Progress of a re-pricing job"""
+    job = get_job(job_id)
+    if not job or job.vendor_id != current_user.organization_id:
+        raise HTTPException(status_code=404, detail="Repricing job not found")
+    return job.to_dict()
@@ -1,38 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_read_session, get_async_read_session, DB_ASYNC
 from models import Product, ProductCreate, ProductRead, User, OrganizationType, ProductCreateInput, ProductUpdateInput, Unit
-from dependencies import get_current_user, require_super_admin_or_admin
+from dependencies import Principal, get_current_user, get_current_user_async, require_super_admin_or_admin
+from writer import run_write
+from pricing_engine import invalidate_product
+from pagination import paginate, set_next_page_headers
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
-@router.get("/", response_model=List[ProductRead])
-def read_products(
-    skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
-):
-    """Get all products (filtered by vendor for vendors)"""
+def _list_products(session: Session, current_user: User, skip: int, limit: int, cursor: str | None = None):
+    """One page of products visible to the current user (shared by the sync and async routes)"""
     if current_user.organization_type == OrganizationType.VENDOR:
         # Vendors can only see their own products
-        products = session.exec(
-            select(Product)
-            .where(Product.vendor_id == current_user.organization_id)
-            .offset(skip)
-            .limit(limit)
-        ).all()
+        query = select(Product).where(Product.vendor_id == current_user.organization_id)
     else:
         # Companies can see all products
-        products = session.exec(select(Product).offset(skip).limit(limit)).all()
+        query = select(Product)
     
+    return paginate(session, query, Product.product_id, limit, skip, cursor)
+
+def read_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all products (filtered by vendor for vendors)"""
+    products, next_cursor = _list_products(session, current_user, skip, limit, cursor)
+    set_next_page_headers(request, response, next_cursor)
     return products
 
+async def read_products_async(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Get all products (filtered by vendor for vendors)"""
+    products, next_cursor = await session.run_sync(_list_products, current_user, skip, limit, cursor)
+    set_next_page_headers(request, response, next_cursor)
+    return products
+
+router.add_api_route(
+    "/", read_products_async if DB_ASYNC else read_products,
+    methods=["GET"], response_model=List[ProductRead]
+)
+
 @router.get("/{product_id}", response_model=ProductRead)
 def read_product(
     product_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get product by ID"""
@@ -53,8 +79,7 @@ def read_product(
 @router.post("/", response_model=ProductRead)
 def create_product(
     product_data: ProductCreateInput,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Create a new product (only vendor SuperAdmin/Admin)"""
     if current_user.organization_type != OrganizationType.VENDOR:
@@ -63,78 +88,83 @@ def create_product(
             detail="Only vendors can create products"
         )
     
-    # Validate the unit belongs to this vendor
-    unit = session.get(Unit, product_data.unit_id)
-    if not unit or unit.vendor_id != current_user.organization_id:
-        raise HTTPException(status_code=400, detail="Invalid unit selection")
-
-    db_product = Product(
-        product_name=product_data.product_name,
-        product_description=product_data.product_description,
-        price=product_data.price,
-        unit_id=product_data.unit_id,
-        vendor_id=current_user.organization_id,
-    )
-    session.add(db_product)
-    session.commit()
-    session.refresh(db_product)
-    return db_product
+    def _create(session: Session) -> Product:
+        # Validate the unit belongs to this vendor
+        unit = session.get(Unit, product_data.unit_id)
+        if not unit or unit.vendor_id != current_user.organization_id:
+            raise HTTPException(status_code=400, detail="Invalid unit selection")
+
+        db_product = Product(
+            product_name=product_data.product_name,
+            product_description=product_data.product_description,
+            price=product_data.price,
+            unit_id=product_data.unit_id,
+            vendor_id=current_user.organization_id,
+        )
+        session.add(db_product)
+        return db_product
+
+    return run_write(_create)
 
 @router.put("/{product_id}", response_model=ProductRead)
 def update_product(
     product_id: int,
     product_data: ProductUpdateInput,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Update product (only vendor SuperAdmin/Admin)"""
-    product = session.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Check if product belongs to current user's vendor
-    if product.vendor_id != current_user.organization_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied: Cannot update other vendor's products"
-        )
-    
-    update_data = product_data.dict(exclude_unset=True)
+    def _update(session: Session) -> Product:
+        product = session.get(Product, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        # Check if product belongs to current user's vendor
+        if product.vendor_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Cannot update other vendor's products"
+            )
+        
+        update_data = product_data.dict(exclude_unset=True)
 
-    # If unit change requested validate new unit
-    if 'unit_id' in update_data:
-        new_unit = session.get(Unit, update_data['unit_id'])
-        if not new_unit or new_unit.vendor_id != current_user.organization_id:
-            raise HTTPException(status_code=400, detail="Invalid unit selection")
+        # If unit change requested validate new unit
+        if 'unit_id' in update_data:
+            new_unit = session.get(Unit, update_data['unit_id'])
+            if not new_unit or new_unit.vendor_id != current_user.organization_id:
+                raise HTTPException(status_code=400, detail="Invalid unit selection")
 
-    for field, value in update_data.items():
-        setattr(product, field, value)
+        for field, value in update_data.items():
+            setattr(product, field, value)
 
-    product.vendor_id = current_user.organization_id  # enforce
-    
-    session.add(product)
-    session.commit()
-    session.refresh(product)
+        product.vendor_id = current_user.organization_id  # enforce
+        
+        session.add(product)
+        return product
+
+    product = run_write(_update)
+    invalidate_product(product_id)
     return product
 
 @router.delete("/{product_id}")
 def delete_product(
     product_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Delete product (only vendor SuperAdmin/Admin)"""
-    product = session.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Check if product belongs to current user's vendor
-    if product.vendor_id != current_user.organization_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied: Cannot delete other vendor's products"
-        )
-    
-    session.delete(product)
-    session.commit()
+    def _delete(session: Session):
+        product = session.get(Product, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        # Check if product belongs to current user's vendor
+        if product.vendor_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Cannot delete other vendor's products"
+            )
+        
+        session.delete(product)
+
+    run_write(_delete)
+    invalidate_product(product_id)
     return {"message": "Product deleted successfully"}
@@ -1,34 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlmodel import Session, select
 from typing import List
-from database import get_session
+from database import get_read_session
 from models import User, UserCreate, UserRead, UserUpdate, UserRole
-from dependencies import get_current_user, require_super_admin_or_admin
+from dependencies import Principal, get_current_user, require_super_admin_or_admin
 from auth import get_password_hash
+from writer import run_write
+from user_cache import invalidate_users
+from token_versions import record_deleted_users, token_versions
+from pagination import paginate, set_next_page_headers
+from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.get("/", response_model=List[UserRead])
 def read_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Get all users - AppOwner sees all, others see only same organization"""
-    query = select(User).offset(skip).limit(limit)
+    query = select(User)
     
     # AppOwner can see all users, others only see same organization
     if current_user.organization_type != "AppOwner":
         query = query.where(User.organization_id == current_user.organization_id)
     
-    users = session.exec(query).all()
+    users, next_cursor = paginate(session, query, User.user_id, limit, skip, cursor)
+    set_next_page_headers(request, response, next_cursor)
     return users
 
 @router.get("/{user_id}", response_model=UserRead)
 def read_user(
     user_id: int,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: User = Depends(get_current_user)
 ):
     """Get user by ID"""
@@ -48,8 +57,8 @@ def read_user(
 @router.post("/", response_model=UserRead)
 def create_user(
     user_data: UserCreate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    session: Session = Depends(get_read_session),
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Create a new user"""
     # Check if phone number already exists
@@ -77,86 +86,105 @@ def create_user(
         target_org_id = current_user.organization_id
         target_org_type = current_user.organization_type
 
-    db_user = User(
-        full_name=user_data.full_name,
-        phone_number=user_data.phone_number,
-        password_hash=get_password_hash(user_data.password),
-        role=user_data.role,
-        organization_id=target_org_id,
-        organization_type=target_org_type,
-        created_by=current_user.user_id
-    )
-    
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    
-    return db_user
+    # Hash outside the write transaction so bcrypt doesn't hold the writer
+    password_hash = get_password_hash(user_data.password)
+
+    def _create(write_session: Session) -> User:
+        db_user = User(
+            full_name=user_data.full_name,
+            phone_number=user_data.phone_number,
+            password_hash=password_hash,
+            role=user_data.role,
+            organization_id=target_org_id,
+            organization_type=target_org_type,
+            created_by=current_user.user_id
+        )
+        write_session.add(db_user)
+        return db_user
+
+    try:
+        return run_write(_create)
+    except IntegrityError:
+        # Lost a race with another request registering the same phone
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Phone number already registered"
+        )
 
 @router.put("/{user_id}", response_model=UserRead)
 def update_user(
     user_id: int,
     user_data: UserUpdate,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Update user"""
-    user = session.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if user belongs to same organization
-    if user.organization_id != current_user.organization_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied: Different organization"
-        )
-    
-    # Admin cannot update SuperAdmin or other Admins
-    if current_user.role == UserRole.ADMIN and user.role in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin cannot update SuperAdmin or other Admins"
-        )
-    
-    user_data_dict = user_data.dict(exclude_unset=True)
-    for field, value in user_data_dict.items():
-        setattr(user, field, value)
-    
-    user.updated_by = current_user.user_id
-    
-    session.add(user)
-    session.commit()
-    session.refresh(user)
-    
+    def _update(session: Session) -> User:
+        user = session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # Check if user belongs to same organization
+        if user.organization_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Different organization"
+            )
+        
+        # Admin cannot update SuperAdmin or other Admins
+        if current_user.role == UserRole.ADMIN and user.role in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin cannot update SuperAdmin or other Admins"
+            )
+        
+        old_phone = user.phone_number
+        old_role = user.role
+        user_data_dict = user_data.dict(exclude_unset=True)
+        for field, value in user_data_dict.items():
+            setattr(user, field, value)
+        # Stateless tokens carry the role; outdate the ones already issued
+        if user.role != old_role:
+            user.token_version += 1
+        
+        user.updated_by = current_user.user_id
+        
+        session.add(user)
+        return user, old_phone
+    
+    user, old_phone = run_write(_update)
+    invalidate_users(old_phone, user.phone_number)
+    token_versions.bump(user.user_id, user.token_version)
     return user
 
 @router.delete("/{user_id}")
 def delete_user(
     user_id: int,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(require_super_admin_or_admin)
+    current_user: Principal = Depends(require_super_admin_or_admin)
 ):
     """Delete user"""
-    user = session.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if user belongs to same organization
-    if user.organization_id != current_user.organization_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied: Different organization"
-        )
-    
-    # Admin cannot delete SuperAdmin or other Admins
-    if current_user.role == UserRole.ADMIN and user.role in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin cannot delete SuperAdmin or other Admins"
-        )
-    
-    session.delete(user)
-    session.commit()
-    
+    def _delete(session: Session):
+        user = session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # Check if user belongs to same organization
+        if user.organization_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Different organization"
+            )
+        
+        # Admin cannot delete SuperAdmin or other Admins
+        if current_user.role == UserRole.ADMIN and user.role in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin cannot delete SuperAdmin or other Admins"
+            )
+        
+        session.delete(user)
+        return user.phone_number, record_deleted_users(session, [user_id])
+    
+    phone_number, deleted_at = run_write(_delete)
+    invalidate_users(phone_number)
+    token_versions.forget([user_id], deleted_at)
     return {"message": "User deleted successfully"}
@@ -0,0 +1,192 @@
+"""Verify the main router and pricing queries are served by indexes.
+
+Builds a throwaway SQLite database from the models plus migrations, runs
+EXPLAIN QUERY PLAN for each hot-path query (mirroring the statements the
+routers and pricing_engine's rule loader issue) and fails if an expected index is not used
+or a full scan / temp sort shows up.
+
+Usage (from backend/):
+    python scripts/check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def _checks():
+    from sqlalchemy import text, tuple_
+    from sqlmodel import select
+    from models import (
+        Product, Unit, Order, OrderApproval, OrderItem, OrderItemHistory, OrderVendor, Invoice, Document, User,
+        InvoiceVendor, DocumentVendor,
+        UserTombstone,
+        ProductZoneAdjustment, ProductQuantityTier,
+    )
+    vendor_id, company_id, order_id, product_id, item_id = 1, 2, 3, 4, 5
+
+    # (name, statement, indexes that must appear in the plan); list endpoints use the
+    # keyset page form from pagination.paginate: WHERE key > :cursor ORDER BY key LIMIT n + 1
+    return [
+        ("read_products (vendor)",
+         select(Product).where(Product.vendor_id == vendor_id).where(Product.product_id > 0).order_by(Product.product_id).limit(101),
+         ["ix_product_vendor_id"]),
+        ("read_units (vendor)",
+         select(Unit).where(Unit.vendor_id == vendor_id).where(Unit.unit_id > 0).order_by(Unit.unit_id).limit(101),
+         ["ix_unit_vendor_id"]),
+        ("read_users (organization)",
+         select(User).where(User.organization_id == company_id).where(User.user_id > 0).order_by(User.user_id).limit(101),
+         ["ix_user_organization_id"]),
+        ("read_orders (company)",
+         select(Order).where(Order.placed_by_org_id == company_id).where(Order.order_id > 0).order_by(Order.order_id).limit(101),
+         ["ix_order_placed_by_org_id"]),
+        ("read_orders (company, by value desc)",
+         select(Order).where(Order.placed_by_org_id == company_id)
+         .where(Order.total_value >= 100)
+         .where(tuple_(Order.total_value, Order.order_id) < tuple_(5000.0, 10**9))
+         .order_by(Order.total_value.desc(), Order.order_id.desc()).limit(101),
+         ["ix_order_org_total_value"]),
+        ("read_pending_approvals (company)",
+         select(OrderApproval, Order.line_count, Order.total_value, Order.placed_at, Order.order_id)
+         .join(Order, Order.order_id == OrderApproval.order_id)
+         .where(Order.placed_by_org_id == company_id)
+         .where(Order.status == "REQUESTED")
+         .where(OrderApproval.status == "PENDING")
+         .where(Order.order_id > 0).order_by(Order.order_id).limit(101),
+         ["ix_order_org_status", "ix_orderapproval_order_status"]),
+        ("read_orders (vendor)",
+         select(Order)
+         .join(OrderVendor, OrderVendor.order_id == Order.order_id)
+         .where(OrderVendor.vendor_id == vendor_id)
+         .where(OrderVendor.order_id > 0).order_by(OrderVendor.order_id).limit(101),
+         ["ix_ordervendor_vendor_order"]),
+        ("read_order / invoice / document (vendor access check)",
+         select(OrderVendor)
+         .where(OrderVendor.order_id == order_id)
+         .where(OrderVendor.vendor_id == vendor_id),
+         ["sqlite_autoindex_ordervendor_1"]),
+        ("read_invoices (vendor)",
+         select(Invoice)
+         .join(InvoiceVendor, InvoiceVendor.invoice_id == Invoice.invoice_id)
+         .where(InvoiceVendor.vendor_id == vendor_id)
+         .where(InvoiceVendor.invoice_id > 0).order_by(InvoiceVendor.invoice_id).limit(101),
+         ["ix_invoicevendor_vendor_invoice"]),
+        ("read_documents (vendor)",
+         select(Document)
+         .join(DocumentVendor, DocumentVendor.document_id == Document.document_id)
+         .where(DocumentVendor.vendor_id == vendor_id)
+         .where(DocumentVendor.document_id > 0).order_by(DocumentVendor.document_id).limit(101),
+         ["ix_documentvendor_vendor_document"]),
+        ("read_documents (vendor, by order)",
+         select(Document)
+         .where(Document.order_id == order_id)
+         .join(OrderVendor, OrderVendor.order_id == Document.order_id)
+         .where(OrderVendor.vendor_id == vendor_id)
+         .where(Document.document_id > 0).order_by(Document.document_id).limit(101),
+         ["ix_document_order_id"]),
+        ("repricing open lines (vendor)",
+         select(OrderItem)
+         .join(Order, Order.order_id == OrderItem.order_id)
+         .where(Order.status.in_(["REQUESTED", "APPROVED"]))
+         .where(OrderItem.vendor_id == vendor_id)
+         .where(OrderItem.order_item_id > 0)
+         .order_by(OrderItem.order_item_id)
+         .limit(500),
+         ["ix_orderitem_vendor_id"]),
+        ("read_order_items (company)",
+         select(OrderItem)
+         .where(OrderItem.placed_by_org_id == company_id)
+         .where(OrderItem.order_item_id > 0).order_by(OrderItem.order_item_id).limit(101),
+         ["ix_orderitem_org_item"]),
+        ("read_order_items (vendor)",
+         select(OrderItem)
+         .where(OrderItem.vendor_id == vendor_id)
+         .where(OrderItem.order_item_id > 0).order_by(OrderItem.order_item_id).limit(101),
+         ["ix_orderitem_vendor_id"]),
+        ("read_order_items (company, by order)",
+         select(OrderItem)
+         .join(Order, Order.order_id == OrderItem.order_id)
+         .where(Order.placed_by_org_id == company_id)
+         .where(OrderItem.order_id == order_id)
+         .where(OrderItem.order_item_id > 0).order_by(OrderItem.order_item_id).limit(101),
+         ["ix_orderitem_order_id"]),
+        ("read_order_items (by order)",
+         select(OrderItem).where(OrderItem.order_id == order_id).where(OrderItem.order_item_id > 0).order_by(OrderItem.order_item_id).limit(101),
+         ["ix_orderitem_order_id"]),
+        ("read_order_item_history",
+         select(OrderItemHistory)
+         .where(OrderItemHistory.order_item_id == item_id)
+         .order_by(OrderItemHistory.created_at.desc()),
+         ["ix_orderitemhistory_item_created"]),
+        ("read_invoices (company)",
+         select(Invoice)
+         .where(Invoice.placed_by_org_id == company_id)
+         .where(Invoice.invoice_id > 0).order_by(Invoice.invoice_id).limit(101),
+         ["ix_invoice_org_invoice"]),
+        ("read_documents (company)",
+         select(Document)
+         .where(Document.placed_by_org_id == company_id)
+         .where(Document.document_id > 0).order_by(Document.document_id).limit(101),
+         ["ix_document_org_document"]),
+        ("read_documents (company, by order)",
+         select(Document)
+         .where(Document.order_id == order_id)
+         .join(Order, Document.order_id == Order.order_id)
+         .where(Order.placed_by_org_id == company_id)
+         .where(Document.document_id > 0).order_by(Document.document_id).limit(101),
+         ["ix_document_order_id"]),
+        ("stateless auth token version reload",
+         select(User.user_id, User.token_version).where(text("token_version > 0")),
+         ["ix_user_token_version"]),
+        ("stateless auth tombstone reload",
+         select(UserTombstone.user_id, UserTombstone.deleted_at).where(UserTombstone.deleted_at > 0),
+         ["ix_usertombstone_deleted_at"]),
+        ("pricing rules load (zones)",
+         select(ProductZoneAdjustment)
+         .where(ProductZoneAdjustment.product_id.in_([product_id, product_id + 1]))
+         .where(ProductZoneAdjustment.active == True),
+         ["ix_productzoneadjustment_product_zone_active"]),
+        ("pricing rules load (tiers)",
+         select(ProductQuantityTier)
+         .where(ProductQuantityTier.product_id.in_([product_id, product_id + 1]))
+         .where(ProductQuantityTier.active == True),
+         ["ix_productquantitytier_product_active_min_qty"]),
+    ]
+
+# Plan fragments that mean the index set is not doing its job
+FORBIDDEN = ("SCAN orderitem", "SCAN product ", "SCAN \"order\"", "SCAN order ", "USE TEMP B-TREE FOR ORDER BY")
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+        from database import engine, create_db_and_tables
+        from migrations import upgrade
+        import models  # noqa: F401  register tables on the metadata
+
+        create_db_and_tables()
+        upgrade(engine)
+
+        failures = 0
+        with engine.connect() as conn:
+            for name, statement, indexes in _checks():
+                sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+                plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+                plan_text = "\n".join(plan)
+                missing = [ix for ix in indexes if ix not in plan_text]
+                bad = [frag for frag in FORBIDDEN if frag in plan_text + " "]
+                ok = not missing and not bad
+                failures += not ok
+                print(f"[{'ok' if ok else 'FAIL'}] {name}")
+                if not ok:
+                    for line in plan:
+                        print(f"    {line}")
+                    if missing:
+                        print(f"    missing index: {', '.join(missing)}")
+                    if bad:
+                        print(f"    unexpected: {', '.join(bad)}")
+        engine.dispose()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
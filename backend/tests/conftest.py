@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# The engines are created at import time, so point them at a throwaway database first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+import main  # noqa: E402
+
+def login(client, phone_number: str, password: str) -> dict:
+    response = client.post("/auth/login", json={"phone_number": phone_number, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def owner(client):
+    return login(client, "9999999999", "admin123")
+
+_phones = iter(range(5000000000, 5999999999))
+
+def make_org(client, owner, organization_type: str) -> SimpleNamespace:
+    """An organization and its SuperAdmin's auth headers"""
+    phone = str(next(_phones))
+    response = client.post("/organizations/", json={
+        "name": f"{organization_type} {phone}", "organization_type": organization_type, "admin_phone": phone,
+    }, headers=owner)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    return SimpleNamespace(
+        id=data["organization"]["id"],
+        headers=login(client, phone, data["admin_user"]["temporary_password"]),
+    )
+
+def make_user(client, org, organization_type: str, role: str = "User") -> dict:
+    """Auth headers of a new user in ``org``"""
+    phone = str(next(_phones))
+    response = client.post("/users/", json={
+        "full_name": f"{role} {phone}", "phone_number": phone, "role": role,
+        "organization_type": organization_type, "password": "secret",
+    }, headers=org.headers)
+    assert response.status_code == 200, response.text
+    return login(client, phone, "secret")
+
+def make_product(client, vendor, price: float) -> int:
+    unit = client.post("/units/", json={"unit_name": "kg"}, headers=vendor.headers).json()
+    response = client.post("/products/", json={
+        "product_name": f"Product {price}", "price": price, "unit_id": unit["unit_id"],
+    }, headers=vendor.headers)
+    assert response.status_code == 200, response.text
+    return response.json()["product_id"]
+
+def walk_pages(client, path: str, headers: dict, key: str, **params) -> list:
+    """``key`` of every row of a list endpoint, following its cursors one row at a time"""
+    seen, params = [], {"limit": 1, **params}
+    while True:
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        seen += [row[key] for row in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            return seen
+        params["cursor"] = response.headers["X-Next-Cursor"]
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import DATABASE_URL
+from dependencies import get_current_user_async
+from user_cache import user_cache
+
+def _current_user(token: str):
+    async def lookup():
+        engine = create_async_engine(DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+        try:
+            async with AsyncSession(engine) as session:
+                return await get_current_user_async(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), session)
+        finally:
+            await engine.dispose()
+    return asyncio.run(lookup())
+
+def test_async_lookup_loads_the_token_user(client, owner):
+    user_cache.clear()
+    user = _current_user(owner["Authorization"].split()[1])
+    assert user.phone_number == "9999999999"
+    # Cached for the next request like the sync lookup
+    assert user_cache.get("9999999999") is user
+
+def test_async_lookup_rejects_a_bad_token(client):
+    with pytest.raises(HTTPException) as error:
+        _current_user("not-a-token")
+    assert error.value.status_code == 401
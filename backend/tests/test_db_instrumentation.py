@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from db_instrumentation import begin_request_stats, end_request_stats, instrument_engine
+
+def test_failed_statement_does_not_leave_a_start_time():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    stats, token = begin_request_stats()
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM missing_table")
+            assert conn.info["query_start_time"] == []
+            conn.exec_driver_sql("SELECT 1")
+            assert conn.info["query_start_time"] == []
+    finally:
+        end_request_stats(token)
+    assert stats.count == 2
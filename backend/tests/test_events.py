@@ -0,0 +1,48 @@
+import asyncio
+
+from events import RESET, EventBus
+
+COMPANY, VENDOR, OTHER = 1, 2, 3
+
+def _drain(subscription) -> list:
+    items = []
+    while not subscription.queue.empty():
+        items.append(subscription.queue.get_nowait())
+    return items
+
+def _published(buffer_size=5, count=8):
+    bus = EventBus(buffer_size=buffer_size)
+    ids = []
+    for n in range(count):
+        # Every other event belongs to an order of another company
+        company = COMPANY if n % 2 == 0 else OTHER
+        ids.append(bus.publish("order.status", company, [VENDOR], {"n": n}).id)
+    return bus, ids
+
+def test_resume_replays_buffered_events_after_the_id():
+    async def run():
+        bus, ids = _published()
+        recent = _drain(bus.subscribe(COMPANY, last_event_id=ids[4]))
+        # The oldest buffered event directly follows the requested id, so nothing was lost
+        oldest = _drain(bus.subscribe(VENDOR, last_event_id=ids[2]))
+        latest = _drain(bus.subscribe(COMPANY, last_event_id=ids[-1]))
+        return ids, recent, oldest, latest
+
+    ids, recent, oldest, latest = asyncio.run(run())
+    assert [e.id for e in recent] == [ids[6]]
+    assert [e.id for e in oldest] == ids[3:]
+    assert latest == []
+
+def test_resume_from_an_evicted_id_resets():
+    async def run():
+        bus, ids = _published()
+        subscription = bus.subscribe(COMPANY, last_event_id=ids[1])
+        reset = _drain(subscription)
+        # Live events keep flowing after the reset
+        event = bus.publish("order.status", COMPANY, [], {})
+        await asyncio.sleep(0)
+        return reset, event, _drain(subscription)
+
+    reset, event, live = asyncio.run(run())
+    assert reset == [RESET]
+    assert live == [event]
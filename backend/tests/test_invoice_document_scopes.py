@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import make_org, make_product, walk_pages
+
+RECORDS = {
+    "/invoices/": ("invoice_id", {"file_url": "https://files/invoice.pdf"}),
+    "/documents/": ("document_id", {"file_url": "https://files/po.pdf", "document_type": "purchase_order"}),
+}
+
+@pytest.mark.parametrize("path", RECORDS)
+def test_list_pages_follow_the_order_scope(client, owner, path):
+    key, body = RECORDS[path]
+    vendor, late_vendor = make_org(client, owner, "Vendor"), make_org(client, owner, "Vendor")
+    company, other_company = make_org(client, owner, "Company"), make_org(client, owner, "Company")
+    product_id = make_product(client, vendor, 5)
+
+    def order_for(org):
+        response = client.post("/orders/checkout", json={"lines": [{"product_id": product_id}]}, headers=org.headers)
+        assert response.status_code == 200, response.text
+        return response.json()["order_id"]
+
+    def record_for(org, order_id):
+        response = client.post(path, json={"order_id": order_id, **body}, headers=org.headers)
+        assert response.status_code == 200, response.text
+        return response.json()[key]
+
+    order_id, other_order_id = order_for(company), order_for(other_company)
+    mine = [record_for(company, order_id) for _ in range(2)]
+    theirs = record_for(other_company, other_order_id)
+
+    assert walk_pages(client, path, company.headers, key) == mine
+    assert walk_pages(client, path, vendor.headers, key) == sorted(mine + [theirs])
+    assert walk_pages(client, path, late_vendor.headers, key) == []
+
+    # A vendor whose items join the order afterwards sees the records created before
+    added = client.post("/order-items/", json={"order_id": order_id, "product_id": make_product(client, late_vendor, 7)},
+                        headers=company.headers)
+    assert added.status_code == 200, added.text
+    assert walk_pages(client, path, late_vendor.headers, key) == mine
+
+    assert client.delete(f"{path}{mine[0]}", headers=company.headers).status_code == 200
+    assert walk_pages(client, path, late_vendor.headers, key) == mine[1:]
+    assert walk_pages(client, path, company.headers, key) == mine[1:]
@@ -0,0 +1,26 @@
+from conftest import make_org, make_product
+from events import event_bus
+
+def test_bulk_item_status_publishes_one_event_per_order(client, owner):
+    vendor, company = make_org(client, owner, "Vendor"), make_org(client, owner, "Company")
+    product_id = make_product(client, vendor, 5)
+    orders = []
+    for _ in range(2):
+        response = client.post("/orders/checkout", json={"lines": [{"product_id": product_id, "quantity": 1}] * 3},
+                               headers=company.headers)
+        assert response.status_code == 200, response.text
+        orders.append(response.json())
+    item_ids = [it["order_item_id"] for order in orders for it in order["order_items"]]
+
+    before = event_bus.last_id
+    response = client.post("/order-items/bulk-status", json={
+        "items": [{"order_item_id": item_id, "new_status": "Delivered"} for item_id in item_ids],
+    }, headers=vendor.headers)
+    assert response.status_code == 200, response.text
+
+    events = [e for e in event_bus._buffer if e.id > before]
+    assert [(e.type, e.data["order_id"]) for e in events] == [("items.status", o["order_id"]) for o in orders]
+    for event, order in zip(events, orders):
+        assert [it["order_item_id"] for it in event.data["items"]] == [it["order_item_id"] for it in order["order_items"]]
+        assert {(it["old_status"], it["status"]) for it in event.data["items"]} == {("Accepted", "Delivered")}
+        assert event.visible_to(company.id) and event.visible_to(vendor.id)
@@ -0,0 +1,9 @@
+from sqlalchemy import create_engine
+
+import migrations
+
+def test_status_does_not_create_a_missing_database(tmp_path, monkeypatch):
+    path = tmp_path / "missing.db"
+    monkeypatch.setattr("database.engine", create_engine(f"sqlite:///{path}"))
+    assert migrations.main(["migrations.py", "status"]) == 1
+    assert not path.exists()
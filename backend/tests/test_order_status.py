@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import make_org
+from events import event_bus
+
+@pytest.fixture
+def company(client, owner):
+    return make_org(client, owner, "Company")
+
+def _new_order(client, company) -> int:
+    response = client.post("/orders/", headers=company.headers)
+    assert response.status_code == 200, response.text
+    return response.json()["order_id"]
+
+def _last_event(order_id: int):
+    return next(e for e in reversed(event_bus._buffer) if e.data.get("order_id") == order_id)
+
+def test_status_event_carries_previous_status(client, company):
+    order_id = _new_order(client, company)
+    response = client.put(f"/orders/{order_id}/status", params={"status": "Approved"}, headers=company.headers)
+    assert response.status_code == 200, response.text
+    event = _last_event(order_id)
+    assert (event.data["old_status"], event.data["status"]) == ("Requested", "Approved")
+
+def test_bulk_status_events_carry_previous_status(client, company):
+    requested = _new_order(client, company)
+    approved = _new_order(client, company)
+    client.put(f"/orders/{approved}/status", params={"status": "Approved"}, headers=company.headers)
+    response = client.post("/orders/bulk-status", json={"order_ids": [requested, approved], "status": "Rejected"},
+                           headers=company.headers)
+    assert response.json()["updated"] == [requested, approved]
+    assert _last_event(requested).data["old_status"] == "Requested"
+    assert _last_event(approved).data["old_status"] == "Approved"
+
+def test_disallowed_transition_conflicts(client, company):
+    order_id = _new_order(client, company)
+    client.put(f"/orders/{order_id}/status", params={"status": "Approved"}, headers=company.headers)
+    response = client.put(f"/orders/{order_id}/status", params={"status": "Requested"}, headers=company.headers)
+    assert response.status_code == 409
+
+def test_app_owner_may_make_any_transition(client, owner, company):
+    order_id = _new_order(client, company)
+    client.put(f"/orders/{order_id}/status", params={"status": "Approved"}, headers=company.headers)
+    response = client.put(f"/orders/{order_id}/status", params={"status": "Requested"}, headers=owner)
+    assert response.status_code == 200, response.text
+    assert _last_event(order_id).data["old_status"] == "Approved"
+    # expected_status still guards the change
+    response = client.put(f"/orders/{order_id}/status", params={"status": "Delivered", "expected_status": "Approved"},
+                          headers=owner)
+    assert response.status_code == 409
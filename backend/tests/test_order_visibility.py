@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import make_org, make_product, make_user
+
+TOTAL_FIELDS = [
+    "line_count", "total_quantity", "total_value", "accepted_count", "out_of_stock_count",
+    "rejected_count", "out_for_delivery_count", "delivered_count",
+]
+
+@pytest.fixture(scope="module")
+def shared_order(client, owner):
+    """A company order with one line from each of two vendors"""
+    vendor, other_vendor = make_org(client, owner, "Vendor"), make_org(client, owner, "Vendor")
+    company = make_org(client, owner, "Company")
+    lines = [
+        {"product_id": make_product(client, vendor, 10), "quantity": 2},
+        {"product_id": make_product(client, other_vendor, 1000), "quantity": 3},
+    ]
+    response = client.post("/orders/checkout", json={"lines": lines}, headers=company.headers)
+    assert response.status_code == 200, response.text
+    return SimpleNamespace(
+        order_id=response.json()["order_id"],
+        company=company,
+        vendor=vendor,
+        vendor_user=make_user(client, vendor, "Vendor"),
+    )
+
+def _listed(client, headers, order_id):
+    response = client.get("/orders/", headers=headers)
+    assert response.status_code == 200, response.text
+    return next(o for o in response.json() if o["order_id"] == order_id)
+
+def test_company_sees_full_totals(client, shared_order):
+    order = _listed(client, shared_order.company.headers, shared_order.order_id)
+    assert order["line_count"] == 2
+    assert order["total_value"] == 3020.0
+
+@pytest.mark.parametrize("who", ["vendor_admin", "vendor_user"])
+def test_vendor_order_reads_hide_totals(client, shared_order, who):
+    headers = shared_order.vendor.headers if who == "vendor_admin" else shared_order.vendor_user
+    listed = _listed(client, headers, shared_order.order_id)
+    single = client.get(f"/orders/{shared_order.order_id}", headers=headers).json()
+    for order in (listed, single):
+        assert all(order[field] is None for field in TOTAL_FIELDS), order
+
+def test_vendor_detail_totals_cover_own_lines(client, shared_order):
+    detail = client.get(f"/orders/{shared_order.order_id}/detail", headers=shared_order.vendor.headers).json()
+    assert len(detail["order_items"]) == 1
+    assert detail["line_count"] == 1
+    assert detail["total_quantity"] == 2
+    assert detail["total_value"] == 20.0
+
+def test_vendor_user_detail_has_no_value(client, shared_order):
+    detail = client.get(f"/orders/{shared_order.order_id}/detail", headers=shared_order.vendor_user).json()
+    assert detail["line_count"] == 1
+    assert detail["total_value"] is None
+    assert detail["order_items"][0]["final_unit_price"] is None
+
+@pytest.mark.parametrize("params", [{"sort": "-total_value"}, {"min_value": 1000}, {"max_value": 100}])
+def test_vendor_cannot_sort_or_filter_by_value(client, shared_order, params):
+    response = client.get("/orders/", params=params, headers=shared_order.vendor.headers)
+    assert response.status_code == 400
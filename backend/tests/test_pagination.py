@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import make_org, make_product, walk_pages
+from database import read_engine
+from models import Product
+from pagination import paginate
+from sqlmodel import Session, select
+
+# path -> who may list it
+LIST_ROUTES = {
+    "/orders/": "company", "/products/": "company", "/order-items/": "company", "/units/": "company",
+    "/invoices/": "company", "/documents/": "company", "/users/": "company",
+    "/organizations/vendors": "company", "/orders/approvals/pending": "company", "/organizations/": "owner",
+}
+
+@pytest.fixture(scope="module")
+def company(client, owner):
+    return make_org(client, owner, "Company")
+
+@pytest.mark.parametrize("path", LIST_ROUTES)
+@pytest.mark.parametrize("limit", [0, -1])
+def test_non_positive_limit_is_rejected(client, owner, company, path, limit):
+    headers = owner if LIST_ROUTES[path] == "owner" else company.headers
+    assert client.get(path, params={"limit": 1}, headers=headers).status_code == 200
+    assert client.get(path, params={"limit": limit}, headers=headers).status_code == 422
+
+def test_paginate_zero_limit_runs_no_query():
+    with Session(read_engine) as session:
+        assert paginate(session, select(Product), Product.product_id, 0) == ([], None)
+
+def test_cursor_walks_every_row_once(client, owner):
+    vendor = make_org(client, owner, "Vendor")
+    created = [make_product(client, vendor, price) for price in range(1, 6)]
+    seen, params = [], {"limit": 2}
+    while True:
+        response = client.get("/products/", params=params, headers=vendor.headers)
+        assert response.status_code == 200, response.text
+        seen += [p["product_id"] for p in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params = {"limit": 2, "cursor": response.headers["X-Next-Cursor"]}
+    assert seen == created
+
+def test_company_item_pages_hold_only_its_items(client, owner):
+    vendor = make_org(client, owner, "Vendor")
+    product_id = make_product(client, vendor, 5)
+    companies = [make_org(client, owner, "Company") for _ in range(2)]
+    expected = {}
+    for company in companies:
+        response = client.post("/orders/checkout", json={"lines": [{"product_id": product_id}] * 2},
+                               headers=company.headers)
+        assert response.status_code == 200, response.text
+        order = response.json()
+        added = client.post("/order-items/", json={"order_id": order["order_id"], "product_id": product_id},
+                            headers=company.headers)
+        assert added.status_code == 200, added.text
+        expected[company.id] = [i["order_item_id"] for i in order["order_items"]] + [added.json()["order_item_id"]]
+    for company in companies:
+        assert walk_pages(client, "/order-items/", company.headers, "order_item_id") == expected[company.id]
@@ -0,0 +1,75 @@
+import pytest
+from sqlmodel import Session
+
+from conftest import make_org, make_product
+from database import read_engine
+from models import Product
+from pricing_engine import compute_price, get_rules, invalidate_product, rule_cache
+from writer import run_write
+
+@pytest.fixture(scope="module")
+def vendor(client, owner):
+    return make_org(client, owner, "Vendor")
+
+def _preview(client, vendor, product_id, quantity=10, zone_code=None):
+    params = {"product_id": product_id, "quantity": quantity}
+    if zone_code:
+        params["zone_code"] = zone_code
+    response = client.post("/pricing/preview", params=params, headers=vendor.headers)
+    assert response.status_code == 200, response.text
+    return response.json()["unit_price"]
+
+def test_rule_changes_reach_the_next_preview(client, vendor):
+    product_id = make_product(client, vendor, 100)
+    assert _preview(client, vendor, product_id) == 100
+    assert rule_cache.get(product_id) is not None
+
+    tier = client.post(f"/pricing/tiers/{product_id}", json={
+        "min_qty": 5, "discount_type": "Percent", "discount_amount": 10,
+    }, headers=vendor.headers).json()
+    assert _preview(client, vendor, product_id) == 90
+
+    tier_id = tier["product_quantity_tier_id"]
+    response = client.put(f"/pricing/tiers/{tier_id}", json={
+        "min_qty": 5, "discount_type": "Percent", "discount_amount": 20,
+    }, headers=vendor.headers)
+    assert response.status_code == 200, response.text
+    assert _preview(client, vendor, product_id) == 80
+
+    zone = client.post(f"/pricing/zones/{product_id}", json={
+        "zone_code": "FAR", "adjustment_type": "Absolute", "amount": 50,
+    }, headers=vendor.headers).json()
+    assert _preview(client, vendor, product_id, zone_code="FAR") == 120
+
+    assert client.delete(f"/pricing/zones/{zone['product_zone_adjustment_id']}", headers=vendor.headers).status_code == 200
+    assert client.delete(f"/pricing/tiers/{tier_id}", headers=vendor.headers).status_code == 200
+    assert _preview(client, vendor, product_id, zone_code="FAR") == 100
+
+def test_snapshot_older_than_an_invalidation_is_not_cached(client, vendor):
+    product_id = make_product(client, vendor, 10)
+    rule_cache.clear()
+    with Session(read_engine) as session:
+        session.get(Product, product_id)  # begins the transaction, stamping the generation
+        invalidate_product(product_id)
+        assert get_rules(session, product_id).base_price == 10
+    assert rule_cache.get(product_id) is None
+
+    with Session(read_engine) as session:
+        get_rules(session, product_id)
+    assert rule_cache.get(product_id) is not None
+
+def test_writer_jobs_bypass_the_cache(client, vendor):
+    product_id = make_product(client, vendor, 10)
+    rule_cache.clear()
+
+    def _reprice_then_fail(session):
+        session.get(Product, product_id).price = 99
+        session.flush()
+        assert compute_price(session, product_id, 1, None)["unit_price"] == 99
+        raise RuntimeError("roll back")
+
+    with pytest.raises(RuntimeError):
+        run_write(_reprice_then_fail)
+    # The uncommitted price was neither cached nor served afterwards
+    assert rule_cache.get(product_id) is None
+    assert _preview(client, vendor, product_id, quantity=1) == 10
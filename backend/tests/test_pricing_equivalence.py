@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from benchmarks.bench_pricing import check_equivalence, seed_catalog
+from database import engine
+from models import Product
+
+# Prices whose *100 lands next to a .5 tie in binary floating point
+NEAR_TIES = [0.005, 0.015, 0.125, 1.005, 1.015, 1.115, 2.675, 8.345, 1234.565]
+
+@pytest.fixture(scope="module")
+def catalog(client):
+    """Two small seeded catalogs; the first also gets near-tie prices"""
+    catalogs = [seed_catalog(engine, products=120, zones=4, tiers=4, seed=seed) for seed in (1, 2)]
+    vendor_id, product_ids = catalogs[0]
+    with Session(engine) as session:
+        unit_id = session.get(Product, product_ids[0]).unit_id
+        first_id = max(session.exec(select(Product.product_id)).all()) + 1
+        session.execute(insert(Product), [
+            {"product_id": first_id + i, "product_name": f"Tie {price}", "vendor_id": vendor_id,
+             "unit_id": unit_id, "price": price}
+            for i, price in enumerate(NEAR_TIES)
+        ])
+        session.commit()
+    product_ids += range(first_id, first_id + len(NEAR_TIES))
+    return catalogs
+
+def test_every_pricing_path_matches_the_reference(catalog):
+    # compute_price cold and warm, compute_prices and the rate card (price_matrix/round2) when numpy is installed
+    for seed, (vendor_id, product_ids) in enumerate(catalog, 1):
+        assert check_equivalence(engine, vendor_id, product_ids, 600, seed) == []
+
+def test_round2_matches_builtin_round_near_ties():
+    np = pytest.importorskip("numpy")
+    from pricing_matrix import round2
+
+    values = NEAR_TIES + [cents / 1000 for cents in range(5, 200000, 10)]
+    prices = np.array(values, dtype=np.float64)
+    assert round2(prices).tolist() == [round(value, 2) for value in values]
@@ -0,0 +1,56 @@
+import time
+
+from sqlalchemy import update
+
+import repricing
+from conftest import make_org, make_product
+from models import Order, OrderStatus
+from writer import run_write
+
+def _wait_for(client, vendor, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f"/pricing/reprice-jobs/{job_id}", headers=vendor.headers)
+        assert response.status_code == 200, response.text
+        job = response.json()
+        if job["status"] not in ("Queued", "Running") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+def test_job_skips_orders_that_left_the_open_state(client, owner, monkeypatch):
+    vendor, company = make_org(client, owner, "Vendor"), make_org(client, owner, "Company")
+    product_id = make_product(client, vendor, 10)
+    order_ids = []
+    for _ in range(3):
+        response = client.post("/orders/checkout", json={"lines": [{"product_id": product_id}]}, headers=company.headers)
+        assert response.status_code == 200, response.text
+        order_ids.append(response.json()["order_id"])
+    response = client.post(f"/pricing/tiers/{product_id}", json={
+        "min_qty": 1, "discount_type": "Percent", "discount_amount": 50,
+    }, headers=vendor.headers)
+    assert response.status_code == 200, response.text
+
+    # Accept the middle order after the job has read and priced its lines, before they are written
+    moved = order_ids[1]
+    price_chunk = repricing._price_chunk
+
+    def _price_then_accept(job, after_id):
+        chunk = price_chunk(job, after_id)
+        if chunk is not None:
+            run_write(lambda session: session.execute(
+                update(Order.__table__).where(Order.__table__.c.order_id == moved).values(status=OrderStatus.ACCEPTED)
+            ))
+        return chunk
+
+    monkeypatch.setattr(repricing, "_price_chunk", _price_then_accept)
+    response = client.post("/pricing/reprice-open-orders", params={"product_id": product_id}, headers=vendor.headers)
+    assert response.status_code == 202, response.text
+    job = _wait_for(client, vendor, response.json()["job_id"])
+
+    assert job["status"] == "Completed"
+    assert (job["total"], job["processed"], job["repriced"]) == (3, 3, 2)
+    assert job["updated_order_ids"] == [order_ids[0], order_ids[2]]
+    assert job["skipped_order_ids"] == [moved]
+    totals = {order_id: client.get(f"/orders/{order_id}", headers=company.headers).json()["total_value"]
+              for order_id in order_ids}
+    assert totals == {order_ids[0]: 5.0, moved: 10.0, order_ids[2]: 5.0}
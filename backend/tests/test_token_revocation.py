@@ -0,0 +1,39 @@
+import time
+
+from conftest import make_org, make_user
+from token_versions import TokenVersions
+
+def _user_id(client, headers) -> int:
+    return client.get("/auth/me", headers=headers).json()["user_id"]
+
+def test_deleted_user_is_revoked_in_other_workers(client, owner):
+    company = make_org(client, owner, "Company")
+    headers = make_user(client, company, "Company")
+    user_id = _user_id(client, headers)
+    issued_at = time.time()
+    other_worker = TokenVersions()
+    assert other_worker.is_current(user_id, 0, issued_at)
+
+    assert client.delete(f"/users/{user_id}", headers=company.headers).status_code == 200
+    # A process that didn't handle the delete learns it from the tombstone on its next reload
+    other_worker._loaded_at = None
+    assert not other_worker.is_current(user_id, 0, issued_at)
+    assert not TokenVersions().is_current(user_id, 0, issued_at)
+    # A user that later reuses the id is not affected
+    assert TokenVersions().is_current(user_id, 0, time.time() + 1)
+
+def test_deleted_organization_users_are_revoked(client, owner):
+    company = make_org(client, owner, "Company")
+    user_id = _user_id(client, make_user(client, company, "Company"))
+    issued_at = time.time()
+    assert client.delete(f"/organizations/{company.id}", headers=owner).status_code == 200
+    assert not TokenVersions().is_current(user_id, 0, issued_at)
+
+def test_role_change_is_seen_by_other_workers(client, owner):
+    company = make_org(client, owner, "Company")
+    user_id = _user_id(client, make_user(client, company, "Company"))
+    response = client.put(f"/users/{user_id}", json={"role": "Admin"}, headers=company.headers)
+    assert response.status_code == 200, response.text
+    other_worker = TokenVersions()
+    assert not other_worker.is_current(user_id, 0, time.time())
+    assert other_worker.is_current(user_id, 1, time.time())
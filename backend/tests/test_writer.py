@@ -0,0 +1,37 @@
+from sqlmodel import Session
+
+from database import engine, writer_engine
+from models import Organization, OrganizationType
+from writer import WriteQueue, _Job
+
+class JobFailed(Exception):
+    pass
+
+def test_failed_job_leaves_earlier_results_intact(client):
+    queue = WriteQueue(writer_engine)
+    created = {}
+
+    def create(session: Session) -> Organization:
+        organization = Organization(name="Before", organization_type=OrganizationType.COMPANY)
+        session.add(organization)
+        session.flush()
+        created["id"] = organization.id
+        return organization
+
+    first = _Job(create)
+    # The failing job touches the same row before raising
+    def rename_then_fail(session: Session):
+        organization = session.get(Organization, created["id"])
+        organization.name = "Rolled back"
+        session.flush()
+        raise JobFailed()
+
+    second = _Job(rename_then_fail)
+    # One group commit: the first job succeeds, the second fails after it
+    queue._run_batch([first, second])
+
+    organization = first.future.result()
+    assert organization.name == "Before"
+    assert isinstance(second.future.exception(), JobFailed)
+    with Session(engine) as session:
+        assert session.get(Organization, organization.id).name == "Before"
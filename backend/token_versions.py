@@ -0,0 +1,114 @@
+"""Revocation of stateless access tokens.
+
+A stateless token (auth.AUTH_STATELESS) carries the token_version its user
+had when it was issued, and is rejected once User.token_version has moved
+past it (role changes bump the version). Instead of reading the user on every
+request, each process keeps the versions of the few users that were ever
+bumped (token_version > 0, a partial index) and reloads them every
+TOKEN_VERSION_REFRESH seconds; bumps made by this process apply at once.
+
+Deleted users no longer have a row to carry a version, so deleting a user
+writes a UserTombstone in the same transaction. The reload picks up the
+tombstones younger than the token lifetime, which rejects tokens issued
+before the deletion in every worker; the deleting process applies it at once.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from sqlalchemy import delete, insert, text
+from sqlmodel import Session, select
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES
+from database import read_engine
+from models import User, UserTombstone
+
+TOKEN_VERSION_REFRESH = float(os.getenv("TOKEN_VERSION_REFRESH", "5"))
+
+def _tombstone_cutoff() -> float:
+    # Tokens issued before this have expired anyway
+    return time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+def record_deleted_users(session: Session, user_ids: Iterable[int]) -> float:
+    """Write tombstones for users deleted in this write transaction and drop expired ones.
+    Returns the deletion time to pass to TokenVersions.forget once committed.
+    """
+    deleted_at = time.time()
+    rows = [{"user_id": user_id, "deleted_at": deleted_at} for user_id in user_ids]
+    if rows:
+        table = UserTombstone.__table__
+        session.execute(delete(table).where(table.c.deleted_at < _tombstone_cutoff()))
+        session.execute(insert(table), rows)
+    return deleted_at
+
+class TokenVersions:
+    """Current token version per user (0 when absent) plus recently deleted users"""
+
+    def __init__(self, refresh: float = TOKEN_VERSION_REFRESH):
+        self.refresh = refresh
+        self._versions: Dict[int, int] = {}
+        # user_id -> latest deletion time (epoch seconds)
+        self._deleted: Dict[int, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._changes = 0
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.refresh:
+                return
+            # Claim the reload; concurrent requests keep using the current map meanwhile
+            self._loaded_at = now
+            changes = self._changes
+        cutoff = _tombstone_cutoff()
+        with Session(read_engine) as session:
+            versions = dict(session.exec(
+                select(User.user_id, User.token_version).where(text("token_version > 0"))
+            ).all())
+            deleted: Dict[int, float] = {}
+            for user_id, deleted_at in session.exec(
+                select(UserTombstone.user_id, UserTombstone.deleted_at).where(UserTombstone.deleted_at > cutoff)
+            ):
+                deleted[user_id] = max(deleted_at, deleted.get(user_id, 0))
+        with self._lock:
+            if changes != self._changes:
+                # Changed while loading; versions and deletion times only grow, so keep the newer
+                for user_id, version in self._versions.items():
+                    if version > versions.get(user_id, 0):
+                        versions[user_id] = version
+                for user_id, deleted_at in self._deleted.items():
+                    if deleted_at > max(cutoff, deleted.get(user_id, 0)):
+                        deleted[user_id] = deleted_at
+            self._versions = versions
+            self._deleted = deleted
+
+    def reload_due(self) -> bool:
+        """Whether the next is_current call will query the database first"""
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh
+
+    def is_current(self, user_id: int, version: int, issued_at: float) -> bool:
+        """Whether a token issued at ``issued_at`` with ``version`` is still valid for the user"""
+        self._maybe_reload()
+        with self._lock:
+            deleted_at = self._deleted.get(user_id)
+            if deleted_at is not None and issued_at <= deleted_at:
+                return False
+            return version >= self._versions.get(user_id, 0)
+
+    def bump(self, user_id: int, version: int):
+        """Record a committed token_version change"""
+        with self._lock:
+            self._changes += 1
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+
+    def forget(self, user_ids: Iterable[int], deleted_at: float):
+        """Apply committed tombstones (see record_deleted_users) without waiting for a reload"""
+        with self._lock:
+            self._changes += 1
+            for user_id in user_ids:
+                self._versions.pop(user_id, None)
+                self._deleted[user_id] = max(deleted_at, self._deleted.get(user_id, 0))
+
+token_versions = TokenVersions()
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+from models import User
+
+# Authenticated users kept per token subject (phone number); 0 disables the cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Upper bound on staleness for changes made outside this process (other workers, scripts)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+
+class UserCache:
+    """Bounded TTL/LRU of detached User rows keyed by phone number.
+
+    Works like pricing_engine.PricingRuleCache: every invalidation bumps a
+    generation counter and a lookup only stores its result if nothing was
+    invalidated since it started, so a read that raced with a user update
+    can't put the old row back. Cached users are shared between requests
+    and must be treated as read-only.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, phone_number: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(phone_number)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[phone_number]
+                return None
+            self._entries.move_to_end(phone_number)
+            return user
+
+    def put(self, phone_number: str, user: User, generation: int):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[phone_number] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(phone_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, phone_numbers: Iterable[Optional[str]]):
+        with self._lock:
+            self.generation += 1
+            for phone_number in phone_numbers:
+                self._entries.pop(phone_number, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+user_cache = UserCache()
+
+def invalidate_users(*phone_numbers: Optional[str]):
+    """Drop cached users; call after the write that changes or removes them has committed"""
+    user_cache.invalidate(phone_numbers)
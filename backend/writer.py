@@ -0,0 +1,136 @@
+"""Single-writer queue with group commit.
+
+SQLite allows one writer at a time, so instead of letting every request race
+for the lock, mutating endpoints hand their transaction to a dedicated writer
+thread as a function ``fn(session) -> result``. The thread drains whatever
+jobs are pending, runs each inside its own SAVEPOINT and commits the whole
+batch once (one fsync). A job that raises only rolls back its own savepoint;
+its caller gets the exception and everyone else in the batch still commits.
+
+Each job gets its own Session on the batch's connection, so jobs don't share
+an identity map: rolling back a failed job can't expire or change objects an
+earlier job returned. Jobs must not call ``session.commit()`` themselves; use
+``session.flush()`` when generated ids are needed. Returned ORM objects are
+detached with their loaded attributes intact.
+"""
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, TypeVar
+from sqlmodel import Session
+from database import writer_engine
+
+T = TypeVar("T")
+
+WRITER_MAX_BATCH = int(os.getenv("WRITER_MAX_BATCH", "64"))
+
+# session.info key marking writer job sessions (their changes are not committed yet)
+WRITER_JOB = "writer_job"
+
+class _Job:
+    __slots__ = ("fn", "future", "context")
+
+    def __init__(self, fn: Callable[[Session], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+        # Run in the caller's context so per-request query accounting sees the writes
+        self.context = contextvars.copy_context()
+
+class WriteQueue:
+    """Serialize write transactions on one thread and group-commit them."""
+
+    def __init__(self, engine, max_batch: int = WRITER_MAX_BATCH):
+        self.engine = engine
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the writer thread (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish pending jobs and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, fn: Callable[[Session], T]) -> "Future[T]":
+        """Queue a write transaction and return a future for its result"""
+        self.start()
+        job = _Job(fn)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, fn: Callable[[Session], T]) -> T:
+        """Run a write transaction on the writer thread and wait for it"""
+        return self.submit(fn).result()
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    @staticmethod
+    def _run_job(job: _Job, connection):
+        # Committing a session joined with create_savepoint only releases its SAVEPOINT;
+        # leaving the block on an exception rolls the SAVEPOINT back
+        with Session(bind=connection, expire_on_commit=False, join_transaction_mode="create_savepoint",
+                     info={WRITER_JOB: True}) as session:
+            result = job.fn(session)
+            session.commit()
+        return result
+
+    def _run_batch(self, batch: list):
+        done = []
+        try:
+            with self.engine.connect() as connection, connection.begin():
+                for job in batch:
+                    if not job.future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        result = job.context.run(self._run_job, job, connection)
+                    except BaseException as exc:
+                        job.future.set_exception(exc)
+                        continue
+                    done.append((job, result))
+        except BaseException as exc:
+            # Commit (or BEGIN) failed: nothing in this batch was written
+            for job, _ in done:
+                job.future.set_exception(exc)
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(exc)
+            return
+        for job, result in done:
+            job.future.set_result(result)
+
+write_queue = WriteQueue(writer_engine)
+
+def run_write(fn: Callable[[Session], T]) -> T:
+    """Run ``fn(session)`` as a write transaction on the shared writer thread"""
+    return write_queue.run(fn)